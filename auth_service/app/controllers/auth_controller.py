@@ -2,19 +2,22 @@ from app.schemas.auth import UserCreate, UserLogin, UserOut
 from app.services.user_service import user_service
 from app.core.security import create_access_token
 from app.core.config import settings
+from app.core.rate_limit import check_login_budget
 
 # register_user()
-def register_user(payload: UserCreate) -> UserOut:
+async def register_user(payload: UserCreate) -> UserOut:
     try:
-        user = user_service.create_user(email=payload.email, password=payload.password)
+        user = await user_service.create_user_async(email=payload.email, password=payload.password)
     except ValueError as e:
         # Let the route translate into 409/400 as needed
         raise e
     return UserOut(id=user["id"], email=user["email"])
 
 # login_user()
-def login_user(payload: UserLogin) -> str | None:
-    user = user_service.authenticate(email=payload.email, password=payload.password)
+async def login_user(payload: UserLogin, client_ip: str | None = None) -> str | None:
+    # Raises RateLimited before we spend a PBKDF2 verify on this attempt
+    check_login_budget(payload.email, client_ip)
+    user = await user_service.authenticate_async(email=payload.email, password=payload.password)
     if not user:
         return None
     token = create_access_token(
@@ -0,0 +1,11 @@
+"""AnyIO's worker thread pool: where FastAPI runs sync handlers and where blocking calls are offloaded."""
+import anyio.to_thread
+
+def configure_threadpool(size: int) -> None:
+    """Resize the default thread limiter (AnyIO starts it at 40); must run on the server's event loop."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = size
+
+def threadpool_stats() -> dict:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {"size": limiter.total_tokens, "busy": limiter.borrowed_tokens,
+            "waiting": limiter.statistics().tasks_waiting}
@@ -7,5 +7,37 @@ class Settings(BaseModel):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
     ALGORITHM: str = "HS256"
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./auth.db")  # default for local dev
+    USER_BACKEND: str = os.getenv("USER_BACKEND", "memory")  # "memory" (process-local) or "sql" (DATABASE_URL, shared by all workers)
+    # Read replica for request-path reads ("" = read from DATABASE_URL); Alembic only ever targets the primary
+    DATABASE_REPLICA_URL: str = os.getenv("DATABASE_REPLICA_URL", "")
+    READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))  # after a write, that user's reads stay on the primary this long
+    THREADPOOL_SIZE: int = int(os.getenv("THREADPOOL_SIZE", "40"))  # AnyIO worker threads for sync handlers and offloaded blocking calls
+    # Connection pool (ignored where the pool has no size, e.g. in-memory SQLite)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "-1"))  # seconds before a connection is replaced; -1 = never
+    # Pre-ping costs a round trip per checkout; with it off, rely on DB_POOL_RECYCLE and
+    # SQLAlchemy invalidating the pool after the first disconnect error
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # file SQLite (WAL mode): wait this long for another process's write lock
+    HASH_WORKERS: int = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))  # password hashing processes
+    # Password hashing policy: the first scheme hashes, the others only verify and are rehashed
+    # on login (e.g. "argon2,pbkdf2_sha256" once argon2-cffi is installed)
+    PASSWORD_SCHEMES: list[str] = [s.strip() for s in os.getenv("PASSWORD_SCHEMES", "pbkdf2_sha256").split(",") if s.strip()]
+    PASSWORD_HASH_TARGET_MS: float = float(os.getenv("PASSWORD_HASH_TARGET_MS", "50"))  # calibrate pbkdf2 rounds to this verify time; 0 = passlib default
+    PASSWORD_HASH_ROUNDS: int = int(os.getenv("PASSWORD_HASH_ROUNDS", "0"))  # fixed pbkdf2 rounds, skips calibration; 0 = calibrate
+    # Optional durability for the user store: write-ahead log + snapshots in this directory ("" = off)
+    PERSIST_DIR: str = os.getenv("PERSIST_DIR", "")
+    PERSIST_GROUP_COMMIT_MS: float = float(os.getenv("PERSIST_GROUP_COMMIT_MS", "2"))  # wait this long to batch writes into one fsync
+    PERSIST_SYNC_COMMIT: bool = os.getenv("PERSIST_SYNC_COMMIT", "true").lower() in ("1", "true", "yes")  # acknowledge writes only after fsync
+    PERSIST_SNAPSHOT_EVERY: int = int(os.getenv("PERSIST_SNAPSHOT_EVERY", "100000"))  # log records between snapshots; 0 = never
+    # Login admission control, checked before any password hashing; 0 disables a limiter
+    LOGIN_IP_PER_MINUTE: float = float(os.getenv("LOGIN_IP_PER_MINUTE", "60"))
+    LOGIN_IP_BURST: float = float(os.getenv("LOGIN_IP_BURST", "20"))
+    LOGIN_EMAIL_PER_MINUTE: float = float(os.getenv("LOGIN_EMAIL_PER_MINUTE", "10"))
+    LOGIN_EMAIL_BURST: float = float(os.getenv("LOGIN_EMAIL_BURST", "5"))
+    LOGIN_LIMITER_MAX_KEYS: int = int(os.getenv("LOGIN_LIMITER_MAX_KEYS", "100000"))  # buckets kept per limiter (LRU)
+    HASH_MAX_PENDING: int = int(os.getenv("HASH_MAX_PENDING", "0"))  # queued+running hashes before 503; 0 = 4 x HASH_WORKERS
 
 settings = Settings()
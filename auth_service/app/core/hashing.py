@@ -0,0 +1,147 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+from .config import settings
+from .metrics import REGISTRY
+from .security import configure_passwords, hash_password, password_rounds, verify_and_update, verify_password
+
+PASSWORD_HASH_SECONDS = REGISTRY.histogram(
+    "password_hash_seconds", "CPU time of one hash/verify inside a hashing worker", ("op",)
+)
+PASSWORD_HASH_LATENCY_SECONDS = REGISTRY.histogram(
+    "password_hash_latency_seconds", "Submit-to-result latency of hashing jobs, queue wait included", ("op",)
+)
+
+class HashingPoolSaturated(RuntimeError):
+    """Raised when the hashing queue is full; routes turn it into a fast 503."""
+
+def _timed(fn: Callable, *args):
+    # Runs in the worker process: report pure hashing time next to the result
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, time.perf_counter() - start
+
+class HashingPool:
+    """Bounded process pool for CPU-bound password hashing.
+
+    PBKDF2 holds the GIL for its whole run, so hashing inline stalls every other
+    request in the worker. Jobs go to separate processes instead, and at most
+    `max_pending` may be queued or running; beyond that `submit` fails fast.
+    """
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None) -> None:
+        self.workers = workers or settings.HASH_WORKERS
+        self.max_pending = max_pending if max_pending is not None else (settings.HASH_MAX_PENDING or 4 * self.workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {"submitted": 0, "rejected": 0, "completed": 0,
+                       "latency_seconds_sum": 0.0, "latency_seconds_max": 0.0, "hash_seconds_sum": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers must not inherit the event loop or threadpool of the server process.
+            # Workers reuse the parent's calibrated rounds instead of each timing their own.
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=configure_passwords, initargs=(password_rounds(),))
+        return self._executor
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue `fn(*args)` on the pool or raise HashingPoolSaturated without waiting."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise HashingPoolSaturated("Password hashing queue is full")
+            self._pending += 1
+            self._stats["submitted"] += 1
+        submitted_at = time.perf_counter()
+        op = fn.__name__
+        try:
+            executor, inner = self._submit_to_pool(_timed, fn, *args)
+        except BaseException:
+            # Never queued, so _done below will not run for it
+            with self._lock:
+                self._pending -= 1
+            raise
+        outer: Future = Future()
+
+        def _done(f: Future) -> None:
+            latency = time.perf_counter() - submitted_at
+            cancelled = f.cancelled()
+            error = None if cancelled else f.exception()
+            with self._lock:
+                self._pending -= 1
+                self._stats["completed"] += 1
+                self._stats["latency_seconds_sum"] += latency
+                self._stats["latency_seconds_max"] = max(self._stats["latency_seconds_max"], latency)
+                if not cancelled and error is None:
+                    self._stats["hash_seconds_sum"] += f.result()[1]
+            PASSWORD_HASH_LATENCY_SECONDS.observe(latency, op)
+            if not cancelled and error is None:
+                PASSWORD_HASH_SECONDS.observe(f.result()[1], op)
+            if isinstance(error, BrokenProcessPool):
+                # Jobs in flight when a worker died fail; the next submit gets a fresh pool
+                self._discard(executor)
+            if cancelled:
+                outer.cancel()
+            elif error is not None:
+                outer.set_exception(error)
+            else:
+                outer.set_result(f.result()[0])
+
+        inner.add_done_callback(_done)
+        return outer
+
+    def _submit_to_pool(self, *args) -> tuple[ProcessPoolExecutor, Future]:
+        for retry in (True, False):
+            with self._lock:
+                executor = self._get_executor()
+            try:
+                return executor, executor.submit(*args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed) and took the pool down with it: replace the pool,
+                # and retry once on the new one since this job never started
+                self._discard(executor)
+                if not retry:
+                    raise
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        # A broken pool has already terminated its workers; only forget it, once
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+
+    async def run(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "max_pending": self.max_pending, "pending": self._pending,
+                    "pbkdf2_rounds": password_rounds(), **self._stats}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+hashing_pool = HashingPool()
+
+# Read through the module global so a swapped-in pool (tests) is what gets reported
+REGISTRY.callback("password_hash_queue_depth", "Hashing jobs queued or running", lambda: hashing_pool._pending)
+REGISTRY.callback("password_hash_rejected_total", "Hashing jobs refused because the queue was full",
+                  lambda: hashing_pool._stats["rejected"], kind="counter")
+
+# Async-aware entry points used by the request path
+async def hash_password_async(plain: str) -> str:
+    return await hashing_pool.run(hash_password, plain)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await hashing_pool.run(verify_password, plain, hashed)
+
+async def verify_and_update_async(plain: str, hashed: str) -> tuple[bool, Optional[str]]:
+    # One job: the rehash, when needed, runs in the same worker right after the verify
+    return await hashing_pool.run(verify_and_update, plain, hashed)
@@ -0,0 +1,88 @@
+"""Container start: run `alembic upgrade head` only when the database is behind.
+
+Importing Alembic and the models costs most of a second, so the check reads
+the head revisions straight from the version files and the stamped ones with
+the plain DB driver. Run as ``python -m app.core.migrations``.
+"""
+import ast
+import pathlib
+import sqlite3
+import sys
+from typing import Optional
+from .config import settings
+
+SERVICE_DIR = pathlib.Path(__file__).resolve().parents[2]
+VERSIONS_DIR = SERVICE_DIR / "alembic" / "versions"
+
+def _module_constants(path: pathlib.Path) -> dict:
+    constants = {}
+    for node in ast.parse(path.read_text()).body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                constants[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass  # not a literal, so not revision metadata
+    return constants
+
+# head_revisions()
+def head_revisions(versions_dir: pathlib.Path = VERSIONS_DIR) -> set[str]:
+    """Revisions no other migration builds on, from each file's `revision`/`down_revision` literals."""
+    revisions, parents = set(), set()
+    for path in versions_dir.glob("*.py"):
+        constants = _module_constants(path)
+        if "revision" not in constants:
+            continue
+        revisions.add(constants["revision"])
+        down = constants.get("down_revision")
+        parents.update(down if isinstance(down, (tuple, list)) else [down] if down else [])
+    return revisions - parents
+
+def _sqlite_path(url: str) -> Optional[str]:
+    """File path of a sqlite:// URL, "" for an in-memory database, None for other backends."""
+    scheme, _, rest = url.partition("://")
+    if scheme.split("+", 1)[0] != "sqlite":
+        return None
+    path = rest[1:].split("?", 1)[0]
+    return "" if path == ":memory:" else path
+
+# current_revisions()
+def current_revisions(url: str) -> set[str]:
+    """Revisions stamped in alembic_version; empty for a new database."""
+    path = _sqlite_path(url)
+    if path is not None:
+        if not path:
+            return set()
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)  # read-only: never creates the file
+        except sqlite3.OperationalError:
+            return set()
+        try:
+            return {row[0] for row in conn.execute("SELECT version_num FROM alembic_version")}
+        except sqlite3.OperationalError:  # no alembic_version table yet
+            return set()
+        finally:
+            conn.close()
+    from sqlalchemy import create_engine, inspect, text
+    from sqlalchemy.pool import NullPool
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            if not inspect(conn).has_table("alembic_version"):
+                return set()
+            return set(conn.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    finally:
+        engine.dispose()
+
+# upgrade_if_needed()
+def upgrade_if_needed(url: str) -> bool:
+    """Upgrade the database to head unless it is already there; returns whether Alembic ran."""
+    heads = head_revisions()
+    if heads and current_revisions(url) == heads:
+        return False
+    from alembic.config import main as alembic_main
+    alembic_main(argv=["upgrade", "head"])
+    return True
+
+if __name__ == "__main__":
+    ran = upgrade_if_needed(settings.DATABASE_URL)
+    print("migrations: upgraded to head" if ran else "migrations: already at head, skipped", file=sys.stderr)
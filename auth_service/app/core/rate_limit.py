@@ -0,0 +1,79 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable
+from .config import settings
+from .metrics import REGISTRY
+
+LOGIN_RATE_LIMITED = REGISTRY.counter("login_rate_limited_total", "Login attempts rejected before hashing", ("key",))
+
+class RateLimited(Exception):
+    """Raised when a caller is over budget; `retry_after` is in seconds."""
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("Too many login attempts")
+        self.retry_after = retry_after
+
+class TokenBucketLimiter:
+    """In-memory token buckets keyed by string, e.g. an email or a client IP.
+
+    Keys hash onto `stripes` independent shards, each with its own lock and an
+    LRU-ordered dict capped at `max_keys / stripes` buckets, so memory stays
+    bounded and concurrent callers rarely contend. An evicted key starts over
+    with a full bucket, which only errs on the side of admitting.
+    """
+    def __init__(self, *, per_minute: float, burst: float, max_keys: int, stripes: int = 16,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.enabled = per_minute > 0 and burst > 0
+        self._clock = clock
+        self._per_stripe = max(1, max_keys // stripes)
+        self._stripes = [(threading.Lock(), OrderedDict()) for _ in range(stripes)]
+
+    def acquire(self, key: str) -> float:
+        """Take one token for `key`; return 0.0 if admitted, else seconds until a token is available."""
+        if not self.enabled:
+            return 0.0
+        lock, buckets = self._stripes[zlib.crc32(key.encode()) % len(self._stripes)]
+        now = self._clock()
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [self.burst, now]
+                if len(buckets) > self._per_stripe:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return 0.0
+            return (1.0 - bucket[0]) / self.rate
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for _, buckets in self._stripes)
+
+login_ip_limiter = TokenBucketLimiter(
+    per_minute=settings.LOGIN_IP_PER_MINUTE, burst=settings.LOGIN_IP_BURST, max_keys=settings.LOGIN_LIMITER_MAX_KEYS,
+)
+login_email_limiter = TokenBucketLimiter(
+    per_minute=settings.LOGIN_EMAIL_PER_MINUTE, burst=settings.LOGIN_EMAIL_BURST, max_keys=settings.LOGIN_LIMITER_MAX_KEYS,
+)
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+# check_login_budget()
+def check_login_budget(email: str, client_ip: str | None) -> None:
+    """Charge the IP and account buckets for one login attempt; raise RateLimited if either is empty."""
+    if client_ip:
+        wait = login_ip_limiter.acquire(client_ip)
+        if wait:
+            LOGIN_RATE_LIMITED.inc("ip")
+            raise RateLimited(wait)
+    wait = login_email_limiter.acquire(normalize_email(email))
+    if wait:
+        LOGIN_RATE_LIMITED.inc("email")
+        raise RateLimited(wait)
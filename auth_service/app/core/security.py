@@ -1,13 +1,95 @@
 import datetime as dt
+import threading
+import time
+from typing import Optional
 import jwt
+from passlib.context import CryptContext
 from passlib.hash import pbkdf2_sha256
+from .config import settings
+
+# Password hashing context
+_context: Optional[CryptContext] = None
+_context_rounds: Optional[int] = None
+_context_lock = threading.Lock()
+# Calibration is rounded to this many rounds, and hashes within REHASH_SLACK of the target
+# are left alone, so timing noise between processes or restarts never forces a rehash
+ROUNDS_STEP = 10_000
+REHASH_SLACK = 0.8
+
+def calibrate_pbkdf2_rounds(target_seconds: float, *, probe_rounds: int = 20_000, samples: int = 3) -> int:
+    """Pick pbkdf2_sha256 rounds so one hash/verify takes about `target_seconds` on this machine.
+
+    PBKDF2 cost is linear in rounds, so a few short probes are enough. The result is
+    rounded to ROUNDS_STEP and never goes below passlib's default, so slow hardware
+    does not quietly weaken hashes.
+    """
+    probe = pbkdf2_sha256.using(rounds=probe_rounds)
+    best = float("inf")
+    for _ in range(samples):
+        start = time.perf_counter()
+        probe.hash("calibration-probe")
+        best = min(best, time.perf_counter() - start)
+    rounds = round(probe_rounds * target_seconds / best / ROUNDS_STEP) * ROUNDS_STEP
+    return max(rounds, pbkdf2_sha256.default_rounds)
+
+def build_context(schemes: list[str], pbkdf2_rounds: int) -> CryptContext:
+    """The first scheme hashes new passwords; the rest still verify but are flagged for rehash."""
+    context = CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        # Hashes well below the calibrated cost count as outdated and get rehashed on login
+        pbkdf2_sha256__default_rounds=pbkdf2_rounds,
+        pbkdf2_sha256__min_rounds=int(pbkdf2_rounds * REHASH_SLACK),
+    )
+    for scheme in schemes:
+        handler = context.handler(scheme)
+        if hasattr(handler, "has_backend") and not handler.has_backend():
+            raise RuntimeError(f"Password scheme {scheme!r} needs its optional backend package installed")
+    return context
+
+def configure_passwords(pbkdf2_rounds: Optional[int] = None) -> int:
+    """Build the module's CryptContext and return the pbkdf2_sha256 rounds it uses.
+
+    With no argument the rounds come from PASSWORD_HASH_ROUNDS, or from calibrating
+    against PASSWORD_HASH_TARGET_MS. Hashing workers are handed the parent's value, and
+    the entrypoint calibrates once into PASSWORD_HASH_ROUNDS for all uvicorn workers, so
+    every process agrees on what "outdated" means.
+    """
+    global _context, _context_rounds
+    if pbkdf2_rounds is None:
+        if settings.PASSWORD_HASH_ROUNDS:
+            pbkdf2_rounds = settings.PASSWORD_HASH_ROUNDS
+        elif settings.PASSWORD_HASH_TARGET_MS > 0:
+            pbkdf2_rounds = calibrate_pbkdf2_rounds(settings.PASSWORD_HASH_TARGET_MS / 1000)
+        else:
+            pbkdf2_rounds = pbkdf2_sha256.default_rounds
+    context = build_context(settings.PASSWORD_SCHEMES, pbkdf2_rounds)
+    with _context_lock:
+        _context, _context_rounds = context, pbkdf2_rounds
+    return pbkdf2_rounds
+
+def password_context() -> CryptContext:
+    if _context is None:
+        configure_passwords()  # two racing first callers just calibrate twice
+    return _context
+
+def password_rounds() -> int:
+    password_context()
+    return _context_rounds
 
 # Password hashing helpers
 def hash_password(plain: str) -> str:
-    return pbkdf2_sha256.hash(plain)
+    return password_context().hash(plain)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pbkdf2_sha256.verify(plain, hashed)
+    return password_context().verify(plain, hashed)
+
+def needs_rehash(hashed: str) -> bool:
+    return password_context().needs_update(hashed)
+
+def verify_and_update(plain: str, hashed: str) -> tuple[bool, Optional[str]]:
+    """Verify, and when the hash is below the current policy return a fresh one to store."""
+    return password_context().verify_and_update(plain, hashed)
 
 # JWT creation
 def create_access_token(*, sub: str, expires_minutes: int, secret: str, algorithm: str) -> str:
@@ -18,3 +100,7 @@ def create_access_token(*, sub: str, expires_minutes: int, secret: str, algorith
         "exp": now + dt.timedelta(minutes=expires_minutes),
     }
     return jwt.encode(payload, secret, algorithm=algorithm)
+
+if __name__ == "__main__":
+    # Container start: print the rounds for the entrypoint to export to every worker
+    print(configure_passwords())
@@ -1,19 +1,42 @@
-from fastapi import APIRouter, HTTPException, status
+import math
+from fastapi import APIRouter, HTTPException, Request, status
 from app.schemas.auth import UserCreate, UserLogin, Token, UserOut
 from app.controllers.auth_controller import register_user, login_user
+from app.core.hashing import HashingPoolSaturated
+from app.core.rate_limit import RateLimited
+from app.core.serialization import negotiated_response
 
 router = APIRouter()
 
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Password hashing is saturated, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register(payload: UserCreate):
+async def register(request: Request, payload: UserCreate):
     try:
-        return register_user(payload)
+        user = await register_user(payload)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except HashingPoolSaturated:
+        raise _hashing_busy()
+    return negotiated_response(request, user.model_dump(), status_code=status.HTTP_201_CREATED)
 
 @router.post("/login", response_model=Token)
-def login(payload: UserLogin):
-    token = login_user(payload)
+async def login(request: Request, payload: UserLogin):
+    try:
+        token = await login_user(payload, client_ip=request.client.host if request.client else None)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    except HashingPoolSaturated:
+        raise _hashing_busy()
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    return {"access_token": token, "token_type": "bearer"}
+    return negotiated_response(request, {"access_token": token, "token_type": "bearer"})
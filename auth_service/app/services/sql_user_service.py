@@ -0,0 +1,104 @@
+import uuid
+from typing import Optional
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from app.core.db import async_session_scope, read_engine, session_scope, write_pins
+from app.core.hashing import hash_password_async, verify_and_update_async
+from app.core.security import hash_password, verify_and_update
+from app.models import User
+
+class SqlUserService:
+    """User store backed by the `user` table, shared by every worker process.
+
+    Mirrors the in-memory UserService: the async methods serve requests on the
+    async engine, the sync ones use the sync engine. The unique index on email
+    is what rejects a duplicate registration racing in from another process.
+    The async login lookup reads from the replica unless the email was
+    written within the read-your-writes window.
+    """
+    persistence = None  # durability is the database's job
+
+    def __init__(self, engine: Optional[AsyncEngine] = None, sync_engine: Optional[Engine] = None,
+                 replica: Optional[AsyncEngine] = None) -> None:
+        self._engine = engine
+        self._sync_engine = sync_engine
+        self._replica = replica
+
+    @staticmethod
+    def _to_dict(row: User) -> dict:
+        return {"id": row.id, "email": row.email, "password_hash": row.password_hash}
+
+    @staticmethod
+    def _upgrade_hash(user: dict, new_hash: str):
+        # Compare-and-set: a login on another worker may already have upgraded it
+        return (update(User)
+                .where(User.id == user["id"], User.password_hash == user["password_hash"])
+                .values(password_hash=new_hash))
+
+    # create_user()
+    def create_user(self, *, email: str, password: str) -> dict:
+        with session_scope(self._sync_engine) as session:
+            if session.exec(select(User.id).where(User.email == email)).first() is not None:
+                raise ValueError("User already exists")
+            user = User(id=str(uuid.uuid4()), email=email, password_hash=hash_password(password))
+            session.add(user)
+            try:
+                session.commit()
+            except IntegrityError:
+                raise ValueError("User already exists")
+            return self._to_dict(user)
+
+    # create_user_async()
+    async def create_user_async(self, *, email: str, password: str) -> dict:
+        """Like create_user, but hashes on the hashing pool instead of the event loop."""
+        async with async_session_scope(self._engine) as session:
+            if (await session.exec(select(User.id).where(User.email == email))).first() is not None:
+                raise ValueError("User already exists")
+        # No connection is held while the hash is computed
+        user = User(id=str(uuid.uuid4()), email=email, password_hash=await hash_password_async(password))
+        async with async_session_scope(self._engine) as session:
+            session.add(user)
+            try:
+                await session.commit()
+            except IntegrityError:
+                raise ValueError("User already exists")
+        write_pins.pin(email)  # a login right after registering must not miss the new row on a lagging replica
+        return self._to_dict(user)
+
+    # authenticate()
+    def authenticate(self, *, email: str, password: str) -> Optional[dict]:
+        with session_scope(self._sync_engine) as session:
+            row = session.exec(select(User).where(User.email == email)).first()
+            if row is None:
+                return None
+            user = self._to_dict(row)
+        ok, new_hash = verify_and_update(password, user["password_hash"])
+        if not ok:
+            return None
+        if new_hash:
+            with session_scope(self._sync_engine) as session:
+                session.exec(self._upgrade_hash(user, new_hash))
+                session.commit()
+            user["password_hash"] = new_hash
+        return user
+
+    # authenticate_async()
+    async def authenticate_async(self, *, email: str, password: str) -> Optional[dict]:
+        async with async_session_scope(read_engine(email, self._engine, self._replica)) as session:
+            row = (await session.exec(select(User).where(User.email == email))).first()
+            if row is None:
+                return None
+            user = self._to_dict(row)
+        ok, new_hash = await verify_and_update_async(password, user["password_hash"])
+        if not ok:
+            return None
+        if new_hash:
+            async with async_session_scope(self._engine) as session:
+                await session.exec(self._upgrade_hash(user, new_hash))
+                await session.commit()
+            write_pins.pin(email)
+            user["password_hash"] = new_hash
+        return user
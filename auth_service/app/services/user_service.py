@@ -1,31 +1,135 @@
+import threading
 import uuid
-from typing import Optional
-from app.core.security import hash_password, verify_password
+import zlib
+from typing import Iterator, Optional
+from app.core.config import settings
+from app.core.persistence import Persistence
+from app.core.security import hash_password, verify_and_update
+from app.core.hashing import hash_password_async, verify_and_update_async
 
 class UserService:
-    """Minimal in-memory user service for demo/interview purposes."""
-    def __init__(self) -> None:
-        self._users_by_email: dict[str, dict] = {}
+    """Minimal in-memory user service for demo/interview purposes.
+
+    Users live in lock-striped shards hashed by email, so the duplicate check
+    and insert in ``_new_user`` are atomic without serializing unrelated
+    registrations. Password hashing always happens outside the locks.
+
+    With ``persistence`` each new user and password upgrade is logged as a full
+    user record, and the store is rebuilt from the snapshot and log on construction.
+    """
+    def __init__(self, shards: int = 16, persistence: Optional[Persistence] = None) -> None:
+        self._shards = [(threading.Lock(), {}) for _ in range(shards)]
+        self.persistence = persistence
+        if persistence is not None:
+            persistence.recover(self._replay)
+            persistence.start(self._dump)
+
+    def _shard(self, email: str) -> tuple[threading.Lock, dict[str, dict]]:
+        return self._shards[zlib.crc32(email.encode()) % len(self._shards)]
+
+    def _get(self, email: str) -> Optional[dict]:
+        lock, users = self._shard(email)
+        with lock:
+            return users.get(email)
+
+    def _new_user(self, email: str, password_hash: str) -> dict:
+        lock, users = self._shard(email)
+        with lock:
+            if email in users:
+                raise ValueError("User already exists")
+            user = {
+                "id": str(uuid.uuid4()),
+                "email": email,
+                "password_hash": password_hash,
+            }
+            users[email] = user
+            if self.persistence is not None:
+                self.persistence.append({"o": "put", "user": dict(user)})
+            return user
+
+    def _set_password_hash(self, user: dict, old_hash: str, new_hash: str) -> None:
+        # Compare-and-set: a concurrent login may already have upgraded the hash
+        lock, _ = self._shard(user["email"])
+        with lock:
+            if user["password_hash"] == old_hash:
+                user["password_hash"] = new_hash
+                if self.persistence is not None:
+                    # Not waited on: losing an upgrade only means rehashing again next login
+                    self.persistence.append({"o": "put", "user": dict(user)})
+
+    def _replay(self, record: dict) -> None:
+        user = record["user"]
+        self._shard(user["email"])[1][user["email"]] = user
+
+    def _dump(self) -> Iterator[dict]:
+        for lock, users in self._shards:
+            with lock:
+                snapshot = [dict(user) for user in users.values()]
+            for user in snapshot:
+                yield {"o": "put", "user": user}
 
     # create_user()
     def create_user(self, *, email: str, password: str) -> dict:
-        if email in self._users_by_email:
+        if self._get(email) is not None:
             raise ValueError("User already exists")
-        user = {
-            "id": str(uuid.uuid4()),
-            "email": email,
-            "password_hash": hash_password(password),
-        }
-        self._users_by_email[email] = user
+        # _new_user re-checks under the shard lock: another thread may register the email while we hash
+        user = self._new_user(email, hash_password(password))
+        if self.persistence is not None:
+            self.persistence.wait()
+        return user
+
+    # create_user_async()
+    async def create_user_async(self, *, email: str, password: str) -> dict:
+        """Like create_user, but hashes on the hashing pool instead of the event loop."""
+        if self._get(email) is not None:
+            raise ValueError("User already exists")
+        # _new_user re-checks: the email may have been taken while we awaited the hash
+        user = self._new_user(email, await hash_password_async(password))
+        if self.persistence is not None:
+            await self.persistence.wait_async()
         return user
 
     # authenticate()
     def authenticate(self, *, email: str, password: str) -> Optional[dict]:
-        user = self._users_by_email.get(email)
+        user = self._get(email)
+        if not user:
+            return None
+        old_hash = user["password_hash"]
+        ok, new_hash = verify_and_update(password, old_hash)
+        if not ok:
+            return None
+        if new_hash:
+            # Below the current cost or on a deprecated scheme: upgrade while we have the plaintext
+            self._set_password_hash(user, old_hash, new_hash)
+        return user
+
+    # authenticate_async()
+    async def authenticate_async(self, *, email: str, password: str) -> Optional[dict]:
+        user = self._get(email)
         if not user:
             return None
-        if not verify_password(password, user["password_hash"]):
+        old_hash = user["password_hash"]
+        ok, new_hash = await verify_and_update_async(password, old_hash)
+        if not ok:
             return None
+        if new_hash:
+            self._set_password_hash(user, old_hash, new_hash)
         return user
 
-user_service = UserService()
+def build_user_service():
+    """Pick the user backend from settings.USER_BACKEND ("memory" or "sql")."""
+    if settings.USER_BACKEND == "sql":
+        from app.services.sql_user_service import SqlUserService
+        return SqlUserService()
+    if settings.USER_BACKEND != "memory":
+        raise ValueError(f"Unknown USER_BACKEND: {settings.USER_BACKEND!r}")
+    if settings.PERSIST_DIR:
+        return UserService(persistence=Persistence(
+            settings.PERSIST_DIR,
+            group_commit_ms=settings.PERSIST_GROUP_COMMIT_MS,
+            sync_commit=settings.PERSIST_SYNC_COMMIT,
+            snapshot_every=settings.PERSIST_SNAPSHOT_EVERY,
+        ))
+    return UserService()
+
+user_service = build_user_service()
@@ -1,4 +1,15 @@
 #!/bin/sh
 set -e
-alembic upgrade head
-exec uvicorn main:app --host 0.0.0.0 --port 8001
+WORKERS="${UVICORN_WORKERS:-1}"
+# Each uvicorn worker is its own process: users must live in the shared database
+if [ "$WORKERS" -gt 1 ] && [ "${USER_BACKEND:-memory}" != "sql" ]; then
+  echo "UVICORN_WORKERS=$WORKERS needs USER_BACKEND=sql; the memory store is per process" >&2
+  exit 1
+fi
+# Split the cores between the workers' password hashing pools instead of oversubscribing them
+export HASH_WORKERS="${HASH_WORKERS:-$(( ($(nproc) + WORKERS - 1) / WORKERS ))}"
+# Calibrate the password hash cost once, so every worker (and restart) uses the same rounds
+export PASSWORD_HASH_ROUNDS="$(python -m app.core.security)"
+# Skips Alembic (most of a second of imports) when alembic_version already matches head
+python -m app.core.migrations
+exec uvicorn main:app --host 0.0.0.0 --port 8001 --workers "$WORKERS"
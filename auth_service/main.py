@@ -1,9 +1,73 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from app.routes.auth import router as auth_router
+from app.core.config import settings
+from app.core.concurrency import configure_threadpool, threadpool_stats
+from app.core.hashing import hashing_pool
+from app.core.security import configure_passwords
+from app.core.metrics import REGISTRY, MetricsMiddleware
+from app.controllers import auth_controller
 
-app = FastAPI(title="Auth Service", version="0.1.0")
-app.include_router(auth_router, prefix="/auth", tags=["auth"])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_threadpool(settings.THREADPOOL_SIZE)
+    # Calibrate hash cost before serving, not on the first login; the probes are CPU-bound
+    await run_in_threadpool(configure_passwords)
+    if settings.USER_BACKEND == "sql":
+        from app.core.db import dispose_engines, get_async_engine, get_replica_async_engine
+        # Built here rather than at import, so tooling and tests that import the app open nothing
+        get_async_engine()
+        get_replica_async_engine()
+    yield
+    await run_in_threadpool(hashing_pool.shutdown)
+    # Flush the write-ahead log of a persistent user store
+    persistence = auth_controller.user_service.persistence
+    if persistence is not None:
+        # Joins the WAL threads and fsyncs: blocking, so off the event loop
+        await run_in_threadpool(persistence.close)
+    if settings.USER_BACKEND == "sql":
+        await dispose_engines()
 
-@app.get("/healthz")
-def healthz():
-    return {"status": "ok"}
+def create_app() -> FastAPI:
+    """Build the auth service app; engines are created by its lifespan, not by importing this module."""
+    app = FastAPI(title="Auth Service", version="0.1.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.include_router(auth_router, prefix="/auth", tags=["auth"])
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/stats/hashing")
+    async def hashing_stats():
+        """Queue depth, rejections and latency of the password hashing pool."""
+        return hashing_pool.stats()
+
+    @app.get("/stats/threadpool")
+    async def threadpool():
+        """Size, busy threads and waiting callers of the worker thread pool."""
+        return threadpool_stats()
+
+    @app.get("/stats/db-pool")
+    async def db_pool_stats():
+        """Size, checked-in/out and overflow of each SQLAlchemy connection pool."""
+        # Imported on demand: the memory backend never loads SQLAlchemy
+        from app.core.db import pool_stats
+        return pool_stats()
+
+    @app.get("/stats/persistence")
+    async def persistence_stats():
+        """Write-ahead log position, fsync count and last recovery of the user store, if persistent."""
+        persistence = auth_controller.user_service.persistence
+        return persistence.stats() if persistence is not None else {"enabled": False}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        """Prometheus text exposition of request, password hashing and DB pool metrics."""
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+app = create_app()
@@ -1,6 +1,15 @@
 import pytest
 from fastapi.testclient import TestClient
 from main import app
+from app.core import rate_limit
+
+@pytest.fixture(autouse=True)
+def fresh_login_limiters(monkeypatch):
+    """Give every test its own login buckets; the module client shares one IP."""
+    for name in ("login_ip_limiter", "login_email_limiter"):
+        old = getattr(rate_limit, name)
+        fresh = rate_limit.TokenBucketLimiter(per_minute=old.rate * 60, burst=old.burst, max_keys=100)
+        monkeypatch.setattr(rate_limit, name, fresh)
 
 @pytest.fixture
 def client():
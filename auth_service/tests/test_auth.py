@@ -1,11 +1,32 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 import jwt
 from datetime import datetime, timedelta
 
-from main import app
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import msgpack
+from collections import OrderedDict
+
+from main import app, create_app
+from app.core.config import settings
+from app.core import hashing, rate_limit, security
+from app.core.hashing import HashingPool, HashingPoolSaturated
+from app.core.persistence import Persistence
+from app.core.security import hash_password, verify_password
+from passlib.hash import pbkdf2_sha256, sha256_crypt
 from app.services.user_service import UserService
+from app.services.sql_user_service import SqlUserService
+from app.controllers import auth_controller
+from app.core.db import async_url, session_scope, sqlite_pragmas
+from app.models import User
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine
 
 client = TestClient(app)
 
@@ -185,6 +206,478 @@ class TestUserService:
         )
         assert user is None
 
+class TestHashingPool:
+    def test_async_hash_and_verify_round_trip(self):
+        """Hashes made on the pool verify on the pool and inline."""
+        async def scenario():
+            hashed = await hashing.hash_password_async("testpassword123")
+            return hashed, await hashing.verify_password_async("testpassword123", hashed)
+
+        hashed, ok = asyncio.run(scenario())
+        assert ok is True
+        assert verify_password("testpassword123", hashed)
+
+    def test_saturated_pool_rejects_without_waiting(self):
+        """Once max_pending jobs are in flight, submit fails fast and counts the rejection."""
+        pool = HashingPool(workers=1, max_pending=1)
+        try:
+            first = pool.submit(hash_password, "a")
+            with pytest.raises(HashingPoolSaturated):
+                pool.submit(hash_password, "b")
+            assert verify_password("a", first.result(timeout=30))
+            stats = pool.stats()
+            assert stats["rejected"] == 1
+            assert stats["completed"] == 1
+            assert stats["pending"] == 0
+            assert stats["hash_seconds_sum"] > 0
+            pool.submit(hash_password, "c").result(timeout=30)
+        finally:
+            pool.shutdown()
+
+    def test_login_returns_503_when_saturated(self, monkeypatch):
+        """A full hashing queue turns into 503 with Retry-After instead of queueing."""
+        monkeypatch.setattr(hashing, "hashing_pool", HashingPool(workers=1, max_pending=0))
+        response = client.post("/auth/register", json={"email": "busy@example.com", "password": "pw"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_pool_recovers_after_a_worker_is_killed(self, monkeypatch):
+        """A hashing worker killed by the kernel does not leak queue slots or keep the broken pool."""
+        import signal
+        import time
+        pool = HashingPool(workers=1, max_pending=2)
+        monkeypatch.setattr(hashing, "hashing_pool", pool)
+        try:
+            creds = {"email": "killed@example.com", "password": "pw"}
+            assert client.post("/auth/register", json=creds).status_code == 201
+            broken = pool._executor
+            for pid in list(broken._processes):
+                os.kill(pid, signal.SIGKILL)
+            deadline = time.monotonic() + 30
+            while not broken._broken and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert broken._broken
+            for _ in range(3):
+                assert client.post("/auth/login", json=creds).status_code == 200
+            assert pool._executor is not broken
+            assert pool.stats()["pending"] == 0
+        finally:
+            pool.shutdown()
+
+    def test_failed_submit_releases_its_slot(self, monkeypatch):
+        """A job the executor refuses does not count against max_pending."""
+        pool = HashingPool(workers=1, max_pending=1)
+        try:
+            monkeypatch.setattr(pool._get_executor(), "submit", MagicMock(side_effect=RuntimeError("shut down")))
+            for _ in range(2):
+                with pytest.raises(RuntimeError):
+                    pool.submit(hash_password, "a")
+            assert pool.stats()["pending"] == 0
+        finally:
+            pool.shutdown()
+
+    def test_hashing_stats_endpoint(self):
+        """Pool metrics are exposed for scraping."""
+        response = client.get("/stats/hashing")
+        assert response.status_code == 200
+        assert {"pending", "rejected", "latency_seconds_sum"} <= response.json().keys()
+
+    def test_create_user_async_rechecks_email(self, user_service):
+        """Concurrent registrations of one email produce a single user."""
+        async def scenario():
+            return await asyncio.gather(
+                user_service.create_user_async(email="race@example.com", password="pw1"),
+                user_service.create_user_async(email="race@example.com", password="pw2"),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(scenario())
+        assert sum(isinstance(r, ValueError) for r in results) == 1
+        assert sum(isinstance(r, dict) for r in results) == 1
+
+class TestSerialization:
+    def test_login_msgpack(self):
+        """Internal consumers can ask for msgpack; JSON stays the default."""
+        credentials = {"email": "msgpack@example.com", "password": "testpassword123"}
+        registered = client.post("/auth/register", json=credentials)
+        assert registered.headers["content-type"] == "application/json"
+        response = client.post("/auth/login", json=credentials, headers={"Accept": "application/msgpack"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content)["token_type"] == "bearer"
+
+class TestMetrics:
+    def test_metrics_cover_routes_and_hashing(self):
+        """/metrics exposes per-route latency and password hashing timers in Prometheus text."""
+        credentials = {"email": "metrics@example.com", "password": "testpassword123"}
+        client.post("/auth/register", json=credentials)
+        client.post("/auth/login", json=credentials)
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert 'http_request_duration_seconds_bucket{method="POST",route="/auth/login",le="+Inf"}' in body
+        assert 'http_requests_total{method="POST",route="/auth/register",status="201"}' in body
+        assert 'password_hash_seconds_count{op="verify_and_update"}' in body
+        assert 'password_hash_latency_seconds_count{op="hash_password"}' in body
+        assert "password_hash_queue_depth 0" in body
+        assert "# TYPE http_requests_in_flight gauge" in body
+
+class TestDbPool:
+    def test_db_pool_endpoint(self):
+        """Pool state of the auth engines is exposed for diagnostics; engines not yet created report no pool."""
+        from app.core import db
+        asyncio.run(db.dispose_engines())
+        assert client.get("/stats/db-pool").json() == {"sync": {"pool": None}, "async": {"pool": None}}
+        db.get_engine()
+        response = client.get("/stats/db-pool")
+        assert response.status_code == 200
+        assert response.json()["sync"]["pool"] == "QueuePool"
+
+class TestPasswordPolicy:
+    def test_calibrated_rounds_are_used_for_new_hashes(self):
+        """New hashes carry the calibrated round count, which never drops below passlib's default."""
+        rounds = security.password_rounds()
+        assert rounds >= pbkdf2_sha256.default_rounds
+        assert pbkdf2_sha256.from_string(hash_password("pw")).rounds == rounds
+        assert security.calibrate_pbkdf2_rounds(0.001, probe_rounds=1000) == pbkdf2_sha256.default_rounds
+
+    def test_calibration_noise_does_not_force_rehash(self, monkeypatch):
+        """Two calibrations a few percent apart agree closely enough not to flag each other's hashes."""
+        def calibrate(probe_seconds: float) -> int:
+            ticks = iter([0.0, probe_seconds] * 3)
+            monkeypatch.setattr(security.time, "perf_counter", lambda: next(ticks))
+            return security.calibrate_pbkdf2_rounds(0.05, probe_rounds=1000)
+
+        low, high = calibrate(0.00052), calibrate(0.00049)  # 96153 and 102040 raw rounds
+        monkeypatch.undo()
+        assert (low, high) == (100_000, 100_000)
+        for rounds, other in ((90_000, 100_000), (100_000, 90_000)):
+            stored = pbkdf2_sha256.using(rounds=rounds).hash("pw")
+            assert not security.build_context(["pbkdf2_sha256"], other).needs_update(stored)
+        assert security.build_context(["pbkdf2_sha256"], 100_000).needs_update(pbkdf2_sha256.using(rounds=70_000).hash("pw"))
+
+    def test_weak_hash_is_upgraded_on_login(self, user_service):
+        """A hash below the target cost is replaced on the next successful login, then left alone."""
+        user = user_service._new_user("old@example.com", pbkdf2_sha256.using(rounds=1000).hash("pw"))
+        assert security.needs_rehash(user["password_hash"])
+
+        assert asyncio.run(user_service.authenticate_async(email="old@example.com", password="pw")) is user
+        upgraded = user["password_hash"]
+        assert pbkdf2_sha256.from_string(upgraded).rounds == security.password_rounds()
+        assert not security.needs_rehash(upgraded)
+
+        assert user_service.authenticate(email="old@example.com", password="pw") is user
+        assert user["password_hash"] == upgraded
+
+    def test_failed_login_does_not_rehash(self, user_service):
+        weak = pbkdf2_sha256.using(rounds=1000).hash("pw")
+        user = user_service._new_user("old@example.com", weak)
+        assert user_service.authenticate(email="old@example.com", password="wrong") is None
+        assert user["password_hash"] == weak
+
+    def test_deprecated_scheme_migrates_on_login(self, user_service, monkeypatch):
+        """Hashes from a scheme later in PASSWORD_SCHEMES still verify and move to the first scheme."""
+        context = security.build_context(["pbkdf2_sha256", "sha256_crypt"], security.password_rounds())
+        monkeypatch.setattr(security, "_context", context)
+        user = user_service._new_user("legacy@example.com", sha256_crypt.hash("pw"))
+
+        assert user_service.authenticate(email="legacy@example.com", password="pw") is user
+        assert pbkdf2_sha256.identify(user["password_hash"])
+
+    def test_scheme_without_backend_fails_at_startup(self):
+        try:
+            import argon2  # noqa: F401
+            pytest.skip("argon2-cffi is installed")
+        except ImportError:
+            pass
+        with pytest.raises(RuntimeError, match="argon2"):
+            security.build_context(["argon2", "pbkdf2_sha256"], 30_000)
+
+class TestConcurrentUsers:
+    def test_racing_registrations_create_each_user_once(self, user_service, monkeypatch):
+        """Many threads registering overlapping emails: exactly one wins per email, the rest get ValueError."""
+        monkeypatch.setattr("app.services.user_service.hash_password", lambda plain: "h:" + plain)
+        previous = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        barrier = threading.Barrier(16)
+        outcomes: list[tuple[str, str]] = []
+
+        def register(i: int) -> None:
+            barrier.wait()
+            for n in range(200):
+                email = f"user{n}@example.com"
+                try:
+                    user = user_service.create_user(email=email, password=f"pw{i}")
+                    outcomes.append((email, user["id"]))
+                except ValueError:
+                    pass
+
+        threads = [threading.Thread(target=register, args=(i,)) for i in range(16)]
+        try:
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(previous)
+
+        emails = [email for email, _ in outcomes]
+        assert sorted(emails) == sorted(set(emails)) and len(emails) == 200
+        for email, user_id in outcomes:
+            assert user_service._get(email)["id"] == user_id
+
+class TestPersistence:
+    def test_users_and_upgraded_hashes_survive_restart(self, tmp_path):
+        """Registered users and rehashed passwords are recovered from the log and from a snapshot."""
+        service = UserService(persistence=Persistence(str(tmp_path)))
+        user = service.create_user(email="keep@example.com", password="pw")
+        service._new_user("old@example.com", pbkdf2_sha256.using(rounds=1000).hash("pw"))
+        assert service.authenticate(email="old@example.com", password="pw")
+        upgraded = service._get("old@example.com")["password_hash"]
+        service.persistence.close()
+
+        service = UserService(persistence=Persistence(str(tmp_path)))
+        assert service._get("keep@example.com") == user
+        assert service._get("old@example.com")["password_hash"] == upgraded
+        service.persistence.snapshot()
+        service.persistence.close()
+
+        service = UserService(persistence=Persistence(str(tmp_path)))
+        try:
+            assert service.authenticate(email="keep@example.com", password="pw")["id"] == user["id"]
+            with pytest.raises(ValueError):
+                service.create_user(email="keep@example.com", password="other")
+        finally:
+            service.persistence.close()
+
+@pytest.fixture
+def sql_user_service(tmp_path):
+    """SQL user store on a WAL-mode SQLite file, reachable through both the sync and async engines."""
+    url = f"sqlite:///{tmp_path / 'auth.db'}"
+    sync_engine = create_engine(url)
+    async_engine = create_async_engine(async_url(url))
+    for engine in (sync_engine, async_engine.sync_engine):
+        sqlite_pragmas(engine)
+    SQLModel.metadata.create_all(sync_engine)
+    yield SqlUserService(async_engine, sync_engine)
+    asyncio.run(async_engine.dispose())
+    sync_engine.dispose()
+
+class TestSqlBackend:
+    def test_register_and_login_share_rows(self, sql_user_service):
+        """A user created through the async path authenticates through the sync one and vice versa."""
+        user = asyncio.run(sql_user_service.create_user_async(email="a@example.com", password="pw"))
+        assert sql_user_service.authenticate(email="a@example.com", password="pw")["id"] == user["id"]
+        sql_user_service.create_user(email="b@example.com", password="pw")
+        assert asyncio.run(sql_user_service.authenticate_async(email="b@example.com", password="pw"))
+        assert asyncio.run(sql_user_service.authenticate_async(email="b@example.com", password="no")) is None
+        assert sql_user_service.authenticate(email="nobody@example.com", password="pw") is None
+
+    def test_duplicate_email_rejected(self, sql_user_service):
+        sql_user_service.create_user(email="a@example.com", password="pw")
+        with pytest.raises(ValueError):
+            asyncio.run(sql_user_service.create_user_async(email="a@example.com", password="pw"))
+
+    def test_weak_hash_upgraded_in_place(self, sql_user_service):
+        """Rehash-on-login updates the stored row."""
+        weak = pbkdf2_sha256.using(rounds=1000).hash("pw")
+        with session_scope(sql_user_service._sync_engine) as session:
+            session.add(User(id="u1", email="old@example.com", password_hash=weak))
+            session.commit()
+        asyncio.run(sql_user_service.authenticate_async(email="old@example.com", password="pw"))
+        with session_scope(sql_user_service._sync_engine) as session:
+            stored = session.get(User, "u1").password_hash
+        assert stored != weak and not security.needs_rehash(stored)
+
+    def test_sqlite_file_uses_wal(self, sql_user_service):
+        with sql_user_service._sync_engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+    def test_routes_against_sql_store(self, sql_user_service, monkeypatch):
+        monkeypatch.setattr(auth_controller, "user_service", sql_user_service)
+        body = {"email": "route@example.com", "password": "testpassword123"}
+        assert client.post("/auth/register", json=body).status_code == 201
+        assert client.post("/auth/register", json=body).status_code == 409
+        assert client.post("/auth/login", json=body).status_code == 200
+
+def db_reads(engine: str) -> int:
+    from app.core.db import DB_READS
+    return DB_READS._merged().get((engine,), [0])[0]
+
+class TestReadReplica:
+    @pytest.fixture
+    def replicated(self, tmp_path, monkeypatch):
+        """Primary and replica SQLite files; the replica is a copy that stops replicating after the first user."""
+        from app.core import db
+        now = [0.0]
+        monkeypatch.setattr(db.write_pins, "_clock", lambda: now[0])
+        monkeypatch.setattr(db.write_pins, "_expiry", OrderedDict())
+        primary_url, replica_url = f"sqlite:///{tmp_path / 'primary.db'}", f"sqlite:///{tmp_path / 'replica.db'}"
+        sync_engine = create_engine(primary_url)
+        SQLModel.metadata.create_all(sync_engine)
+        with session_scope(sync_engine) as session:
+            session.add(User(id="u1", email="old@example.com", password_hash=hash_password("pw")))
+            session.commit()
+        shutil.copy(tmp_path / "primary.db", tmp_path / "replica.db")
+        primary, replica = create_async_engine(async_url(primary_url)), create_async_engine(async_url(replica_url))
+        yield SqlUserService(primary, sync_engine, replica=replica), now
+        for engine in (primary, replica):
+            asyncio.run(engine.dispose())
+        sync_engine.dispose()
+
+    def test_login_reads_the_replica(self, replicated):
+        service, _ = replicated
+        reads = db_reads("replica")
+        assert asyncio.run(service.authenticate_async(email="old@example.com", password="pw"))["id"] == "u1"
+        assert db_reads("replica") == reads + 1
+
+    def test_login_right_after_register_reads_the_primary(self, replicated):
+        """The new row is not on the replica yet; the pin sends that email's login to the primary."""
+        service, now = replicated
+        asyncio.run(service.create_user_async(email="new@example.com", password="pw"))
+        assert asyncio.run(service.authenticate_async(email="new@example.com", password="pw"))
+        now[0] += 6  # past the window, the lagging replica answers again
+        assert asyncio.run(service.authenticate_async(email="new@example.com", password="pw")) is None
+        assert asyncio.run(service.authenticate_async(email="old@example.com", password="pw"))
+
+    def test_pins_expire_and_are_pruned(self):
+        from app.core.db import WritePins
+        now = [0.0]
+        pins = WritePins(5, clock=lambda: now[0])
+        pins.pin("a")
+        now[0] = 3
+        pins.pin("b")
+        assert pins.pinned("a") and pins.pinned("b")
+        now[0] = 6
+        assert not pins.pinned("a") and pins.pinned("b")
+        pins.pin("c")  # drops "a", which expired
+        assert len(pins) == 2
+
+    def test_replica_engine_created_by_lifespan(self, tmp_path, monkeypatch):
+        from app.core import db
+        asyncio.run(db.dispose_engines())
+        monkeypatch.setattr(settings, "USER_BACKEND", "sql")
+        monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'primary.db'}")
+        monkeypatch.setattr(settings, "DATABASE_REPLICA_URL", f"sqlite:///{tmp_path / 'replica.db'}")
+        monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", 1000)
+        with TestClient(create_app()) as started:
+            pools = started.get("/stats/db-pool").json()
+            assert pools["replica"]["pool"] is not None and pools["async"]["pool"] is not None
+        assert db._replica_engine is None
+
+class TestLoginRateLimit:
+    def test_bucket_refills_over_time(self):
+        """Burst is admitted, the next attempt waits, and tokens come back at the configured rate."""
+        now = [0.0]
+        limiter = rate_limit.TokenBucketLimiter(per_minute=60, burst=2, max_keys=10, clock=lambda: now[0])
+        assert limiter.acquire("k") == 0.0
+        assert limiter.acquire("k") == 0.0
+        assert limiter.acquire("k") == pytest.approx(1.0)
+        now[0] = 1.0
+        assert limiter.acquire("k") == 0.0
+        assert limiter.acquire("other") == 0.0
+
+    def test_bucket_state_is_bounded(self):
+        """Old keys are evicted LRU-first once max_keys is reached."""
+        limiter = rate_limit.TokenBucketLimiter(per_minute=1, burst=1, max_keys=32, stripes=4)
+        for i in range(1_000):
+            limiter.acquire(f"10.0.{i // 256}.{i % 256}")
+        assert len(limiter) <= 32
+
+    def test_disabled_limiter_admits_everything(self):
+        limiter = rate_limit.TokenBucketLimiter(per_minute=0, burst=5, max_keys=10)
+        assert all(limiter.acquire("k") == 0.0 for _ in range(100))
+
+    def test_email_budget_rejects_before_hashing(self, monkeypatch):
+        """Over-budget accounts get 429 without a password verify; case variants share a bucket."""
+        monkeypatch.setattr(rate_limit, "login_email_limiter",
+                            rate_limit.TokenBucketLimiter(per_minute=1, burst=2, max_keys=10))
+        body = {"email": "stuffed@example.com", "password": "guess"}
+        assert client.post("/auth/login", json=body).status_code == 401
+        assert client.post("/auth/login", json={**body, "email": "Stuffed@Example.com"}).status_code == 401
+
+        with patch("app.services.user_service.verify_and_update_async", side_effect=AssertionError("hashed")):
+            response = client.post("/auth/login", json=body)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert 'login_rate_limited_total{key="email"}' in client.get("/metrics").text
+
+    def test_ip_budget_spans_accounts(self, monkeypatch):
+        """One client cycling through emails is stopped by its IP bucket."""
+        monkeypatch.setattr(rate_limit, "login_ip_limiter",
+                            rate_limit.TokenBucketLimiter(per_minute=1, burst=3, max_keys=10))
+        codes = [client.post("/auth/login", json={"email": f"u{i}@example.com", "password": "x"}).status_code
+                 for i in range(5)]
+        assert codes == [401, 401, 401, 429, 429]
+
+class TestStartup:
+    def test_create_app_builds_independent_apps(self):
+        first, second = create_app(), create_app()
+        assert first is not second
+        assert {"/healthz", "/auth/login"} <= {route.path for route in first.routes}
+
+    def test_lifespan_creates_and_disposes_engines(self, tmp_path, monkeypatch):
+        """No engine exists until startup; shutdown disposes it."""
+        from app.core import db
+        asyncio.run(db.dispose_engines())
+        monkeypatch.setattr(settings, "USER_BACKEND", "sql")
+        monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'lazy.db'}")
+        # Startup re-runs password configuration; put the suite's cost back afterwards
+        monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", security.password_rounds())
+        assert db._async_engine is None
+        with TestClient(create_app()) as started:
+            assert db._async_engine is not None
+            assert started.get("/stats/db-pool").json()["async"]["pool"] is not None
+        assert db._async_engine is None and db._engine is None
+
+    def test_migrations_skipped_at_head(self, tmp_path):
+        """The entrypoint check runs Alembic on a new database and skips it once at head."""
+        from alembic.config import Config
+        from alembic.script import ScriptDirectory
+        from app.core import migrations
+        db_path = tmp_path / "migrated.db"
+        url = f"sqlite:///{db_path}"
+        assert migrations.current_revisions(url) == set() and not db_path.exists()
+        heads = set(ScriptDirectory.from_config(Config(str(migrations.SERVICE_DIR / "alembic.ini"))).get_heads())
+        assert migrations.head_revisions() == heads
+
+        def run_check() -> str:
+            result = subprocess.run([sys.executable, "-m", "app.core.migrations"], cwd=migrations.SERVICE_DIR,
+                                    env={**os.environ, "DATABASE_URL": url}, capture_output=True, text=True, check=True)
+            return result.stderr
+
+        assert "upgraded to head" in run_check()
+        assert migrations.current_revisions(url) == heads
+        assert "already at head, skipped" in run_check()
+
+class TestThreadpool:
+    @pytest.fixture
+    def no_threadpool(self, monkeypatch):
+        """Fail any handler or dependency that FastAPI would dispatch to the worker threads."""
+        def refuse(func, *args, **kwargs):
+            raise AssertionError(f"{func!r} was sent to the threadpool")
+        import fastapi.dependencies.utils
+        import fastapi.routing
+        monkeypatch.setattr(fastapi.routing, "run_in_threadpool", refuse)
+        monkeypatch.setattr(fastapi.dependencies.utils, "run_in_threadpool", refuse)
+
+    def test_requests_stay_on_the_event_loop(self, user_service, monkeypatch, no_threadpool):
+        """Register, login and the ops endpoints run without a thread hop; hashing goes to its process pool."""
+        monkeypatch.setattr(auth_controller, "user_service", user_service)
+        body = {"email": "loop@example.com", "password": "testpassword123"}
+        assert client.post("/auth/register", json=body).status_code == 201
+        assert client.post("/auth/login", json=body).status_code == 200
+        for path in ("/healthz", "/metrics", "/stats/threadpool", "/stats/hashing", "/stats/persistence"):
+            assert client.get(path).status_code == 200, path
+
+    def test_size_is_configured_at_startup(self, monkeypatch):
+        monkeypatch.setattr(settings, "THREADPOOL_SIZE", 7)
+        monkeypatch.setattr(settings, "PASSWORD_HASH_ROUNDS", security.password_rounds())
+        with TestClient(create_app()) as started:
+            assert started.get("/stats/threadpool").json() == {"size": 7, "busy": 0, "waiting": 0}
+
 class TestHealthCheck:
     def test_health_check(self):
         """Test health check endpoint."""
@@ -0,0 +1,59 @@
+import os
+import pathlib
+import subprocess
+import sys
+import time
+import pytest
+
+from app.core.rate_limit import TokenBucketLimiter
+from app.core.security import hash_password, verify_password
+
+SERVICE_DIR = pathlib.Path(__file__).resolve().parents[1]
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2000"))
+
+def _import_profile(env: dict) -> tuple[float, set[str]]:
+    """Best-of-3 `import main` time in ms from -X importtime in a fresh interpreter, plus the modules it loaded."""
+    best, modules = float("inf"), set()
+    for _ in range(3):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=SERVICE_DIR,
+                                env={**os.environ, **env}, capture_output=True, text=True, check=True)
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        rows = [line.split("|") for line in result.stderr.splitlines() if line.startswith("import time:")][1:]
+        modules = {name.strip() for _, _, name in rows}
+        best = min(best, next(int(cumulative) for _, cumulative, name in rows if name.strip() == "main") / 1000)
+    return best, modules
+
+
+@pytest.mark.slow
+class TestRateLimitPerf:
+    def test_rejection_costs_microseconds(self):
+        """Turning away an over-budget login must be orders of magnitude cheaper than a PBKDF2 verify."""
+        limiter = TokenBucketLimiter(per_minute=1, burst=1, max_keys=100_000)
+        limiter.acquire("attacker@example.com")
+        n = 50_000
+        start = time.perf_counter()
+        rejected = sum(limiter.acquire("attacker@example.com") > 0 for _ in range(n))
+        per_call_us = (time.perf_counter() - start) / n * 1e6
+        hashed = hash_password("pw")
+        start = time.perf_counter()
+        verify_password("pw", hashed)
+        verify_us = (time.perf_counter() - start) * 1e6
+        print(f"rejection: {per_call_us:.2f} us per attempt, PBKDF2 verify {verify_us:,.0f} us")
+        assert rejected == n
+        # Both timed on this machine in this run, so the bound holds on fast and slow runners alike
+        assert per_call_us * 100 < verify_us
+
+@pytest.mark.slow
+class TestImportTime:
+    def test_import_stays_within_budget(self):
+        """Importing the app loads no database or migration stack on the memory backend and fits the budget."""
+        ms, modules = _import_profile({"USER_BACKEND": "memory"})
+        print(f"import main: {ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+        assert not {"sqlalchemy", "alembic"} & modules
+        assert ms < IMPORT_BUDGET_MS
+
+    def test_sql_backend_import_creates_no_engine(self):
+        """With the SQL backend the app imports SQLAlchemy but leaves engines to the lifespan."""
+        _, modules = _import_profile({"USER_BACKEND": "sql"})
+        assert "sqlalchemy" in modules
+        assert not {"aiosqlite", "asyncpg", "alembic"} & modules
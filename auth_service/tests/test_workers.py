@@ -0,0 +1,113 @@
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import threading
+import time
+import httpx
+import pytest
+
+SERVICE_DIR = pathlib.Path(__file__).resolve().parents[1]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class UvicornServer:
+    """`uvicorn main:app --workers N` on a shared SQLite file, migrated with Alembic like the entrypoint."""
+    def __init__(self, db_path: pathlib.Path, workers: int) -> None:
+        self.env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{db_path}",
+            "USER_BACKEND": "sql",
+            "HASH_WORKERS": "1",
+            "HASH_MAX_PENDING": "64",  # no 503 backpressure during the benchmark
+            "PASSWORD_HASH_ROUNDS": "1000",  # keep hashing out of the measurement
+            "LOGIN_IP_PER_MINUTE": "0",
+            "LOGIN_EMAIL_PER_MINUTE": "0",
+        }
+        self.workers = workers
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "UvicornServer":
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=SERVICE_DIR, env=self.env,
+                       check=True, capture_output=True)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port), "--workers", str(self.workers)],
+            cwd=SERVICE_DIR, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"{self.url}/healthz").status_code == 200:
+                    # The socket answers as soon as one worker is up; give the others time to boot
+                    time.sleep(0.5 * self.workers)
+                    return self
+            except httpx.TransportError:
+                time.sleep(0.2)
+        self.process.kill()
+        raise RuntimeError(f"uvicorn did not start: {self.process.stderr.read()}")
+
+    def __exit__(self, *exc) -> None:
+        self.process.terminate()
+        _, stderr = self.process.communicate(timeout=30)
+        self.worker_pids = stderr.count("Started server process")
+
+def fresh_client(url: str) -> httpx.Client:
+    # No keep-alive: each request is a new connection, which the kernel hands to any worker
+    return httpx.Client(base_url=url, limits=httpx.Limits(max_keepalive_connections=0))
+
+def run_threads(threads: int, work) -> list:
+    results: list = [None] * threads
+
+    def run(i: int) -> None:
+        results[i] = work(i)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return results
+
+class TestMultiWorker:
+    def test_users_are_visible_from_every_worker(self, tmp_path):
+        """Registered on one worker, logged in on another; racing registrations still yield one user."""
+        with UvicornServer(tmp_path / "auth.db", workers=2) as server:
+            with fresh_client(server.url) as http:
+                for i in range(20):
+                    body = {"email": f"user{i}@example.com", "password": "testpassword123"}
+                    assert http.post("/auth/register", json=body).status_code == 201
+                for i in range(20):
+                    body = {"email": f"user{i}@example.com", "password": "testpassword123"}
+                    assert http.post("/auth/login", json=body).status_code == 200
+
+            def register_same(i: int) -> int:
+                with fresh_client(server.url) as http:
+                    return http.post("/auth/register", json={"email": "race@example.com", "password": "pw123456"}).status_code
+
+            codes = run_threads(8, register_same)
+        assert sorted(codes) == [201] + [409] * 7
+        assert server.worker_pids == 2
+
+    @pytest.mark.slow
+    def test_throughput_single_versus_multi_worker(self, tmp_path):
+        """Login requests/s with 1 and with 2 workers; reported only, since the gain depends on spare cores."""
+        rates = {}
+        for workers in (1, 2):
+            with UvicornServer(tmp_path / f"auth{workers}.db", workers=workers) as server:
+                body = {"email": "bench@example.com", "password": "testpassword123"}
+                assert httpx.post(f"{server.url}/auth/register", json=body).status_code == 201
+
+                def login(i: int) -> int:
+                    with httpx.Client(base_url=server.url) as http:
+                        return sum(http.post("/auth/login", json=body).status_code == 200 for _ in range(50))
+
+                start = time.perf_counter()
+                ok = sum(run_threads(8, login))
+                rates[workers] = ok / (time.perf_counter() - start)
+            assert ok == 400
+            print(f"{workers} worker(s): {rates[workers]:,.0f} logins/s on {os.cpu_count()} core(s)")
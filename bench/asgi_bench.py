@@ -0,0 +1,200 @@
+"""In-process ASGI load test for auth_service and todo_service.
+
+Replays a JSONL traffic mix (one ``{"op": ..., "weight": ...}`` per line, ops:
+register, login, list, create, delete) against ``main:app`` of each service over
+httpx's ASGI transport - no sockets, no uvicorn - and writes per-route
+throughput and p50/p95/p99 latency to a JSON file.
+
+Both services import a top-level ``app`` package, so each one is driven in its
+own child process and the parent merges the results.
+
+    python bench/asgi_bench.py --mix bench/traffic.jsonl --requests 5000 --out bench_result.json
+    python bench/asgi_bench.py --baseline bench_result.json --max-regression 0.25
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SERVICE_OPS = {
+    "auth_service": {"register", "login"},
+    "todo_service": {"list", "create", "delete"},
+}
+SEED_USERS = 20
+
+def load_mix(path: str) -> list[tuple[str, float]]:
+    mix = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                mix.append((entry["op"], float(entry.get("weight", 1))))
+    return mix
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+def summarize(samples: dict[str, list[tuple[float, int]]], elapsed: float) -> dict:
+    routes = {}
+    for route, entries in sorted(samples.items()):
+        latencies = sorted(ms for ms, _ in entries)
+        routes[route] = {
+            "count": len(entries),
+            "errors": sum(1 for _, code in entries if code >= 400),
+            "status": {str(code): sum(1 for _, c in entries if c == code) for code in sorted({c for _, c in entries})},
+            "throughput_rps": round(len(entries) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+        }
+    return routes
+
+# --- worker side: runs inside one service directory --------------------------------
+
+async def _drive(service: str, ops: list[str], concurrency: int, seed: int) -> dict:
+    import httpx
+    # All bench traffic comes from one in-process client; the login limiter would turn it into 429s.
+    if service == "auth_service":
+        os.environ.setdefault("LOGIN_IP_PER_MINUTE", "0")
+        os.environ.setdefault("LOGIN_EMAIL_PER_MINUTE", "0")
+    from main import app
+
+    rng = random.Random(seed)
+    transport = httpx.ASGITransport(app=app)
+    samples: dict[str, list[tuple[float, int]]] = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def call(route: str, method: str, url: str, **kwargs) -> httpx.Response:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            samples.setdefault(route, []).append(((time.perf_counter() - start) * 1000, response.status_code))
+            return response
+
+        if service == "auth_service":
+            users = [{"email": f"seed{i}-{uuid.uuid4().hex[:8]}@bench.dev", "password": "bench-password"} for i in range(SEED_USERS)]
+            for user in users:
+                await client.post("/auth/register", json=user)
+
+            async def run_op(op: str) -> None:
+                if op == "register":
+                    body = {"email": f"{uuid.uuid4().hex}@bench.dev", "password": "bench-password"}
+                    await call("POST /auth/register", "POST", "/auth/register", json=body)
+                else:
+                    await call("POST /auth/login", "POST", "/auth/login", json=rng.choice(users))
+        else:
+            import jwt
+            from app.core.config import settings
+            exp = int(time.time()) + 3600
+            tokens = [jwt.encode({"sub": f"bench-{i}", "exp": exp}, settings.SECRET_KEY, algorithm="HS256") for i in range(SEED_USERS)]
+            owned: dict[str, list[str]] = {token: [] for token in tokens}
+            for token in tokens:
+                for i in range(50):
+                    r = await client.post("/todos/", json={"title": f"seed {i}"}, headers={"Authorization": f"Bearer {token}"})
+                    owned[token].append(r.json()["id"])
+
+            async def run_op(op: str) -> None:
+                token = rng.choice(tokens)
+                headers = {"Authorization": f"Bearer {token}"}
+                if op == "list":
+                    await call("GET /todos/", "GET", "/todos/", headers=headers)
+                elif op == "create":
+                    r = await call("POST /todos/", "POST", "/todos/", json={"title": "bench"}, headers=headers)
+                    owned[token].append(r.json()["id"])
+                elif owned[token]:
+                    todo_id = owned[token].pop(rng.randrange(len(owned[token])))
+                    await call("DELETE /todos/{id}", "DELETE", f"/todos/{todo_id}", headers=headers)
+
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        for op in ops:
+            queue.put_nowait(op)
+
+        async def worker() -> None:
+            while not queue.empty():
+                await run_op(queue.get_nowait())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"elapsed_s": round(elapsed, 3), "requests": len(ops), "routes": summarize(samples, elapsed)}
+
+def run_worker(args: argparse.Namespace) -> None:
+    service_dir = ROOT / args.worker
+    os.chdir(service_dir)
+    sys.path.insert(0, str(service_dir))
+    ops = json.loads(sys.stdin.read())
+    result = asyncio.run(_drive(args.worker, ops, args.concurrency, args.seed))
+    print(json.dumps(result))
+
+# --- parent side --------------------------------------------------------------------
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    mix = load_mix(args.mix)
+    rng = random.Random(args.seed)
+    names, weights = zip(*mix)
+    ops = rng.choices(names, weights=weights, k=args.requests)
+
+    result = {"meta": {"mix": args.mix, "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed}, "services": {}}
+    for service, service_ops in SERVICE_OPS.items():
+        selected = [op for op in ops if op in service_ops]
+        if not selected:
+            continue
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", service, "--concurrency", str(args.concurrency), "--seed", str(args.seed)],
+            input=json.dumps(selected), capture_output=True, text=True, check=True,
+        )
+        result["services"][service] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result
+
+def compare(result: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Return one message per route whose p95 regressed more than `max_regression` (0.25 = 25%)."""
+    failures = []
+    for service, data in result["services"].items():
+        for route, stats in data["routes"].items():
+            old = baseline.get("services", {}).get(service, {}).get("routes", {}).get(route)
+            if old and old["p95_ms"] and stats["p95_ms"] > old["p95_ms"] * (1 + max_regression):
+                failures.append(f"{service} {route}: p95 {old['p95_ms']}ms -> {stats['p95_ms']}ms")
+    return failures
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", default=str(ROOT / "bench" / "traffic.jsonl"))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="bench_result.json")
+    parser.add_argument("--baseline", help="previous result JSON to gate p95 regressions against")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    parser.add_argument("--worker", choices=sorted(SERVICE_OPS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    result = run_benchmark(args)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    for service, data in result["services"].items():
+        for route, stats in data["routes"].items():
+            print(f"{service:<13} {route:<20} {stats['throughput_rps']:>9} rps  "
+                  f"p50 {stats['p50_ms']:>8}ms  p95 {stats['p95_ms']:>8}ms  p99 {stats['p99_ms']:>8}ms  status {stats['status']}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(result, json.load(f), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Many-connection load test against a real uvicorn server.
+
+Starts ``uvicorn main:app`` for one service (memory backend) and holds
+``--connections`` keep-alive HTTP/1.1 connections open, each sending requests
+back to back for ``--duration`` seconds, cycling through ``--paths``. The
+client is plain asyncio streams so that it stays cheap next to the server on
+small machines. Writes per-path throughput and p50/p95/p99 latency as JSON.
+
+    python bench/conn_bench.py --service todo_service --connections 500 --duration 10
+    THREADPOOL_SIZE=100 python bench/conn_bench.py --out conn_result.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import jwt
+
+ROOT = Path(__file__).resolve().parents[1]
+SECRET = "bench-secret"
+DEFAULT_PATHS = {
+    "todo_service": ["/healthz", "/todos/?limit=20"],
+    "auth_service": ["/healthz", "/stats/hashing"],
+}
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(service: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, "SECRET_KEY": SECRET, "TODO_BACKEND": "memory", "USER_BACKEND": "memory", "PERSIST_DIR": ""}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--backlog", "4096",
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT / service, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("uvicorn did not start")
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, raw: bytes) -> int:
+    writer.write(raw)
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head[9:12])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line[:15].lower() == b"content-length:":
+            length = int(line[15:])
+    if length:
+        await reader.readexactly(length)
+    return status
+
+def raw_request(method: str, path: str, headers: dict, body: bytes = b"") -> bytes:
+    lines = [f"{method} {path} HTTP/1.1", "Host: bench", *(f"{k}: {v}" for k, v in headers.items())]
+    if body:
+        lines.append(f"Content-Length: {len(body)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+async def connection(port: int, requests: list[tuple[str, bytes]], start: asyncio.Event, stop: asyncio.Event,
+                     samples: dict[str, list[float]], errors: dict[str, int], offset: int) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    await start.wait()
+    i = offset
+    try:
+        while not stop.is_set():
+            path, raw = requests[i % len(requests)]
+            i += 1
+            sent = time.perf_counter()
+            status = await request(reader, writer, raw)
+            samples[path].append((time.perf_counter() - sent) * 1000)
+            if status >= 400:
+                errors[path] += 1
+    finally:
+        writer.close()
+
+async def drive(service: str, port: int, paths: list[str], connections: int, duration: float) -> dict:
+    token = jwt.encode({"sub": "bench@example.com", "exp": int(time.time()) + 3600}, SECRET, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    if service == "todo_service":
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for n in range(20):
+            body = json.dumps({"title": f"bench todo {n}"}).encode()
+            await request(reader, writer, raw_request("POST", "/todos/", {**headers, "Content-Type": "application/json"}, body))
+        writer.close()
+
+    requests = [(path, raw_request("GET", path, headers)) for path in paths]
+    samples: dict[str, list[float]] = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+    start, stop = asyncio.Event(), asyncio.Event()
+    tasks = [asyncio.create_task(connection(port, requests, start, stop, samples, errors, n))
+             for n in range(connections)]
+    await asyncio.sleep(1)  # let every connection finish its handshake before the clock starts
+    began = time.perf_counter()
+    start.set()
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)  # each connection finishes its in-flight request
+    elapsed = time.perf_counter() - began
+    routes = {}
+    for path, values in samples.items():
+        values.sort()
+        routes[path] = {
+            "count": len(values),
+            "errors": errors[path],
+            "throughput_rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+        }
+    return routes
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--service", default="todo_service", choices=sorted(DEFAULT_PATHS))
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--paths", help="comma-separated request paths (default: per service)")
+    parser.add_argument("--out", help="write the JSON result here as well as to stdout")
+    args = parser.parse_args()
+    paths = args.paths.split(",") if args.paths else DEFAULT_PATHS[args.service]
+
+    port = free_port()
+    server = start_server(args.service, port)
+    try:
+        routes = asyncio.run(drive(args.service, port, paths, args.connections, args.duration))
+    finally:
+        server.terminate()
+        server.wait()
+    result = {"service": args.service, "connections": args.connections, "duration_s": args.duration,
+              "threadpool_size": os.environ.get("THREADPOOL_SIZE", "default"), "routes": routes}
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
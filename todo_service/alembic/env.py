@@ -6,7 +6,7 @@ from sqlalchemy import engine_from_config, pool
 from alembic import context
 from sqlmodel import SQLModel
 from app.core.config import settings
-from app.models import Todo
+from app.models import Todo, TodoVersion
 
 config = context.config
 if not config.get_main_option("sqlalchemy.url"):
@@ -0,0 +1,16 @@
+from alembic import op
+
+revision = '0002_todo_user_id_id_index'
+down_revision = '0001_init'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Composite index for keyset pagination; it also covers user_id-only lookups,
+    # so the single-column index becomes redundant.
+    op.create_index('ix_todo_user_id_id', 'todo', ['user_id', 'id'])
+    op.drop_index('ix_todo_user_id', table_name='todo')
+
+def downgrade() -> None:
+    op.create_index('ix_todo_user_id', 'todo', ['user_id'])
+    op.drop_index('ix_todo_user_id_id', table_name='todo')
@@ -0,0 +1,17 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003_todo_version'
+down_revision = '0002_todo_user_id_id_index'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'todo_version',
+        sa.Column('user_id', sa.String(), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+def downgrade() -> None:
+    op.drop_table('todo_version')
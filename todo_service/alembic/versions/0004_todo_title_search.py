@@ -0,0 +1,40 @@
+from alembic import op
+
+revision = '0004_todo_title_search'
+down_revision = '0003_todo_version'
+branch_labels = None
+depends_on = None
+
+# Kept in step with SQLITE_TITLE_SEARCH_DDL in app/models.py; 0006 moves the Postgres index to accent-folded titles
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS todo_fts USING fts5("
+    "title, content='todo', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS todo_fts_ai AFTER INSERT ON todo BEGIN "
+    "INSERT INTO todo_fts(rowid, title) VALUES (new.rowid, new.title); END",
+    "CREATE TRIGGER IF NOT EXISTS todo_fts_ad AFTER DELETE ON todo BEGIN "
+    "INSERT INTO todo_fts(todo_fts, rowid, title) VALUES ('delete', old.rowid, old.title); END",
+    "CREATE TRIGGER IF NOT EXISTS todo_fts_au AFTER UPDATE OF title ON todo BEGIN "
+    "INSERT INTO todo_fts(todo_fts, rowid, title) VALUES ('delete', old.rowid, old.title); "
+    "INSERT INTO todo_fts(rowid, title) VALUES (new.rowid, new.title); END",
+    # Index the rows that existed before the migration
+    "INSERT INTO todo_fts(todo_fts) VALUES ('rebuild')",
+)
+POSTGRES_UPGRADE = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_todo_title_trgm ON todo USING gin (title gin_trgm_ops)",
+)
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    statements = {"sqlite": SQLITE_UPGRADE, "postgresql": POSTGRES_UPGRADE}.get(dialect, ())
+    for statement in statements:
+        op.execute(statement)
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for trigger in ("todo_fts_ai", "todo_fts_ad", "todo_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS todo_fts")
+    elif dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_todo_title_trgm")
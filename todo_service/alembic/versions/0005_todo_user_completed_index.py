@@ -0,0 +1,12 @@
+from alembic import op
+
+revision = '0005_todo_user_completed_index'
+down_revision = '0004_todo_title_search'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index('ix_todo_user_id_completed_id', 'todo', ['user_id', 'completed', 'id'])
+
+def downgrade() -> None:
+    op.drop_index('ix_todo_user_id_completed_id', table_name='todo')
@@ -0,0 +1,29 @@
+from alembic import op
+
+revision = '0006_todo_title_unaccent'
+down_revision = '0005_todo_user_completed_index'
+branch_labels = None
+depends_on = None
+
+# Kept in step with POSTGRES_TITLE_SEARCH_DDL in app/models.py. SQLite's FTS5 table already
+# folds accents (remove_diacritics 2), so only Postgres changes here.
+POSTGRES_UPGRADE = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() is only STABLE (its dictionary could change), so an index needs this IMMUTABLE
+    # wrapper; the dictionary is named explicitly so search_path cannot change its meaning
+    "CREATE OR REPLACE FUNCTION todo_unaccent(text) RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+    "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+    "CREATE INDEX IF NOT EXISTS ix_todo_title_unaccent_trgm ON todo USING gin (todo_unaccent(title) gin_trgm_ops)",
+    "DROP INDEX IF EXISTS ix_todo_title_trgm",
+)
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        for statement in POSTGRES_UPGRADE:
+            op.execute(statement)
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE INDEX IF NOT EXISTS ix_todo_title_trgm ON todo USING gin (title gin_trgm_ops)")
+        op.execute("DROP INDEX IF EXISTS ix_todo_title_unaccent_trgm")
+        op.execute("DROP FUNCTION IF EXISTS todo_unaccent(text)")
@@ -1,14 +1,173 @@
-from app.schemas.todo import TodoCreate, TodoOut
+import hashlib
+import inspect
+import json
+import time
+from typing import AsyncIterator, Optional
+from app.schemas.todo import TodoCreate, TodoOut, TodoBatch, TodoBatchDelete
 from app.services.todo_service import todo_service
+from app.core.config import settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.list_cache import ListCache
+from app.core.events import EventHub
+from app.core.metrics import REGISTRY
+
+TODO_SERVICE_SECONDS = REGISTRY.histogram("todo_service_op_seconds", "TodoService call latency by operation", ("op",))
+
+# Fed here rather than by each store, so every backend's writes reach GET /todos/events
+event_hub = EventHub(settings.TODO_EVENTS_BUFFER, settings.TODO_EVENTS_MAX_USERS, settings.TODO_EVENTS_MAX_PENDING)
+
+REGISTRY.callback("todo_events_subscribers", "Open GET /todos/events streams", lambda: event_hub.subscribers)
+REGISTRY.callback("todo_events_published_total", "Todo changes published to the event hub", lambda: event_hub.published, kind="counter")
+REGISTRY.callback("todo_events_resets_total", "Event streams told to refetch because their Last-Event-ID was unknown or too old",
+                  lambda: event_hub.resets, kind="counter")
+
+def _list_cache():
+    # Only the SQL store is wrapped in a read cache (TODO_CACHE_BACKEND)
+    return getattr(todo_service, "cache", None)
+
+def _cache_value(read) -> float:
+    cache = _list_cache()
+    return read(cache) if cache is not None else 0
+
+REGISTRY.callback("todo_cache_hits_total", "List, version and stats reads served from the todo cache",
+                  lambda: _cache_value(lambda c: c.hits), kind="counter")
+REGISTRY.callback("todo_cache_misses_total", "Todo cache lookups that went to the database",
+                  lambda: _cache_value(lambda c: c.misses), kind="counter")
+REGISTRY.callback("todo_cache_hit_ratio", "Share of todo cache lookups served from the cache", lambda: _cache_value(ListCache.hit_ratio))
+REGISTRY.callback("todo_cache_memory_bytes", "Memory held by the todo cache (Redis: used_memory at the last scrape)",
+                  lambda: _cache_value(lambda c: c.memory_bytes))
+REGISTRY.callback("todo_cache_errors_total", "Todo cache calls that failed and fell back to the database",
+                  lambda: _cache_value(lambda c: c.errors), kind="counter")
+
+async def _resolve(result):
+    # The in-memory store answers synchronously; the SQL store returns coroutines
+    return await result if inspect.isawaitable(result) else result
+
+async def _call(op: str, *args, **kwargs):
+    """Invoke todo_service.<op> and record its latency."""
+    start = time.perf_counter()
+    try:
+        return await _resolve(getattr(todo_service, op)(*args, **kwargs))
+    finally:
+        TODO_SERVICE_SECONDS.observe(time.perf_counter() - start, op)
+
+async def _write(op: str, *args, **kwargs):
+    """Like _call, but for writes: with a persistent in-memory store, return once the change is fsynced."""
+    result = await _call(op, *args, **kwargs)
+    persistence = getattr(todo_service, "persistence", None)
+    if persistence is not None:
+        # Parks this request only; the group-commit thread fsyncs it together with its neighbours
+        await persistence.wait_async()
+    return result
+
+# cache_stats()
+async def cache_stats() -> dict:
+    """Hit ratio, memory and invalidations of the SQL store's read cache, if one is configured."""
+    cache = _list_cache()
+    return await cache.stats() if cache is not None else {"enabled": False}
+
+# page_query()
+def page_query(limit: Optional[int], after: Optional[str]) -> tuple[int, Optional[str]]:
+    """Clamp `limit` to the page size bounds and decode `after`; a malformed cursor raises ValueError."""
+    return min(limit or settings.TODO_PAGE_SIZE, settings.TODO_MAX_PAGE_SIZE), decode_cursor(after) if after else None
+
+# todos_etag()
+async def todos_etag(user_id: str, *, limit: int, after: Optional[str], completed: Optional[bool], media_type: str) -> str:
+    """Weak ETag for one page of the user's todo list.
+
+    The store's per-user version changes on every write; the page, filter and
+    media type are hashed in so each URL and representation gets its own tag.
+    """
+    version = await _call("version_for_user", user_id)
+    # hashlib rather than hash(): every worker must derive the same tag
+    variant = hashlib.blake2b(repr((limit, after, completed, media_type)).encode(), digest_size=6).hexdigest()
+    return f'W/"{version}-{variant}"'
+
+# etag_matches()
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison and may list several tags or "*"
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
 
 # list_todos()
-def list_todos(user_id: str):
-    return todo_service.list_for_user(user_id)
+async def list_todos(user_id: str, *, limit: Optional[int] = None, after: Optional[str] = None,
+                     completed: Optional[bool] = None) -> tuple[list[dict], Optional[str]]:
+    """Return one page of todos and the opaque cursor for the next page (None on the last page)."""
+    limit, after_key = page_query(limit, after)
+    items, next_key = await _call("list_page_for_user", user_id, limit=limit, after=after_key, completed=completed)
+    return items, encode_cursor(next_key) if next_key is not None else None
+
+# todo_stats()
+async def todo_stats(user_id: str) -> dict:
+    return await _call("stats_for_user", user_id)
+
+# search_todos()
+async def search_todos(user_id: str, query: str, *, limit: Optional[int] = None, after: Optional[str] = None) -> tuple[list[dict], Optional[str]]:
+    """Return one page of todos whose title matches `query`, paginated like list_todos."""
+    limit, after_key = page_query(limit, after)
+    items, next_key = await _call("search_for_user", user_id, query, limit=limit, after=after_key)
+    return items, encode_cursor(next_key) if next_key is not None else None
 
 # create_todo()
-def create_todo(user_id: str, payload: TodoCreate):
-    return todo_service.create_for_user(user_id, payload.title, payload.completed)
+async def create_todo(user_id: str, payload: TodoCreate):
+    todo = await _write("create_for_user", user_id, payload.title, payload.completed)
+    event_hub.publish(user_id, "created", todo)
+    return todo
 
 # delete_todo()
-def delete_todo(user_id: str, todo_id: str) -> bool:
-    return todo_service.delete_for_user(user_id, todo_id)
+async def delete_todo(user_id: str, todo_id: str) -> bool:
+    deleted = await _write("delete_for_user", user_id, todo_id)
+    if deleted:
+        event_hub.publish(user_id, "deleted", {"id": todo_id})
+    return deleted
+
+# todo_events()
+def todo_events(user_id: str, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+    """SSE body of the user's todo changes, resuming after `last_event_id` when it is still buffered."""
+    return event_hub.listen(user_id, last_event_id, heartbeat=settings.TODO_EVENTS_HEARTBEAT_SECONDS)
+
+async def _aiter(rows):
+    # Same split as _resolve: in-memory rows come from a plain generator
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+# export_todos()
+async def export_todos(user_id: str) -> AsyncIterator[bytes]:
+    """Yield the user's todos as NDJSON, one bytes chunk per TODO_EXPORT_CHUNK rows."""
+    chunk_size = settings.TODO_EXPORT_CHUNK
+    lines: list[str] = []
+    async for todo in _aiter(todo_service.iter_for_user(user_id, chunk_size=chunk_size)):
+        lines.append(json.dumps(todo, separators=(",", ":")))
+        if len(lines) >= chunk_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines.clear()
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+# apply_batch()
+async def apply_batch(user_id: str, payload: TodoBatch) -> dict:
+    operations = [op.model_dump(exclude_none=True) for op in payload.operations]
+    todos = await _write("apply_batch_for_user", user_id, operations)
+    for op, todo in zip(operations, todos):
+        if todo is not None:
+            event_hub.publish(user_id, "created" if op["op"] == "create" else "updated", todo)
+    return {"results": [
+        {"index": i, "ok": todo is not None, "id": todo["id"] if todo else op.get("id"),
+         "todo": todo, "error": None if todo else "Todo not found"}
+        for i, (op, todo) in enumerate(zip(operations, todos))
+    ]}
+
+# delete_batch()
+async def delete_batch(user_id: str, payload: TodoBatchDelete) -> dict:
+    deleted = await _write("delete_many_for_user", user_id, payload.ids)
+    for todo_id, ok in zip(payload.ids, deleted):
+        if ok:
+            event_hub.publish(user_id, "deleted", {"id": todo_id})
+    return {"results": [
+        {"index": i, "ok": ok, "id": todo_id, "error": None if ok else "Todo not found"}
+        for i, (todo_id, ok) in enumerate(zip(payload.ids, deleted))
+    ]}
@@ -5,5 +5,43 @@ class Settings(BaseModel):
     APP_NAME: str = "todo_service"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret")
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./todo.db")
+    # Read replica for request-path reads ("" = read from DATABASE_URL); Alembic only ever targets the primary
+    DATABASE_REPLICA_URL: str = os.getenv("DATABASE_REPLICA_URL", "")
+    READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))  # after a write, that user's reads stay on the primary this long
+    THREADPOOL_SIZE: int = int(os.getenv("THREADPOOL_SIZE", "40"))  # AnyIO worker threads for sync handlers and offloaded blocking calls
+    # Connection pool (ignored where the pool has no size, e.g. in-memory SQLite)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "-1"))  # seconds before a connection is replaced; -1 = never
+    # Pre-ping costs a round trip per checkout; with it off, rely on DB_POOL_RECYCLE and
+    # SQLAlchemy invalidating the pool after the first disconnect error
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # file SQLite (WAL mode): wait this long for another process's write lock
+    JWT_CACHE_SIZE: int = int(os.getenv("JWT_CACHE_SIZE", "10000"))  # verified bearer tokens kept in memory; 0 disables
+    TODO_BACKEND: str = os.getenv("TODO_BACKEND", "memory")  # "memory" (process-local), "sql" (DATABASE_URL, async driver) or "sharded"
+    # "sharded" backend: one database per entry, users placed on a consistent-hash ring. Shards are
+    # named shard0, shard1, ... in list order, so add new ones at the end (then run app.core.rebalance)
+    TODO_SHARD_URLS: list[str] = [u.strip() for u in os.getenv("TODO_SHARD_URLS", "").split(",") if u.strip()]
+    TODO_SHARD_VNODES: int = int(os.getenv("TODO_SHARD_VNODES", "64"))  # ring points per shard; more = more even spread
+    # Read cache in front of the sql backend: "none", "memory" (per process) or "redis" (TODO_CACHE_URL, shared by workers)
+    TODO_CACHE_BACKEND: str = os.getenv("TODO_CACHE_BACKEND", "none")
+    TODO_CACHE_URL: str = os.getenv("TODO_CACHE_URL", "redis://localhost:6379/0")
+    TODO_CACHE_MAX_BYTES: int = int(os.getenv("TODO_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # memory backend; Redis is bounded by its maxmemory
+    TODO_CACHE_TTL_SECONDS: float = float(os.getenv("TODO_CACHE_TTL_SECONDS", "60"))
+    # Optional durability for the memory backend: write-ahead log + snapshots in this directory ("" = off)
+    PERSIST_DIR: str = os.getenv("PERSIST_DIR", "")
+    PERSIST_GROUP_COMMIT_MS: float = float(os.getenv("PERSIST_GROUP_COMMIT_MS", "2"))  # wait this long to batch writes into one fsync
+    PERSIST_SYNC_COMMIT: bool = os.getenv("PERSIST_SYNC_COMMIT", "true").lower() in ("1", "true", "yes")  # acknowledge writes only after fsync
+    PERSIST_SNAPSHOT_EVERY: int = int(os.getenv("PERSIST_SNAPSHOT_EVERY", "100000"))  # log records between snapshots; 0 = never
+    TODO_PAGE_SIZE: int = int(os.getenv("TODO_PAGE_SIZE", "100"))  # default page size for GET /todos
+    TODO_MAX_PAGE_SIZE: int = int(os.getenv("TODO_MAX_PAGE_SIZE", "500"))  # hard cap on ?limit=
+    TODO_EXPORT_CHUNK: int = int(os.getenv("TODO_EXPORT_CHUNK", "500"))  # rows per streamed chunk in GET /todos/export
+    TODO_BATCH_MAX: int = int(os.getenv("TODO_BATCH_MAX", "500"))  # operations accepted per batch request
+    # GET /todos/events (Server-Sent Events). The hub is per process: a stream sees the writes its own worker handles
+    TODO_EVENTS_BUFFER: int = int(os.getenv("TODO_EVENTS_BUFFER", "256"))  # recent events kept per user for Last-Event-ID resume
+    TODO_EVENTS_MAX_USERS: int = int(os.getenv("TODO_EVENTS_MAX_USERS", "10000"))  # users whose buffers are kept (LRU; open streams are never dropped)
+    TODO_EVENTS_MAX_PENDING: int = int(os.getenv("TODO_EVENTS_MAX_PENDING", "1000"))  # undelivered events per stream before it gets a reset instead
+    TODO_EVENTS_HEARTBEAT_SECONDS: float = float(os.getenv("TODO_EVENTS_HEARTBEAT_SECONDS", "15"))  # comment line sent on idle streams
 
 settings = Settings()
@@ -1,14 +1,207 @@
-from contextlib import contextmanager
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from typing import Callable, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .config import settings
+from .metrics import REGISTRY, instrument_pool
 
-engine = create_engine(settings.DATABASE_URL, echo=False, pool_pre_ping=True)
+DB_READS = REGISTRY.counter("db_reads_total", "Request-path reads by the engine that served them", ("engine",))
+
+# Async driver used for each backend; Alembic and init_db keep the sync engine
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def async_url(url: str) -> str:
+    """Rewrite a sync DATABASE_URL (psycopg2, pysqlite) to its async driver."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return url
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def pool_options(url: str) -> dict:
+    """create_engine() pool arguments from Settings; sizing only applies to queue-style pools."""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "pool_recycle": settings.DB_POOL_RECYCLE}
+    parsed = make_url(url)
+    if not issubclass(parsed.get_dialect().get_pool_class(parsed), QueuePool):
+        # e.g. SQLite's singleton/null pools, which reject size arguments
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return options
+
+def pool_state(engine: Engine) -> dict:
+    """Point-in-time view of an engine's pool for the diagnostics endpoint."""
+    pool = engine.pool
+    state = {"pool": type(pool).__name__}
+    for attr in ("size", "checkedin", "checkedout", "overflow", "timeout"):
+        method = getattr(pool, attr, None)
+        if callable(method):
+            state[attr] = method()
+    return state
+
+def sqlite_pragmas(engine: Engine) -> None:
+    """Put file-backed SQLite in WAL mode so several worker processes can share the database.
+
+    WAL lets readers proceed while one process writes; busy_timeout makes a
+    writer wait for the lock instead of failing with "database is locked".
+    """
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA synchronous=NORMAL")  # fsync at checkpoints; still durable across app crashes
+        cursor.close()
+
+# Engines are created on first use (or by the app lifespan), never at import: importing the
+# app, Alembic or a test module opens no pool and loads no DB driver
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_replica_engine: Optional[AsyncEngine] = None
+_shard_engines: Optional[dict[str, AsyncEngine]] = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> Engine:
+    """The sync engine for settings.DATABASE_URL, created on first call."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            engine = create_engine(settings.DATABASE_URL, echo=False, **pool_options(settings.DATABASE_URL))
+            sqlite_pragmas(engine)
+            instrument_pool(engine, "sync")
+            _engine = engine
+        return _engine
+
+def get_async_engine() -> AsyncEngine:
+    """The async engine for settings.DATABASE_URL (async driver), created on first call."""
+    global _async_engine
+    with _engine_lock:
+        if _async_engine is None:
+            url = async_url(settings.DATABASE_URL)
+            engine = create_async_engine(url, echo=False, **pool_options(url))
+            sqlite_pragmas(engine.sync_engine)
+            instrument_pool(engine.sync_engine, "async")
+            _async_engine = engine
+        return _async_engine
+
+def get_replica_async_engine() -> AsyncEngine:
+    """The async engine for settings.DATABASE_REPLICA_URL, or the primary's when no replica is set."""
+    global _replica_engine
+    if not settings.DATABASE_REPLICA_URL:
+        return get_async_engine()
+    with _engine_lock:
+        if _replica_engine is None:
+            url = async_url(settings.DATABASE_REPLICA_URL)
+            engine = create_async_engine(url, echo=False, **pool_options(url))
+            sqlite_pragmas(engine.sync_engine)
+            instrument_pool(engine.sync_engine, "replica")
+            _replica_engine = engine
+        return _replica_engine
+
+def get_shard_engines() -> dict[str, AsyncEngine]:
+    """One async engine, with its own pool, per settings.TODO_SHARD_URLS entry, keyed by ring name."""
+    global _shard_engines
+    with _engine_lock:
+        if _shard_engines is None:
+            from .hash_ring import shard_names
+            engines = {}
+            for name, shard_url in zip(shard_names(settings.TODO_SHARD_URLS), settings.TODO_SHARD_URLS):
+                url = async_url(shard_url)
+                engine = create_async_engine(url, echo=False, **pool_options(url))
+                sqlite_pragmas(engine.sync_engine)
+                instrument_pool(engine.sync_engine, name)
+                engines[name] = engine
+            _shard_engines = engines
+        return _shard_engines
+
+async def dispose_engines() -> None:
+    """Close every pool created so far; the next get_*engine() call starts fresh ones."""
+    global _engine, _async_engine, _replica_engine, _shard_engines
+    with _engine_lock:
+        engine, async_engine, replica_engine, shard_engines = _engine, _async_engine, _replica_engine, _shard_engines
+        _engine = _async_engine = _replica_engine = _shard_engines = None
+    for created in (async_engine, replica_engine, *(shard_engines or {}).values()):
+        if created is not None:
+            await created.dispose()
+    if engine is not None:
+        engine.dispose()
+
+class WritePins:
+    """Keys written in the last `window` seconds, whose reads must not see replica lag.
+
+    Every pin lasts the same `window`, so insertion order is expiry order and
+    expired pins are dropped from the front. Pins are per process: a write
+    on one worker does not pin the user's reads on another.
+    """
+    def __init__(self, window: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.window = window
+        self._clock = clock
+        self._expiry: OrderedDict[str, float] = OrderedDict()
+
+    def pin(self, key: str) -> None:
+        now = self._clock()
+        self._expiry[key] = now + self.window
+        self._expiry.move_to_end(key)
+        while self._expiry:
+            oldest, expires = next(iter(self._expiry.items()))
+            if expires > now:
+                break
+            del self._expiry[oldest]
+
+    def pinned(self, key: str) -> bool:
+        expires = self._expiry.get(key)
+        return expires is not None and expires > self._clock()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+write_pins = WritePins(settings.READ_YOUR_WRITES_SECONDS)
+
+def read_engine(key: str, primary: Optional[AsyncEngine] = None, replica: Optional[AsyncEngine] = None) -> AsyncEngine:
+    """Engine for a request-path read on behalf of `key`.
+
+    The replica serves it unless `key` wrote within the read-your-writes
+    window. Stores built on one explicit engine read from that engine.
+    """
+    if write_pins.pinned(key) or (primary is not None and replica is None):
+        DB_READS.inc("primary")
+        return primary or get_async_engine()
+    engine = replica or get_replica_async_engine()
+    DB_READS.inc("primary" if engine is _async_engine else "replica")
+    return engine
+
+def pool_stats() -> dict:
+    engines = {"sync": _engine, "async": _async_engine.sync_engine if _async_engine is not None else None}
+    if settings.DATABASE_REPLICA_URL:
+        engines["replica"] = _replica_engine.sync_engine if _replica_engine is not None else None
+    for name, engine in (_shard_engines or {}).items():
+        engines[name] = engine.sync_engine
+    return {name: pool_state(engine) if engine is not None else {"pool": None}
+            for name, engine in engines.items()}
 
 def init_db():
     # For local dev convenience; production relies on Alembic
-    SQLModel.metadata.create_all(engine)
+    SQLModel.metadata.create_all(get_engine())
 
 @contextmanager
-def session_scope():
-    with Session(engine) as session:
+def session_scope(bind: Optional[Engine] = None):
+    with Session(bind or get_engine()) as session:
+        yield session
+
+@asynccontextmanager
+async def async_session_scope(bind: Optional[AsyncEngine] = None):
+    async with AsyncSession(bind or get_async_engine(), expire_on_commit=False) as session:
         yield session
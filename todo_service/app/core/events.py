@@ -0,0 +1,130 @@
+"""Fan-out of todo changes to Server-Sent Events subscribers, within one process.
+
+Each change is encoded once as an SSE frame. The frame goes into the user's
+ring buffer, used to resume streams, and onto the pending queue of each of
+that user's open streams. An idle stream costs one parked future and a
+heartbeat timer, and no task of its own beyond the response.
+"""
+import asyncio
+import secrets
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Optional
+import orjson
+
+RESET_FRAME = b"event: reset\ndata: {}\n\n"  # the client missed events: refetch the list, then keep listening
+
+class _UserStream:
+    __slots__ = ("buffer", "floor", "subscribers")
+
+    def __init__(self, buffer_size: int, floor: int) -> None:
+        self.buffer: deque[tuple[int, bytes]] = deque(maxlen=buffer_size)
+        self.floor = floor  # a Last-Event-ID below this may have missed events the buffer no longer holds
+        self.subscribers: set["_Subscriber"] = set()
+
+class _Subscriber:
+    __slots__ = ("pending", "waiter")
+
+    def __init__(self) -> None:
+        self.pending: deque[bytes] = deque()
+        self.waiter: Optional[asyncio.Future] = None
+
+    def push(self, frame: bytes, max_pending: int) -> None:
+        if len(self.pending) >= max_pending:
+            # A reader this far behind gets a reset instead of an unbounded queue
+            self.pending.clear()
+            frame = RESET_FRAME
+        self.pending.append(frame)
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+class EventHub:
+    """Per-user ring buffers of recent changes and the streams to fan them out to.
+
+    Event ids are ``<epoch>-<seq>``. The seq is one counter shared by all users.
+    The epoch is random per hub, so an id issued by another worker or an
+    earlier process is recognised and answered with a reset. Buffers are kept
+    for the `max_users` most recently active users, but never dropped while
+    streams are open. Only the event loop touches the hub.
+    """
+    def __init__(self, buffer_size: int, max_users: int, max_pending: int) -> None:
+        self.buffer_size = buffer_size
+        self.max_users = max_users
+        self.max_pending = max_pending
+        self.epoch = secrets.token_hex(4)
+        self.published = 0
+        self.resets = 0
+        self.subscribers = 0
+        self._seq = 0
+        self._users: OrderedDict[str, _UserStream] = OrderedDict()
+
+    def _stream(self, user_id: str) -> _UserStream:
+        stream = self._users.get(user_id)
+        if stream is None:
+            # Nothing before this point is known for the user: resuming from earlier ids resets
+            stream = self._users[user_id] = _UserStream(self.buffer_size, self._seq)
+            self._evict()
+        else:
+            self._users.move_to_end(user_id)
+        return stream
+
+    def _evict(self) -> None:
+        for _ in range(len(self._users) - self.max_users):
+            user_id, stream = next(iter(self._users.items()))
+            if stream.subscribers:
+                self._users.move_to_end(user_id)
+            else:
+                del self._users[user_id]
+
+    # publish()
+    def publish(self, user_id: str, event: str, data: dict) -> None:
+        stream = self._stream(user_id)
+        self._seq += 1
+        frame = b"id: %s-%d\nevent: %s\ndata: %s\n\n" % (self.epoch.encode(), self._seq, event.encode(), orjson.dumps(data))
+        if len(stream.buffer) == stream.buffer.maxlen:
+            stream.floor = stream.buffer[0][0]
+        stream.buffer.append((self._seq, frame))
+        self.published += 1
+        for subscriber in stream.subscribers:
+            subscriber.push(frame, self.max_pending)
+
+    def _backlog(self, stream: _UserStream, last_event_id: str) -> list[bytes]:
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) < stream.floor:
+            self.resets += 1
+            return [RESET_FRAME]
+        after = int(seq)
+        return [frame for event_seq, frame in stream.buffer if event_seq > after]
+
+    # listen()
+    async def listen(self, user_id: str, last_event_id: Optional[str] = None, *,
+                     heartbeat: float = 15.0) -> AsyncIterator[bytes]:
+        """SSE body for one stream: missed events since `last_event_id`, then live ones, with heartbeats."""
+        stream = self._stream(user_id)
+        subscriber = _Subscriber()
+        if last_event_id:
+            subscriber.pending.extend(self._backlog(stream, last_event_id))
+        stream.subscribers.add(subscriber)
+        self.subscribers += 1
+        loop = asyncio.get_running_loop()
+        try:
+            yield b": connected\n\n"  # flushes the headers so the client sees the stream open
+            while True:
+                if not subscriber.pending:
+                    subscriber.waiter = loop.create_future()
+                    try:
+                        await asyncio.wait_for(subscriber.waiter, heartbeat)
+                    except TimeoutError:
+                        yield b": keep-alive\n\n"
+                        continue
+                    finally:
+                        subscriber.waiter = None
+                frames = b"".join(subscriber.pending)
+                subscriber.pending.clear()
+                yield frames
+        finally:
+            stream.subscribers.discard(subscriber)
+            self.subscribers -= 1
+
+    def stats(self) -> dict:
+        return {"subscribers": self.subscribers, "users_buffered": len(self._users),
+                "published": self.published, "resets": self.resets, "epoch": self.epoch}
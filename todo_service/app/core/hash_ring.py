@@ -0,0 +1,29 @@
+import bisect
+import hashlib
+from typing import Sequence
+
+def _point(value: str) -> int:
+    # Stable across processes and restarts, unlike the built-in (salted) str hash
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+def shard_names(urls: Sequence[str]) -> list[str]:
+    """Ring names for the shard URLs, by position: renaming a URL keeps its users, reordering moves them."""
+    return [f"shard{i}" for i in range(len(urls))]
+
+class HashRing:
+    """Consistent-hash ring: every shard owns `vnodes` points and a key belongs to the next point clockwise.
+
+    Adding a shard to N others takes over about 1/(N+1) of the keys, all of
+    them from the existing shards; no key moves between two old shards.
+    """
+    def __init__(self, shards: Sequence[str], vnodes: int = 64) -> None:
+        if not shards:
+            raise ValueError("HashRing needs at least one shard")
+        self.shards = list(shards)
+        ring = sorted((_point(f"{shard}#{i}"), shard) for shard in self.shards for i in range(vnodes))
+        self._points = [point for point, _ in ring]
+        self._owners = [shard for _, shard in ring]
+
+    def shard_for(self, key: str) -> str:
+        index = bisect.bisect_right(self._points, _point(key))
+        return self._owners[index % len(self._owners)]
@@ -0,0 +1,201 @@
+"""Per-user read cache for the SQL todo store.
+
+Values are opaque bytes stored under ``(user_id, field)``. Every user has a
+generation token: ``get`` returns the token it saw, ``put`` files the value
+under that token, and ``invalidate`` replaces the token. A reader that
+loaded from the database while a write committed therefore files its
+result under a token that is already dead, and no later ``get`` returns it.
+"""
+import secrets
+import time
+from collections import OrderedDict
+from typing import Optional
+
+ENTRY_OVERHEAD = 96  # bytes charged per cached value and per user on top of the payload
+
+class ListCache:
+    """Hit/miss accounting shared by the backends."""
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def memory_bytes(self) -> int:
+        raise NotImplementedError
+
+    async def get(self, user_id: str, field: str) -> tuple[Optional[bytes], object]:
+        raise NotImplementedError
+
+    async def put(self, user_id: str, field: str, token: object, value: bytes) -> None:
+        raise NotImplementedError
+
+    async def invalidate(self, user_id: str) -> None:
+        raise NotImplementedError
+
+    async def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": round(self.hit_ratio(), 4),
+                "invalidations": self.invalidations, "errors": self.errors, "memory_bytes": self.memory_bytes}
+
+    async def close(self) -> None:
+        pass
+
+class _UserEntry:
+    __slots__ = ("pages", "size")
+
+    def __init__(self) -> None:
+        self.pages: dict[str, tuple[float, bytes]] = {}  # field -> (expires, value)
+        self.size = ENTRY_OVERHEAD
+
+class MemoryListCache(ListCache):
+    """Process-local cache, LRU by user and bounded by `max_bytes`; values expire after `ttl` seconds.
+
+    The entry object is the generation token: invalidation drops it, so a put
+    carrying a dropped entry is ignored. Only the event loop touches it, so no lock.
+    """
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self._users: OrderedDict[str, _UserEntry] = OrderedDict()
+        self._bytes = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._bytes
+
+    async def get(self, user_id: str, field: str) -> tuple[Optional[bytes], object]:
+        entry = self._users.get(user_id)
+        if entry is None:
+            entry = self._users[user_id] = _UserEntry()
+            self._bytes += entry.size
+            self._evict()
+        else:
+            self._users.move_to_end(user_id)
+            cached = entry.pages.get(field)
+            if cached is not None:
+                if cached[0] > time.monotonic():
+                    self.hits += 1
+                    return cached[1], entry
+                self._drop(entry, field)
+        self.misses += 1
+        return None, entry
+
+    async def put(self, user_id: str, field: str, token: object, value: bytes) -> None:
+        entry = self._users.get(user_id)
+        size = len(value) + len(field) + ENTRY_OVERHEAD
+        if entry is not token or entry is None or size > self.max_bytes:
+            return
+        self._drop(entry, field)
+        entry.pages[field] = (time.monotonic() + self.ttl, value)
+        entry.size += size
+        self._bytes += size
+        self._users.move_to_end(user_id)
+        self._evict()
+
+    async def invalidate(self, user_id: str) -> None:
+        entry = self._users.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        self.invalidations += 1
+
+    async def stats(self) -> dict:
+        return {**await super().stats(), "backend": "memory", "max_bytes": self.max_bytes,
+                "users": len(self._users), "evictions": self.evictions}
+
+    def _drop(self, entry: _UserEntry, field: str) -> None:
+        old = entry.pages.pop(field, None)
+        if old is not None:
+            size = len(old[1]) + len(field) + ENTRY_OVERHEAD
+            entry.size -= size
+            self._bytes -= size
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._users:
+            _, entry = self._users.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+class RedisListCache(ListCache):
+    """Cache shared by every worker, kept in Redis (or anything speaking its protocol).
+
+    Keys are ``todos:<user>:g`` for the generation token and
+    ``todos:<user>:p:<field>`` for values, which carry the token they were
+    filed under as a prefix; a lookup is one MGET of both. Invalidation sets
+    a fresh random token, so even a token lost to eviction or expiry can
+    never bring an old value back. The memory bound is Redis's own
+    ``maxmemory`` with an LRU policy. Redis errors count as misses and the
+    request is served from the database.
+    """
+    def __init__(self, url: str, ttl: float, *, client=None) -> None:
+        super().__init__()
+        self.url = url
+        self.ttl_ms = max(1, int(ttl * 1000))
+        self._used_memory = 0
+        if client is None:
+            # Imported on demand: only this backend needs the redis package
+            import redis.asyncio
+            client = redis.asyncio.from_url(url)
+        self._redis = client
+
+    @property
+    def memory_bytes(self) -> int:
+        # Refreshed by stats(); /metrics calls it before rendering
+        return self._used_memory
+
+    @staticmethod
+    def _keys(user_id: str, field: str) -> tuple[str, str]:
+        return f"todos:{user_id}:g", f"todos:{user_id}:p:{field}"
+
+    async def get(self, user_id: str, field: str) -> tuple[Optional[bytes], object]:
+        gen_key, value_key = self._keys(user_id, field)
+        try:
+            token, value = await self._redis.mget(gen_key, value_key)
+            if token is None:
+                # First lookup since the token expired: whichever reader sets it first wins
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.set(gen_key, secrets.token_hex(8), nx=True, px=self.ttl_ms)
+                    pipe.get(gen_key)
+                    _, token = await pipe.execute()
+        except Exception:
+            self.errors += 1
+            self.misses += 1
+            return None, None
+        prefix = token + b"|"
+        if value is not None and value.startswith(prefix):
+            self.hits += 1
+            return value[len(prefix):], token
+        self.misses += 1
+        return None, token
+
+    async def put(self, user_id: str, field: str, token: object, value: bytes) -> None:
+        if token is None:
+            return
+        try:
+            await self._redis.set(self._keys(user_id, field)[1], token + b"|" + value, px=self.ttl_ms)
+        except Exception:
+            self.errors += 1
+
+    async def invalidate(self, user_id: str) -> None:
+        self.invalidations += 1
+        try:
+            await self._redis.set(self._keys(user_id, "")[0], secrets.token_hex(8), px=self.ttl_ms)
+        except Exception:
+            # The write is committed either way; a stale list lives at most `ttl`
+            self.errors += 1
+
+    async def stats(self) -> dict:
+        try:
+            self._used_memory = int((await self._redis.info("memory")).get("used_memory", 0))
+        except Exception:
+            self.errors += 1
+        return {**await super().stats(), "backend": "redis"}
+
+    async def close(self) -> None:
+        await self._redis.aclose()
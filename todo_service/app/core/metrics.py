@@ -0,0 +1,248 @@
+"""Minimal Prometheus-text metrics with per-thread shards.
+
+Every thread that records a sample writes only to its own cells, so the hot
+path takes no lock: under the GIL a single-writer ``list[i] += 1`` is safe.
+When a thread exits, its cells are folded into one shared base shard, so idle
+AnyIO workers and finished WAL threads leave no shard behind. A scrape sums the
+base and the shards of the live threads.
+"""
+import bisect
+import threading
+import time
+import weakref
+from typing import Callable, Iterable, Sequence
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _ThreadSentinel:
+    """Lives in a thread's local storage only, so it is freed when that thread exits."""
+    __slots__ = ("__weakref__",)
+
+def _add_cells(into: dict, shard: dict) -> None:
+    for labels, cell in list(shard.items()):
+        total = into.setdefault(labels, [0] * len(cell))
+        for i, value in enumerate(cell):
+            total[i] += value
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._base: dict = {}  # cells of threads that have exited
+        self._shards: dict[int, dict] = {}
+        # Reentrant: a thread-exit fold can run wherever the last reference to a sentinel drops
+        self._shards_lock = threading.RLock()
+        self._local = threading.local()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            # Once per thread: register this thread's cells for collection, and fold them when it exits
+            shard = self._local.shard = {}
+            self._local.sentinel = sentinel = _ThreadSentinel()
+            with self._shards_lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(sentinel, self._retire, shard)
+        return shard
+
+    def _retire(self, shard: dict) -> None:
+        # The owning thread is gone, so nothing writes to `shard` any more
+        with self._shards_lock:
+            self._shards.pop(id(shard), None)
+            _add_cells(self._base, shard)
+
+    def _merged(self) -> dict[tuple, list]:
+        merged: dict[tuple, list] = {}
+        with self._shards_lock:
+            _add_cells(merged, self._base)
+            shards = list(self._shards.values())
+        for shard in shards:
+            _add_cells(merged, shard)
+        return merged
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        shard = self._shard()
+        cell = shard.get(labels)
+        if cell is None:
+            cell = shard[labels] = [0]
+        cell[0] += amount
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {cell[0]}" for labels, cell in sorted(self._merged().items())]
+
+class Gauge(Counter):
+    """Up/down gauge; inc and dec may happen on different threads since shards are summed."""
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        cell = shard.get(labels)
+        if cell is None:
+            # One slot per bucket, one for +Inf, then the running sum
+            cell = shard[labels] = [0] * (len(self.buckets) + 2)
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> list[str]:
+        lines = []
+        for labels, cell in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), cell[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {cell[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: Histogram, labels: tuple) -> None:
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+
+class CallbackGauge:
+    """Gauge read from a callable at scrape time, for state another component already tracks."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float], kind: str = "gauge") -> None:
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self._fn = fn
+
+    def render(self) -> list[str]:
+        return [f"{self.name} {self._fn()}"]
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, object] = {}
+
+    def register(self, metric):
+        # Re-registering a name (e.g. a module reloaded in tests) replaces the old metric
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, fn: Callable[[], float], kind: str = "gauge") -> CallbackGauge:
+        return self.register(CallbackGauge(name, help, fn, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "HTTP requests currently being served")
+DB_POOL_CHECKOUT_SECONDS = REGISTRY.histogram("db_pool_checkout_seconds", "Time to check a connection out of the SQLAlchemy pool", ("engine",))
+DB_POOL_IN_USE = REGISTRY.gauge("db_pool_connections_in_use", "Connections currently checked out of the pool", ("engine",))
+DB_POOL_OPENED = REGISTRY.counter("db_pool_connections_opened_total", "New DBAPI connections opened by the pool", ("engine",))
+DB_POOL_TIMEOUTS = REGISTRY.counter("db_pool_checkout_timeouts_total", "Checkouts that gave up after pool_timeout", ("engine",))
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and in-flight count per route template."""
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the scope; templates keep label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(elapsed, scope["method"], path)
+            HTTP_REQUESTS.inc(scope["method"], path, str(status_code))
+
+def instrument_pool(engine, name: str) -> None:
+    """Instrument a SQLAlchemy engine's pool (sync engines, or AsyncEngine.sync_engine).
+
+    Pool events track opened and in-use connections. They fire only once a
+    connection is in hand, so the checkout wait is timed around the pool's own
+    ``_do_get``, which is also where exhaustion surfaces as a TimeoutError.
+    """
+    from sqlalchemy import event, exc
+
+    event.listen(engine, "connect", lambda *args: DB_POOL_OPENED.inc(name))
+    event.listen(engine, "checkout", lambda *args: DB_POOL_IN_USE.inc(name))
+    event.listen(engine, "checkin", lambda *args: DB_POOL_IN_USE.dec(name))
+
+    pool = engine.pool
+    do_get = pool._do_get
+
+    def timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc(name)
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start, name)
+
+    pool._do_get = timed_do_get
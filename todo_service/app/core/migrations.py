@@ -0,0 +1,101 @@
+"""Container start: run `alembic upgrade head` on each database that is behind.
+
+Importing Alembic and the models costs most of a second, so the check reads
+the head revisions straight from the version files and the stamped ones with
+the plain DB driver. Run as ``python -m app.core.migrations``.
+"""
+import ast
+import pathlib
+import sqlite3
+import sys
+from typing import Optional
+from .config import settings
+
+SERVICE_DIR = pathlib.Path(__file__).resolve().parents[2]
+VERSIONS_DIR = SERVICE_DIR / "alembic" / "versions"
+
+def _module_constants(path: pathlib.Path) -> dict:
+    constants = {}
+    for node in ast.parse(path.read_text()).body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                constants[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass  # not a literal, so not revision metadata
+    return constants
+
+# head_revisions()
+def head_revisions(versions_dir: pathlib.Path = VERSIONS_DIR) -> set[str]:
+    """Revisions no other migration builds on, from each file's `revision`/`down_revision` literals."""
+    revisions, parents = set(), set()
+    for path in versions_dir.glob("*.py"):
+        constants = _module_constants(path)
+        if "revision" not in constants:
+            continue
+        revisions.add(constants["revision"])
+        down = constants.get("down_revision")
+        parents.update(down if isinstance(down, (tuple, list)) else [down] if down else [])
+    return revisions - parents
+
+def _sqlite_path(url: str) -> Optional[str]:
+    """File path of a sqlite:// URL, "" for an in-memory database, None for other backends."""
+    scheme, _, rest = url.partition("://")
+    if scheme.split("+", 1)[0] != "sqlite":
+        return None
+    path = rest[1:].split("?", 1)[0]
+    return "" if path == ":memory:" else path
+
+# current_revisions()
+def current_revisions(url: str) -> set[str]:
+    """Revisions stamped in alembic_version; empty for a new database."""
+    path = _sqlite_path(url)
+    if path is not None:
+        if not path:
+            return set()
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)  # read-only: never creates the file
+        except sqlite3.OperationalError:
+            return set()
+        try:
+            return {row[0] for row in conn.execute("SELECT version_num FROM alembic_version")}
+        except sqlite3.OperationalError:  # no alembic_version table yet
+            return set()
+        finally:
+            conn.close()
+    from sqlalchemy import create_engine, inspect, text
+    from sqlalchemy.pool import NullPool
+    engine = create_engine(url, poolclass=NullPool)
+    try:
+        with engine.connect() as conn:
+            if not inspect(conn).has_table("alembic_version"):
+                return set()
+            return set(conn.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    finally:
+        engine.dispose()
+
+# upgrade_if_needed()
+def upgrade_if_needed(url: str) -> bool:
+    """Upgrade the database at `url` to head unless it is already there; returns whether Alembic ran."""
+    heads = head_revisions()
+    if heads and current_revisions(url) == heads:
+        return False
+    from alembic import command
+    from alembic.config import Config
+    config = Config(str(SERVICE_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(SERVICE_DIR / "alembic"))
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))  # ConfigParser interpolation
+    command.upgrade(config, "head")
+    return True
+
+# migration_targets()
+def migration_targets() -> list[tuple[str, str]]:
+    """(label, URL) of every database the todo backend uses: each shard when sharded, else DATABASE_URL."""
+    if settings.TODO_BACKEND == "sharded":
+        from .hash_ring import shard_names
+        return [(f"migrations [{name}]", url) for name, url in zip(shard_names(settings.TODO_SHARD_URLS), settings.TODO_SHARD_URLS)]
+    return [("migrations", settings.DATABASE_URL)]
+
+if __name__ == "__main__":
+    for label, url in migration_targets():
+        ran = upgrade_if_needed(url)
+        print(f"{label}: upgraded to head" if ran else f"{label}: already at head, skipped", file=sys.stderr)
@@ -0,0 +1,16 @@
+import base64
+import binascii
+
+# Cursors are opaque to clients: the service hands back the sort key of the
+# last row it returned and we wrap it in url-safe base64 without padding.
+
+def encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(key.encode()).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> str:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        # validate: stray characters are an error rather than silently dropped
+        return base64.b64decode(padded.encode(), altchars=b"-_", validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
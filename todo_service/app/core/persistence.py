@@ -0,0 +1,325 @@
+import asyncio
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Iterable, Iterator, Optional
+import orjson
+from .metrics import REGISTRY
+
+PERSIST_FSYNC_SECONDS = REGISTRY.histogram("persist_fsync_seconds", "Write+fsync time of one WAL group commit")
+PERSIST_GROUP_RECORDS = REGISTRY.histogram(
+    "persist_group_records", "WAL records made durable by one fsync", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096)
+)
+PERSIST_SNAPSHOT_SECONDS = REGISTRY.histogram("persist_snapshot_seconds", "Time to write one compacted snapshot")
+
+# Every record, in the log and in snapshots: u32 payload length, u32 crc32(payload), orjson payload
+_FRAME = struct.Struct("<II")
+_SNAPSHOT_MAGIC = b"SNAP0001"
+_SNAPSHOT_HEADER = struct.Struct("<8sQ")  # magic, first log segment not covered by the snapshot
+_SEGMENT_RE = re.compile(r"^wal-(\d{8})\.log$")
+
+class CorruptLogError(RuntimeError):
+    """A damaged record that is not the torn tail of the newest log segment."""
+
+def encode_frame(record: dict) -> bytes:
+    payload = orjson.dumps(record)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+def iter_frames(buf) -> Iterator[tuple[dict, int]]:
+    """Yield (record, end_offset) for each intact frame; stop at the first torn or corrupt one."""
+    view = memoryview(buf)
+    offset, size = 0, len(view)
+    try:
+        while offset + _FRAME.size <= size:
+            length, crc = _FRAME.unpack_from(view, offset)
+            start, end = offset + _FRAME.size, offset + _FRAME.size + length
+            if end > size or zlib.crc32(view[start:end]) != crc:
+                return
+            yield orjson.loads(view[start:end]), end
+            offset = end
+    finally:
+        view.release()
+
+def _read_mapped(path: str, skip: int = 0) -> Iterator[tuple[dict, int]]:
+    # mmap: records are decoded straight from the page cache, no read() copy of the whole file
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= skip:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for record, end in iter_frames(view[skip:]):
+                    yield record, skip + end
+            finally:
+                view.release()
+
+def _fsync_dir(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class Persistence:
+    """Write-ahead log plus periodic snapshots for an in-memory store.
+
+    Stores append one record per write while holding their own lock, so the
+    log order matches the order writes were applied. A background thread writes
+    whatever has accumulated and fsyncs it once (group commit); with
+    ``sync_commit`` callers wait for that fsync before acknowledging a write.
+
+    Records must be idempotent "set" operations: a snapshot rotates to a fresh
+    log segment and then dumps the live state without stopping writers, so
+    recovery replays segments that partly overlap the snapshot.
+    """
+    def __init__(self, directory: str, *, group_commit_ms: float = 2.0, sync_commit: bool = True,
+                 snapshot_every: int = 100_000) -> None:
+        self.directory = directory
+        self.group_commit_ms = group_commit_ms
+        self.sync_commit = sync_commit
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._durable_cond = threading.Condition(self._lock)
+        self._io_lock = threading.Lock()  # taken before _lock; serializes file writes with rotation
+        self._snapshot_lock = threading.Lock()
+        self._buffer = bytearray()
+        self._buffered = 0
+        self._appended = 0  # log sequence numbers: records appended / made durable in this process
+        self._durable = 0
+        self._since_snapshot = 0
+        self._waiters: list[tuple[int, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._segment = 0
+        self._file = None
+        self._dump: Optional[Callable[[], Iterable[dict]]] = None
+        self._snapshot_due = threading.Event()
+        self._closed = False
+        self._threads: list[threading.Thread] = []
+        self._stats = {"recovered_records": 0, "recovery_seconds": 0.0, "torn_bytes_dropped": 0,
+                       "fsyncs": 0, "snapshots": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_path(self, n: int) -> str:
+        return os.path.join(self.directory, f"wal-{n:08d}.log")
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, "snapshot.bin")
+
+    def _segments(self) -> list[int]:
+        return sorted(int(m.group(1)) for m in map(_SEGMENT_RE.match, os.listdir(self.directory)) if m)
+
+    # recover()
+    def recover(self, apply: Callable[[dict], None]) -> int:
+        """Feed the snapshot and then the log tail to `apply`; returns the number of records replayed.
+
+        A torn or corrupt record at the end of the newest segment is what a crash
+        mid-write leaves behind: it is truncated away. Damage anywhere else raises
+        CorruptLogError rather than silently dropping acknowledged writes.
+        """
+        start = time.perf_counter()
+        count, first_segment = 0, 1
+        snapshot = self._snapshot_path()
+        if os.path.exists(snapshot):
+            with open(snapshot, "rb") as f:
+                magic, first_segment = _SNAPSHOT_HEADER.unpack(f.read(_SNAPSHOT_HEADER.size))
+            if magic != _SNAPSHOT_MAGIC:
+                raise CorruptLogError(f"{snapshot} is not a snapshot file")
+            end = _SNAPSHOT_HEADER.size
+            for record, end in _read_mapped(snapshot, skip=_SNAPSHOT_HEADER.size):
+                apply(record)
+                count += 1
+            if end != os.path.getsize(snapshot):
+                raise CorruptLogError(f"{snapshot} is damaged at byte {end}")
+        segments = [n for n in self._segments() if n >= first_segment]
+        for n in self._segments():
+            if n < first_segment:  # already folded into the snapshot; left by a crash before cleanup
+                os.remove(self._segment_path(n))
+        for i, n in enumerate(segments):
+            path = self._segment_path(n)
+            end = 0
+            for record, end in _read_mapped(path):
+                apply(record)
+                count += 1
+            size = os.path.getsize(path)
+            if end != size:
+                if i != len(segments) - 1:
+                    raise CorruptLogError(f"{path} is damaged at byte {end}")
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+                    os.fsync(f.fileno())
+                self._stats["torn_bytes_dropped"] += size - end
+        # Always continue in a fresh segment rather than appending after a repaired tail
+        self._segment = max(segments[-1] + 1 if segments else first_segment, first_segment)
+        self._stats["recovered_records"] = count
+        self._stats["recovery_seconds"] = time.perf_counter() - start
+        return count
+
+    # start()
+    def start(self, dump: Callable[[], Iterable[dict]]) -> None:
+        """Open a new log segment and start the group-commit and snapshot threads.
+
+        `dump` yields records that rebuild the whole state; it runs on the snapshot thread.
+        """
+        self._dump = dump
+        self._file = open(self._segment_path(self._segment), "ab")
+        _fsync_dir(self.directory)
+        for target, name in ((self._flush_loop, "wal-flush"), (self._snapshot_loop, "wal-snapshot")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # append()
+    def append(self, record: dict) -> int:
+        """Buffer one record for the next group commit and return its log sequence number."""
+        frame = encode_frame(record)
+        with self._lock:
+            self._buffer += frame
+            self._buffered += 1
+            self._appended += 1
+            self._since_snapshot += 1
+            if self._buffered == 1:
+                self._wakeup.notify()
+            return self._appended
+
+    # wait()
+    def wait(self, lsn: Optional[int] = None) -> None:
+        """Block until record `lsn` (default: everything appended so far) is fsynced."""
+        if not self.sync_commit:
+            return
+        with self._lock:
+            lsn = self._appended if lsn is None else lsn
+            while self._durable < lsn and not self._closed:
+                self._durable_cond.wait()
+
+    # wait_async()
+    async def wait_async(self, lsn: Optional[int] = None) -> None:
+        """Like wait(), but parks the coroutine instead of the event loop thread."""
+        if not self.sync_commit:
+            return
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            lsn = self._appended if lsn is None else lsn
+            if self._durable >= lsn or self._closed:
+                return
+            future = loop.create_future()
+            self._waiters.append((lsn, loop, future))
+        await future
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._buffered and not self._closed:
+                    self._wakeup.wait()
+                if self._closed and not self._buffered:
+                    return
+            if self.group_commit_ms > 0:
+                # Let concurrent writers join this group before paying for the fsync
+                time.sleep(self.group_commit_ms / 1000)
+            self._flush()
+            if self.snapshot_every and self._since_snapshot >= self.snapshot_every:
+                self._snapshot_due.set()
+
+    def _flush(self) -> None:
+        with self._io_lock:
+            with self._lock:
+                data, records, upto = self._buffer, self._buffered, self._appended
+                self._buffer, self._buffered = bytearray(), 0
+            if records:
+                with PERSIST_FSYNC_SECONDS.time():
+                    self._file.write(data)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                PERSIST_GROUP_RECORDS.observe(records)
+        if records:
+            self._mark_durable(upto)
+
+    def _mark_durable(self, upto: int) -> None:
+        with self._lock:
+            self._durable = max(self._durable, upto)
+            self._stats["fsyncs"] += 1
+            ready = [w for w in self._waiters if w[0] <= self._durable]
+            self._waiters = [w for w in self._waiters if w[0] > self._durable]
+            self._durable_cond.notify_all()
+        for _, loop, future in ready:
+            loop.call_soon_threadsafe(_resolve_future, future)
+
+    def _rotate(self) -> int:
+        """Make everything buffered durable in the current segment and switch to a new one."""
+        self._flush()
+        with self._io_lock:
+            old, self._segment = self._file, self._segment + 1
+            self._file = open(self._segment_path(self._segment), "ab")
+            _fsync_dir(self.directory)
+        old.close()
+        return self._segment
+
+    # snapshot()
+    def snapshot(self) -> None:
+        """Write a compacted snapshot of the current state and drop the log segments it covers."""
+        with self._snapshot_lock:
+            start = time.perf_counter()
+            with self._lock:
+                self._since_snapshot = 0
+            first_segment = self._rotate()
+            path = self._snapshot_path()
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, first_segment))
+                chunk = bytearray()
+                for record in self._dump():
+                    chunk += encode_frame(record)
+                    if len(chunk) >= 1 << 20:
+                        f.write(chunk)
+                        chunk.clear()
+                f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            _fsync_dir(self.directory)
+            for n in self._segments():
+                if n < first_segment:
+                    os.remove(self._segment_path(n))
+            PERSIST_SNAPSHOT_SECONDS.observe(time.perf_counter() - start)
+            with self._lock:
+                self._stats["snapshots"] += 1
+
+    def _snapshot_loop(self) -> None:
+        while True:
+            self._snapshot_due.wait()
+            self._snapshot_due.clear()
+            if self._closed:
+                return
+            self.snapshot()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"directory": self.directory, "segment": self._segment, "appended": self._appended,
+                    "durable": self._durable, "buffered": self._buffered, **self._stats}
+
+    # close()
+    def close(self) -> None:
+        """Flush, fsync and stop the background threads; waiters are released."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify_all()
+        self._snapshot_due.set()
+        for thread in self._threads:
+            thread.join()
+        if self._file is not None:
+            self._flush()
+            self._file.close()
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+            self._durable_cond.notify_all()
+        for _, loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve_future, future)
+
+def _resolve_future(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
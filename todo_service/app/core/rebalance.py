@@ -0,0 +1,109 @@
+"""Move users to their new shard after TODO_SHARD_URLS changes.
+
+    python -m app.core.rebalance --from "$OLD_SHARD_URLS" --to "$NEW_SHARD_URLS" [--dry-run]
+
+Each old shard is scanned for its users. Any user whose owner on the new
+ring is a different database is copied there: the todos, plus the version
+row bumped by one so cached ETags turn stale. Only then is the user deleted
+from the source. The copy first clears whatever an interrupted earlier run
+left on the target, so the tool can be run again until it reports no
+moves. Run it while todo_service is stopped or not taking writes, and start
+the service on the new URLs afterwards.
+"""
+import argparse
+import sys
+from collections import Counter
+from typing import Iterable, Sequence
+from sqlalchemy import delete, distinct, insert, select, union
+from sqlalchemy.pool import NullPool
+from sqlmodel import create_engine
+from app.core.config import settings
+from app.core.hash_ring import HashRing, shard_names
+from app.core.migrations import upgrade_if_needed
+from app.models import Todo, TodoVersion
+
+COPY_BATCH = 1000  # rows per INSERT when copying a user
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterable[list[dict]]:
+    chunk: list[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _users(conn) -> list[str]:
+    stmt = union(select(distinct(Todo.user_id)), select(distinct(TodoVersion.user_id)))
+    return [row[0] for row in conn.execute(stmt)]
+
+def move_user(source, target, user_id: str, batch: int = COPY_BATCH) -> int:
+    """Copy one user's rows from `source` to `target` (sync engines), then delete them from `source`."""
+    columns = [Todo.id, Todo.user_id, Todo.title, Todo.completed]
+    moved = 0
+    with source.connect() as src, target.begin() as dst:
+        # Clears a partial copy from an interrupted run; the source still holds the full set
+        dst.execute(delete(Todo).where(Todo.user_id == user_id))
+        dst.execute(delete(TodoVersion).where(TodoVersion.user_id == user_id))
+        rows = src.execution_options(yield_per=batch).execute(select(*columns).where(Todo.user_id == user_id))
+        for chunk in _chunks((dict(row._mapping) for row in rows), batch):
+            dst.execute(insert(Todo), chunk)
+            moved += len(chunk)
+        version = src.execute(select(TodoVersion.version).where(TodoVersion.user_id == user_id)).scalar()
+        dst.execute(insert(TodoVersion).values(user_id=user_id, version=(version or 0) + 1))
+    with source.begin() as src:
+        src.execute(delete(Todo).where(Todo.user_id == user_id))
+        src.execute(delete(TodoVersion).where(TodoVersion.user_id == user_id))
+    return moved
+
+# rebalance()
+def rebalance(old_urls: Sequence[str], new_urls: Sequence[str], *, vnodes: int = 64, dry_run: bool = False,
+              batch: int = COPY_BATCH) -> dict:
+    """Move every user not on their new-ring shard; returns users and todos moved per source -> target."""
+    old = dict(zip(shard_names(old_urls), old_urls))
+    new = dict(zip(shard_names(new_urls), new_urls))
+    ring = HashRing(list(new), vnodes)
+    if not dry_run:
+        for url in new.values():
+            upgrade_if_needed(url)  # a new shard gets the schema before any user lands on it
+    engines = {url: create_engine(url, poolclass=NullPool) for url in {*old.values(), *new.values()}}
+    users, todos = Counter(), Counter()
+    try:
+        for source_name, source_url in old.items():
+            with engines[source_url].connect() as conn:
+                user_ids = _users(conn)
+            for user_id in user_ids:
+                target_name = ring.shard_for(user_id)
+                if new[target_name] == source_url:
+                    continue
+                route = f"{source_name} -> {target_name}"
+                users[route] += 1
+                if not dry_run:
+                    todos[route] += move_user(engines[source_url], engines[new[target_name]], user_id, batch)
+    finally:
+        for engine in engines.values():
+            engine.dispose()
+    return {route: {"users": users[route], "todos": todos[route]} for route in users}
+
+def _urls(value: str) -> list[str]:
+    return [u.strip() for u in value.split(",") if u.strip()]
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--from", dest="old", required=True, help="comma-separated shard URLs the data is on now")
+    parser.add_argument("--to", dest="new", default=",".join(settings.TODO_SHARD_URLS),
+                        help="comma-separated shard URLs to move to (default: TODO_SHARD_URLS)")
+    parser.add_argument("--vnodes", type=int, default=settings.TODO_SHARD_VNODES)
+    parser.add_argument("--batch", type=int, default=COPY_BATCH)
+    parser.add_argument("--dry-run", action="store_true", help="count the moves without copying anything")
+    args = parser.parse_args(argv)
+    moves = rebalance(_urls(args.old), _urls(args.new), vnodes=args.vnodes, dry_run=args.dry_run, batch=args.batch)
+    for route, counts in sorted(moves.items()):
+        print(f"{route}: {counts['users']} users, {counts['todos']} todos", file=sys.stderr)
+    if not moves:
+        print("rebalance: every user is on its shard", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
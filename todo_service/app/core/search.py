@@ -0,0 +1,152 @@
+import bisect
+import heapq
+import re
+import unicodedata
+from typing import Iterator, Optional
+
+# Letters and digits only: "_" and punctuation separate tokens, as in SQLite's unicode61 tokenizer
+_TOKEN_RE = re.compile(r"[^\W_]+")
+# Candidates a multi-term query probes one by one before switching to set intersection
+_WALK_BUDGET = 256
+
+def tokenize(text: str) -> list[str]:
+    """Case- and accent-folded word tokens of `text` ("Café_menu" -> ["cafe", "menu"])."""
+    folded = text.casefold()
+    if not folded.isascii():
+        folded = "".join(c for c in unicodedata.normalize("NFKD", folded) if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(folded)
+
+class TitleIndex:
+    """Inverted index from title tokens to todo sequence numbers, for one user's todos.
+
+    Every query term matches as a prefix of some title token and all terms must
+    match. Distinct tokens are kept sorted so a prefix maps to one contiguous
+    range of postings. Postings are sorted lists (creates append), so a
+    page is a lazy merge that stops after `limit` hits instead of materializing
+    every match.
+    """
+    __slots__ = ("_postings", "_vocab", "_ids", "_seqs")
+
+    def __init__(self) -> None:
+        self._postings: dict[str, list[int]] = {}
+        self._vocab: list[str] = []
+        self._ids: dict[int, str] = {}
+        self._seqs: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # add()
+    def add(self, todo_id: str, seq: int, title: str) -> None:
+        self._ids[seq] = todo_id
+        self._seqs[todo_id] = seq
+        for token in set(tokenize(title)):
+            posting = self._postings.get(token)
+            if posting is None:
+                self._postings[token] = [seq]
+                bisect.insort(self._vocab, token)
+            elif posting[-1] < seq:
+                posting.append(seq)
+            else:  # retitled todo keeps its older sequence number
+                bisect.insort(posting, seq)
+
+    # remove()
+    def remove(self, todo_id: str, title: str) -> None:
+        seq = self._seqs.pop(todo_id, None)
+        if seq is None:
+            return
+        del self._ids[seq]
+        for token in set(tokenize(title)):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            i = bisect.bisect_left(posting, seq)
+            if i < len(posting) and posting[i] == seq:
+                del posting[i]
+            if not posting:
+                del self._postings[token]
+                del self._vocab[bisect.bisect_left(self._vocab, token)]
+
+    # retitle()
+    def retitle(self, todo_id: str, old_title: str, new_title: str) -> None:
+        seq = self._seqs.get(todo_id)
+        if seq is not None and old_title != new_title:
+            self.remove(todo_id, old_title)
+            self.add(todo_id, seq, new_title)
+
+    def _prefix(self, prefix: str) -> list[list[int]]:
+        vocab = self._vocab
+        i = bisect.bisect_left(vocab, prefix)
+        matches = []
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            matches.append(self._postings[vocab[i]])
+            i += 1
+        return matches
+
+    # search()
+    def search(self, query: str, *, limit: int, after: Optional[int] = None) -> tuple[list[str], Optional[int]]:
+        """Return up to `limit` matching todo ids after sequence `after`, plus the next `after` (None when done)."""
+        terms = set(tokenize(query))
+        if not terms:
+            return [], None
+        groups = sorted((self._prefix(term) for term in terms), key=lambda lists: sum(map(len, lists)))
+        start = after + 1 if after is not None else 0
+        if len(groups) == 1:
+            page = self._walk(groups[0], start, limit + 1)
+        else:
+            page = self._intersect(groups, start, limit + 1)
+        next_after = page[limit - 1] if len(page) > limit else None
+        return [self._ids[seq] for seq in page[:limit]], next_after
+
+    @staticmethod
+    def _intersect(groups: list[list[list[int]]], start: int, count: int) -> list[int]:
+        """First `count` seqs >= start present in every group (each group is a union of postings).
+
+        Common terms usually share titles early, so a short walk of the most
+        selective group probing the others fills the page; rare combinations
+        fall back to set intersection, which is linear in the posting sizes
+        instead of paying a probe per candidate.
+        """
+        first, rest = groups[0], groups[1:]
+        page: list[int] = []
+        budget = max(_WALK_BUDGET, 4 * count)
+        for seq in TitleIndex._walk(first, start, budget):
+            if all(any(_contains(posting, seq) for posting in lists) for lists in rest):
+                page.append(seq)
+                if len(page) == count:
+                    return page
+            budget -= 1
+        if budget:  # the walk saw every candidate
+            return page
+        resume = seq + 1
+        matches: Optional[set[int]] = None
+        for lists in groups:
+            hits: set[int] = set()
+            for posting in lists:
+                tail = posting[bisect.bisect_left(posting, resume):] if matches is None else posting
+                hits.update(tail if matches is None else matches.intersection(tail))
+            matches = hits
+            if not matches:
+                break
+        return page + heapq.nsmallest(count - len(page), matches)
+
+    @staticmethod
+    def _walk(lists: list[list[int]], start: int, count: int) -> list[int]:
+        """First `count` distinct seqs >= start across sorted postings, merged lazily."""
+        streams = [_tail(posting, bisect.bisect_left(posting, start)) for posting in lists]
+        page: list[int] = []
+        for seq in heapq.merge(*streams) if len(streams) > 1 else (streams[0] if streams else ()):
+            if page and seq == page[-1]:  # two tokens of one title share the prefix
+                continue
+            page.append(seq)
+            if len(page) == count:
+                break
+        return page
+
+def _contains(posting: list[int], seq: int) -> bool:
+    i = bisect.bisect_left(posting, seq)
+    return i < len(posting) and posting[i] == seq
+
+def _tail(posting: list[int], start: int) -> Iterator[int]:
+    for i in range(start, len(posting)):
+        yield posting[i]
@@ -0,0 +1,28 @@
+from typing import Any, Mapping, Optional
+import msgpack
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content)
+
+def negotiated_media_type(request: Request) -> str:
+    """The media type negotiated_response renders for this request's Accept header."""
+    return MSGPACK_MEDIA_TYPE if MSGPACK_MEDIA_TYPE in request.headers.get("accept", "") else "application/json"
+
+def negotiated_response(request: Request, content: Any, *, status_code: int = 200,
+                        headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Render trusted service output as msgpack or JSON according to the Accept header.
+
+    Returning a Response from a route makes FastAPI skip `response_model`
+    validation and re-encoding; only use this for data the service built itself.
+    """
+    headers = {**(headers or {}), "Vary": "Accept"}
+    if negotiated_media_type(request) == MSGPACK_MEDIA_TYPE:
+        return MsgPackResponse(content, status_code=status_code, headers=headers)
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,51 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+class VerifiedTokenCache:
+    """Bounded LRU of bearer tokens whose signature already verified, mapped to their subject.
+
+    Entries die at the token's own `exp`, and the whole cache is dropped when the
+    signing secret changes, so a hit never outlives what a full decode would accept.
+    Only the event loop touches it (get_current_subject is async), so no lock.
+    """
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._secret: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_secret(self, secret: str) -> None:
+        if secret != self._secret:
+            self._entries.clear()
+            self._secret = secret
+
+    def get(self, token: str, secret: str, now: Optional[float] = None) -> Optional[str]:
+        now = time.time() if now is None else now
+        self._check_secret(secret)
+        entry = self._entries.get(token)
+        if entry is None or entry[1] <= now:
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, token: str, secret: str, sub: str, exp: Optional[float]) -> None:
+        # Tokens without exp have no natural eviction point; always verify those
+        if exp is None or self.maxsize <= 0:
+            return
+        self._check_secret(secret)
+        self._entries[token] = (sub, float(exp))
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
@@ -1,23 +1,37 @@
-import os
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+from app.core.token_cache import VerifiedTokenCache
 
 http_bearer = HTTPBearer(auto_error=False)
+token_cache = VerifiedTokenCache(settings.JWT_CACHE_SIZE)
+
+JWT_DECODE_SECONDS = REGISTRY.histogram("jwt_decode_seconds", "Time spent verifying bearer tokens on cache misses")
+REGISTRY.callback("jwt_cache_hits_total", "Bearer tokens resolved from the verified-token cache", lambda: token_cache.hits, kind="counter")
+REGISTRY.callback("jwt_cache_misses_total", "Bearer tokens that needed a full jwt.decode", lambda: token_cache.misses, kind="counter")
+REGISTRY.callback("jwt_cache_size", "Verified tokens currently cached", lambda: len(token_cache))
 
 # get_current_subject()
-def get_current_subject(credentials: HTTPAuthorizationCredentials = Depends(http_bearer)) -> str:
+# async: a sync dependency would cost every request a hop through the threadpool for a cache lookup
+async def get_current_subject(credentials: HTTPAuthorizationCredentials = Depends(http_bearer)) -> str:
     if credentials is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
     token = credentials.credentials
-    secret = os.getenv("SECRET_KEY", "dev-secret")
+    secret = settings.SECRET_KEY
+    sub = token_cache.get(token, secret)
+    if sub is not None:
+        return sub
     try:
-        payload = jwt.decode(token, secret, algorithms=["HS256"])
+        with JWT_DECODE_SECONDS.time():
+            payload = jwt.decode(token, secret, algorithms=["HS256"])
         sub = payload.get("sub")
         if not sub:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token: missing subject")
-        return sub
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    token_cache.put(token, secret, sub, payload.get("exp"))
+    return sub
@@ -1,10 +1,53 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import DDL, Index, event
 from typing import Optional
 
 class Todo(SQLModel, table=True):
     __tablename__ = "todo"
-    
+    # (user_id, id) serves both the per-user filter and keyset pagination ordered by id;
+    # (user_id, completed, id) does the same for ?completed= pages and counts stats from the index alone
+    __table_args__ = (
+        Index("ix_todo_user_id_id", "user_id", "id"),
+        Index("ix_todo_user_id_completed_id", "user_id", "completed", "id"),
+    )
+
     id: str = Field(primary_key=True)
-    user_id: str = Field(index=True)
+    user_id: str
     title: str
     completed: bool = Field(default=False)
+
+class TodoVersion(SQLModel, table=True):
+    """Per-user change counter, bumped in the same transaction as every todo write."""
+    __tablename__ = "todo_version"
+
+    user_id: str = Field(primary_key=True)
+    version: int = Field(default=0)
+
+# Title search indexes. Alembic 0004 (and 0006 for Postgres) creates the same objects on
+# migrated databases; these hooks cover create_all (tests, init_db).
+SQLITE_TITLE_SEARCH_DDL = (
+    # External-content FTS5 table over todo.title, kept in sync by triggers. todo has a text
+    # primary key, so rowids may be renumbered by VACUUM: rebuild todo_fts after running one.
+    "CREATE VIRTUAL TABLE IF NOT EXISTS todo_fts USING fts5("
+    "title, content='todo', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS todo_fts_ai AFTER INSERT ON todo BEGIN "
+    "INSERT INTO todo_fts(rowid, title) VALUES (new.rowid, new.title); END",
+    "CREATE TRIGGER IF NOT EXISTS todo_fts_ad AFTER DELETE ON todo BEGIN "
+    "INSERT INTO todo_fts(todo_fts, rowid, title) VALUES ('delete', old.rowid, old.title); END",
+    "CREATE TRIGGER IF NOT EXISTS todo_fts_au AFTER UPDATE OF title ON todo BEGIN "
+    "INSERT INTO todo_fts(todo_fts, rowid, title) VALUES ('delete', old.rowid, old.title); "
+    "INSERT INTO todo_fts(rowid, title) VALUES (new.rowid, new.title); END",
+)
+POSTGRES_TITLE_SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # Trigram index over the accent-folded title, matching tokenize() in app/core/search.py.
+    # unaccent() is only STABLE, so the index goes through this IMMUTABLE wrapper
+    "CREATE OR REPLACE FUNCTION todo_unaccent(text) RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+    "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+    "CREATE INDEX IF NOT EXISTS ix_todo_title_unaccent_trgm ON todo USING gin (todo_unaccent(title) gin_trgm_ops)",
+)
+for _statement in SQLITE_TITLE_SEARCH_DDL:
+    event.listen(Todo.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in POSTGRES_TITLE_SEARCH_DDL:
+    event.listen(Todo.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
@@ -1,22 +1,93 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.schemas.todo import TodoCreate, TodoOut
-from app.controllers.todos_controller import list_todos, create_todo, delete_todo
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from app.schemas.todo import TodoCreate, TodoOut, TodoBatch, TodoBatchDelete, TodoBatchResult, TodoStats
+from app.controllers.todos_controller import (
+    list_todos, search_todos, todo_stats, create_todo, delete_todo, apply_batch, delete_batch, export_todos,
+    page_query, todos_etag, etag_matches, todo_events,
+)
 from app.dependencies.auth import get_current_subject
+from app.core.serialization import negotiated_media_type, negotiated_response
 
 router = APIRouter()
 
 @router.get("/", response_model=List[TodoOut])
-def get_todos(sub: str = Depends(get_current_subject)):
-    return list_todos(sub)
+async def get_todos(
+    request: Request,
+    limit: Optional[int] = Query(default=None, ge=1),
+    after: Optional[str] = None,
+    completed: Optional[bool] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    sub: str = Depends(get_current_subject),
+):
+    try:
+        page_limit, _ = page_query(limit, after)  # a bad cursor is a 400 even when the ETag matches
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # Version check next: an unchanged page answers 304 without reading or serializing items
+    etag = await todos_etag(sub, limit=page_limit, after=after, completed=completed,
+                            media_type=negotiated_media_type(request))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag_matches(if_none_match, etag):
+        # Same validators and Vary as the 200 it stands in for
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**headers, "Vary": "Accept"})
+    try:
+        items, next_cursor = await list_todos(sub, limit=limit, after=after, completed=completed)
+    except ValueError as e:  # a well-formed cursor whose key this store cannot parse
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return negotiated_response(request, items, headers=headers)
+
+@router.get("/search", response_model=List[TodoOut])
+async def search(
+    request: Request,
+    q: str = Query(min_length=1, max_length=200),
+    limit: Optional[int] = Query(default=None, ge=1),
+    after: Optional[str] = None,
+    sub: str = Depends(get_current_subject),
+):
+    """Todos whose title contains every word of `q` as a word prefix, oldest first."""
+    try:
+        items, next_cursor = await search_todos(sub, q, limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    headers = {"Cache-Control": "private, no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return negotiated_response(request, items, headers=headers)
+
+@router.get("/stats", response_model=TodoStats)
+async def stats(request: Request, sub: str = Depends(get_current_subject)):
+    """Total, completed and open counts for the caller, without listing any todo."""
+    return negotiated_response(request, await todo_stats(sub), headers={"Cache-Control": "private, no-cache"})
+
+@router.get("/events")
+async def events(last_event_id: Optional[str] = Header(default=None), sub: str = Depends(get_current_subject)):
+    """Server-Sent Events of the caller's todo changes: `created`, `updated`, `deleted`, and `reset` (refetch the list)."""
+    # X-Accel-Buffering: nginx would otherwise hold events back until its buffer fills
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(todo_events(sub, last_event_id), media_type="text/event-stream", headers=headers)
+
+@router.get("/export")
+async def export(sub: str = Depends(get_current_subject)):
+    return StreamingResponse(export_todos(sub), media_type="application/x-ndjson")
 
 @router.post("/", response_model=TodoOut, status_code=status.HTTP_201_CREATED)
-def post_todo(payload: TodoCreate, sub: str = Depends(get_current_subject)):
-    return create_todo(sub, payload)
+async def post_todo(request: Request, payload: TodoCreate, sub: str = Depends(get_current_subject)):
+    return negotiated_response(request, await create_todo(sub, payload), status_code=status.HTTP_201_CREATED)
+
+@router.post("/batch", response_model=TodoBatchResult)
+async def post_todo_batch(request: Request, payload: TodoBatch, sub: str = Depends(get_current_subject)):
+    return negotiated_response(request, await apply_batch(sub, payload))
+
+@router.post("/batch-delete", response_model=TodoBatchResult)
+async def post_todo_batch_delete(request: Request, payload: TodoBatchDelete, sub: str = Depends(get_current_subject)):
+    return negotiated_response(request, await delete_batch(sub, payload))
 
 @router.delete("/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
-def remove_todo(todo_id: str, sub: str = Depends(get_current_subject)):
-    ok = delete_todo(sub, todo_id)
+async def remove_todo(todo_id: str, sub: str = Depends(get_current_subject)):
+    ok = await delete_todo(sub, todo_id)
     if not ok:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found")
     return
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+from app.core.config import settings
 
 class TodoCreate(BaseModel):
     title: str
@@ -6,3 +8,38 @@ class TodoCreate(BaseModel):
 
 class TodoOut(TodoCreate):
     id: str
+
+class TodoStats(BaseModel):
+    total: int
+    completed: int
+    open: int
+
+class TodoBatchOperation(BaseModel):
+    op: Literal["create", "update"]
+    id: Optional[str] = None
+    title: Optional[str] = None
+    completed: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def _check_fields(self):
+        if self.op == "create" and self.title is None:
+            raise ValueError("create requires a title")
+        if self.op == "update" and self.id is None:
+            raise ValueError("update requires an id")
+        return self
+
+class TodoBatch(BaseModel):
+    operations: List[TodoBatchOperation] = Field(min_length=1, max_length=settings.TODO_BATCH_MAX)
+
+class TodoBatchDelete(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=settings.TODO_BATCH_MAX)
+
+class TodoBatchItemResult(BaseModel):
+    index: int
+    ok: bool
+    id: Optional[str] = None
+    todo: Optional[TodoOut] = None
+    error: Optional[str] = None
+
+class TodoBatchResult(BaseModel):
+    results: List[TodoBatchItemResult]
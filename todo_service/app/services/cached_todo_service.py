@@ -0,0 +1,77 @@
+from typing import Optional
+import msgpack
+from app.core.list_cache import ListCache
+
+class CachedTodoService:
+    """Read-through cache in front of the SQL todo store.
+
+    List pages, the list version behind the ETag, and stats are served from
+    `cache` until the user writes. Each write invalidates the user's entries
+    once it has committed. Other reads, such as search and export, go
+    straight to the store.
+    """
+    def __init__(self, inner, cache: ListCache) -> None:
+        self.inner = inner
+        self.cache = cache
+
+    def __getattr__(self, name):
+        # Everything not cached below is the store's own method
+        return getattr(self.inner, name)
+
+    async def _cached(self, user_id: str, field: str, load):
+        value, token = await self.cache.get(user_id, field)
+        if value is not None:
+            return msgpack.unpackb(value)
+        result = await load()
+        await self.cache.put(user_id, field, token, msgpack.packb(result))
+        return result
+
+    # version_for_user()
+    async def version_for_user(self, user_id: str) -> str:
+        return await self._cached(user_id, "version", lambda: self.inner.version_for_user(user_id))
+
+    # list_page_for_user()
+    async def list_page_for_user(self, user_id: str, *, limit: int, after: Optional[str] = None,
+                                 completed: Optional[bool] = None) -> tuple[list[dict], Optional[str]]:
+        field = f"page:{limit}:{'' if completed is None else int(completed)}:{after or ''}"
+        items, next_key = await self._cached(user_id, field, lambda: self.inner.list_page_for_user(
+            user_id, limit=limit, after=after, completed=completed))
+        return items, next_key
+
+    # stats_for_user()
+    async def stats_for_user(self, user_id: str) -> dict:
+        return await self._cached(user_id, "stats", lambda: self.inner.stats_for_user(user_id))
+
+    # create_for_user()
+    async def create_for_user(self, user_id: str, title: str, completed: bool = False) -> dict:
+        todo = await self.inner.create_for_user(user_id, title, completed)
+        await self.cache.invalidate(user_id)
+        return todo
+
+    # update_for_user()
+    async def update_for_user(self, user_id: str, todo_id: str, *, title: Optional[str] = None, completed: Optional[bool] = None) -> Optional[dict]:
+        todo = await self.inner.update_for_user(user_id, todo_id, title=title, completed=completed)
+        if todo is not None:
+            await self.cache.invalidate(user_id)
+        return todo
+
+    # apply_batch_for_user()
+    async def apply_batch_for_user(self, user_id: str, operations: list[dict]) -> list[Optional[dict]]:
+        results = await self.inner.apply_batch_for_user(user_id, operations)
+        if any(todo is not None for todo in results):
+            await self.cache.invalidate(user_id)
+        return results
+
+    # delete_for_user()
+    async def delete_for_user(self, user_id: str, todo_id: str) -> bool:
+        deleted = await self.inner.delete_for_user(user_id, todo_id)
+        if deleted:
+            await self.cache.invalidate(user_id)
+        return deleted
+
+    # delete_many_for_user()
+    async def delete_many_for_user(self, user_id: str, todo_ids: list[str]) -> list[bool]:
+        results = await self.inner.delete_many_for_user(user_id, todo_ids)
+        if any(results):
+            await self.cache.invalidate(user_id)
+        return results
@@ -0,0 +1,72 @@
+from typing import AsyncIterator, Optional
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.core.config import settings
+from app.core.db import get_shard_engines
+from app.core.hash_ring import HashRing, shard_names
+from app.services.sql_todo_service import SqlTodoService
+
+class ShardedTodoService:
+    """Todo store split across several databases by user_id.
+
+    Every call is scoped to one user, so it runs entirely on the shard the
+    consistent-hash ring assigns to that user, including the per-user
+    version row. Each shard has its own engine and pool, created on the
+    first call rather than at import.
+    """
+    def __init__(self, engines: Optional[dict[str, AsyncEngine]] = None, vnodes: Optional[int] = None) -> None:
+        self._engines = engines
+        names = list(engines) if engines is not None else shard_names(settings.TODO_SHARD_URLS)
+        self.ring = HashRing(names, vnodes or settings.TODO_SHARD_VNODES)
+
+    def store_for(self, user_id: str) -> SqlTodoService:
+        engines = self._engines if self._engines is not None else get_shard_engines()
+        return SqlTodoService(engines[self.ring.shard_for(user_id)])
+
+    # list_for_user()
+    async def list_for_user(self, user_id: str) -> list[dict]:
+        return await self.store_for(user_id).list_for_user(user_id)
+
+    # version_for_user()
+    async def version_for_user(self, user_id: str) -> str:
+        return await self.store_for(user_id).version_for_user(user_id)
+
+    # list_page_for_user()
+    async def list_page_for_user(self, user_id: str, *, limit: int, after: Optional[str] = None,
+                                 completed: Optional[bool] = None) -> tuple[list[dict], Optional[str]]:
+        return await self.store_for(user_id).list_page_for_user(user_id, limit=limit, after=after, completed=completed)
+
+    # iter_for_user()
+    def iter_for_user(self, user_id: str, *, chunk_size: int = 500) -> AsyncIterator[dict]:
+        return self.store_for(user_id).iter_for_user(user_id, chunk_size=chunk_size)
+
+    # search_for_user()
+    async def search_for_user(self, user_id: str, query: str, *, limit: int, after: Optional[str] = None) -> tuple[list[dict], Optional[str]]:
+        return await self.store_for(user_id).search_for_user(user_id, query, limit=limit, after=after)
+
+    # stats_for_user()
+    async def stats_for_user(self, user_id: str) -> dict:
+        return await self.store_for(user_id).stats_for_user(user_id)
+
+    # get_for_user()
+    async def get_for_user(self, user_id: str, todo_id: str) -> Optional[dict]:
+        return await self.store_for(user_id).get_for_user(user_id, todo_id)
+
+    # create_for_user()
+    async def create_for_user(self, user_id: str, title: str, completed: bool = False) -> dict:
+        return await self.store_for(user_id).create_for_user(user_id, title, completed)
+
+    # update_for_user()
+    async def update_for_user(self, user_id: str, todo_id: str, *, title: Optional[str] = None, completed: Optional[bool] = None) -> Optional[dict]:
+        return await self.store_for(user_id).update_for_user(user_id, todo_id, title=title, completed=completed)
+
+    # apply_batch_for_user()
+    async def apply_batch_for_user(self, user_id: str, operations: list[dict]) -> list[Optional[dict]]:
+        return await self.store_for(user_id).apply_batch_for_user(user_id, operations)
+
+    # delete_for_user()
+    async def delete_for_user(self, user_id: str, todo_id: str) -> bool:
+        return await self.store_for(user_id).delete_for_user(user_id, todo_id)
+
+    # delete_many_for_user()
+    async def delete_many_for_user(self, user_id: str, todo_ids: list[str]) -> list[bool]:
+        return await self.store_for(user_id).delete_many_for_user(user_id, todo_ids)
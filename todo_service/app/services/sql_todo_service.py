@@ -0,0 +1,235 @@
+import uuid
+from typing import AsyncIterator, Optional
+from sqlalchemy import and_, bindparam, delete, func, insert, literal_column, or_, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.db import async_session_scope, read_engine, write_pins
+from app.core.search import tokenize
+from app.models import Todo, TodoVersion
+
+async def _bump_version(session: AsyncSession, user_id: str) -> None:
+    # Every write that changes a user's todos passes here: keep their next reads off the replica
+    write_pins.pin(user_id)
+    # Upsert so the first write for a user creates its counter row
+    dialect_insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    stmt = dialect_insert(TodoVersion).values(user_id=user_id, version=1).on_conflict_do_update(
+        index_elements=["user_id"], set_={"version": TodoVersion.version + 1}
+    )
+    await session.exec(stmt)
+
+def _like_literal(term: str) -> str:
+    # LIKE wildcards in a term must match themselves, not any character
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class SqlTodoService:
+    """Todo store backed by the `todo` table on the async engine.
+
+    Mirrors the in-memory TodoService interface with `async def` methods.
+    Rows are ordered by id so pagination can seek on the (user_id, id) index.
+    Reads go to the replica, except for a user who wrote within the
+    read-your-writes window; writes always go to the primary.
+    """
+    def __init__(self, engine: Optional[AsyncEngine] = None, replica: Optional[AsyncEngine] = None) -> None:
+        self._engine = engine
+        self._replica = replica
+
+    def _read_scope(self, user_id: str):
+        return async_session_scope(read_engine(user_id, self._engine, self._replica))
+
+    @staticmethod
+    def _to_dict(row: Todo) -> dict:
+        return {"id": row.id, "title": row.title, "completed": row.completed}
+
+    # list_for_user()
+    async def list_for_user(self, user_id: str) -> list[dict]:
+        async with self._read_scope(user_id) as session:
+            rows = (await session.exec(select(Todo).where(Todo.user_id == user_id).order_by(Todo.id))).all()
+            return [self._to_dict(r) for r in rows]
+
+    # version_for_user()
+    async def version_for_user(self, user_id: str) -> str:
+        async with self._read_scope(user_id) as session:
+            version = (await session.exec(select(TodoVersion.version).where(TodoVersion.user_id == user_id))).first()
+            return str(version or 0)
+
+    # list_page_for_user()
+    async def list_page_for_user(self, user_id: str, *, limit: int, after: Optional[str] = None,
+                                 completed: Optional[bool] = None) -> tuple[list[dict], Optional[str]]:
+        stmt = select(Todo).where(Todo.user_id == user_id)
+        if completed is not None:
+            stmt = stmt.where(Todo.completed == completed)
+        if after is not None:
+            stmt = stmt.where(Todo.id > after)
+        # Fetch one extra row to learn whether another page exists
+        stmt = stmt.order_by(Todo.id).limit(limit + 1)
+        async with self._read_scope(user_id) as session:
+            rows = (await session.exec(stmt)).all()
+        page = [self._to_dict(r) for r in rows[:limit]]
+        next_key = page[-1]["id"] if len(rows) > limit else None
+        return page, next_key
+
+    # iter_for_user()
+    async def iter_for_user(self, user_id: str, *, chunk_size: int = 500) -> AsyncIterator[dict]:
+        """Stream every todo of a user through a server-side cursor, `chunk_size` rows at a time."""
+        stmt = (
+            select(Todo)
+            .where(Todo.user_id == user_id)
+            .order_by(Todo.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async with self._read_scope(user_id) as session:
+            rows = await session.stream_scalars(stmt)
+            async for row in rows:
+                yield self._to_dict(row)
+
+    @staticmethod
+    def _title_matches(dialect: str, terms: list[str]):
+        """WHERE clause: every term is a word prefix in the title, using the dialect's title index."""
+        if dialect == "sqlite":
+            # FTS5 MATCH: "term"* is a prefix query and space-separated queries are ANDed
+            match = " ".join(f'"{term}"*' for term in terms)
+            return literal_column("todo.rowid").in_(
+                text("SELECT rowid FROM todo_fts WHERE todo_fts MATCH :match").bindparams(match=match)
+            )
+        if dialect == "postgresql":
+            # \m anchors at a word start; terms are already accent-folded by tokenize(), and the
+            # pg_trgm GIN index on todo_unaccent(title) (migration 0006) serves these case-insensitive matches
+            title = func.todo_unaccent(Todo.title)
+            return and_(*(title.regexp_match(r"\m" + term, flags="i") for term in terms))
+        # Other dialects: no index, but the same word-prefix semantics (a word starts the title or follows a space)
+        return and_(*(
+            or_(Todo.title.ilike(f"{term}%", escape="\\"), Todo.title.ilike(f"% {term}%", escape="\\"))
+            for term in map(_like_literal, terms)
+        ))
+
+    # search_for_user()
+    async def search_for_user(self, user_id: str, query: str, *, limit: int, after: Optional[str] = None) -> tuple[list[dict], Optional[str]]:
+        terms = tokenize(query)
+        if not terms:
+            return [], None
+        async with self._read_scope(user_id) as session:
+            stmt = select(Todo).where(Todo.user_id == user_id, self._title_matches(session.bind.dialect.name, terms))
+            if after is not None:
+                stmt = stmt.where(Todo.id > after)
+            rows = (await session.exec(stmt.order_by(Todo.id).limit(limit + 1))).all()
+        page = [self._to_dict(r) for r in rows[:limit]]
+        return page, page[-1]["id"] if len(rows) > limit else None
+
+    # stats_for_user()
+    async def stats_for_user(self, user_id: str) -> dict:
+        """Total, completed and open counts, grouped on the (user_id, completed) index without reading rows."""
+        stmt = select(Todo.completed, func.count()).where(Todo.user_id == user_id).group_by(Todo.completed)
+        async with self._read_scope(user_id) as session:
+            counts = dict((await session.exec(stmt)).all())
+        done = counts.get(True, 0)
+        total = done + counts.get(False, 0)
+        return {"total": total, "completed": done, "open": total - done}
+
+    # get_for_user()
+    async def get_for_user(self, user_id: str, todo_id: str) -> Optional[dict]:
+        async with self._read_scope(user_id) as session:
+            row = (await session.exec(select(Todo).where(Todo.user_id == user_id, Todo.id == todo_id))).first()
+            return self._to_dict(row) if row is not None else None
+
+    # create_for_user()
+    async def create_for_user(self, user_id: str, title: str, completed: bool = False) -> dict:
+        row = Todo(id=str(uuid.uuid4()), user_id=user_id, title=title, completed=completed)
+        todo = self._to_dict(row)
+        async with async_session_scope(self._engine) as session:
+            session.add(row)
+            await _bump_version(session, user_id)
+            await session.commit()
+        return todo
+
+    # update_for_user()
+    async def update_for_user(self, user_id: str, todo_id: str, *, title: Optional[str] = None, completed: Optional[bool] = None) -> Optional[dict]:
+        async with async_session_scope(self._engine) as session:
+            row = (await session.exec(select(Todo).where(Todo.user_id == user_id, Todo.id == todo_id))).first()
+            if row is None:
+                return None
+            if title is not None:
+                row.title = title
+            if completed is not None:
+                row.completed = completed
+            todo = self._to_dict(row)
+            session.add(row)
+            await _bump_version(session, user_id)
+            await session.commit()
+            return todo
+
+    # apply_batch_for_user()
+    async def apply_batch_for_user(self, user_id: str, operations: list[dict]) -> list[Optional[dict]]:
+        """Apply create/update operations in one transaction.
+
+        Creates go out as one multi-row INSERT; updates are resolved against a
+        single SELECT of the touched rows and written with one executemany UPDATE.
+        """
+        update_ids = {op["id"] for op in operations if op["op"] == "update"}
+        results: list[Optional[dict]] = []
+        inserts: list[dict] = []
+        updates: list[dict] = []
+        async with async_session_scope(self._engine) as session:
+            current: dict[str, dict] = {}
+            if update_ids:
+                rows = (await session.exec(select(Todo).where(Todo.user_id == user_id, Todo.id.in_(update_ids)))).all()
+                current = {r.id: self._to_dict(r) for r in rows}
+            for op in operations:
+                if op["op"] == "create":
+                    todo = {"id": str(uuid.uuid4()), "title": op["title"], "completed": op.get("completed", False)}
+                    inserts.append({**todo, "user_id": user_id})
+                    results.append(todo)
+                    continue
+                todo = current.get(op["id"])
+                if todo is None:
+                    results.append(None)
+                    continue
+                if op.get("title") is not None:
+                    todo["title"] = op["title"]
+                if op.get("completed") is not None:
+                    todo["completed"] = op["completed"]
+                updates.append({"b_id": todo["id"], "b_title": todo["title"], "b_completed": todo["completed"]})
+                results.append(dict(todo))
+            if inserts:
+                await session.exec(insert(Todo).values(inserts))
+            if updates:
+                stmt = (
+                    update(Todo)
+                    .where(Todo.user_id == user_id, Todo.id == bindparam("b_id"))
+                    .values(title=bindparam("b_title"), completed=bindparam("b_completed"))
+                )
+                conn = await session.connection()
+                await conn.execute(stmt, updates)
+            if inserts or updates:
+                await _bump_version(session, user_id)
+            await session.commit()
+        return results
+
+    # delete_for_user()
+    async def delete_for_user(self, user_id: str, todo_id: str) -> bool:
+        # Single DELETE round trip; rowcount tells us whether the todo existed
+        async with async_session_scope(self._engine) as session:
+            result = await session.exec(delete(Todo).where(Todo.user_id == user_id, Todo.id == todo_id))
+            if result.rowcount > 0:
+                await _bump_version(session, user_id)
+            await session.commit()
+            return result.rowcount > 0
+
+    # delete_many_for_user()
+    async def delete_many_for_user(self, user_id: str, todo_ids: list[str]) -> list[bool]:
+        """Delete several todos with one SELECT and one DELETE in a single transaction."""
+        async with async_session_scope(self._engine) as session:
+            existing = set((await session.exec(
+                select(Todo.id).where(Todo.user_id == user_id, Todo.id.in_(set(todo_ids)))
+            )).all())
+            if existing:
+                await session.exec(delete(Todo).where(Todo.user_id == user_id, Todo.id.in_(existing)))
+                await _bump_version(session, user_id)
+            await session.commit()
+        results = []
+        for todo_id in todo_ids:
+            results.append(todo_id in existing)
+            existing.discard(todo_id)  # a repeated id only counts once
+        return results
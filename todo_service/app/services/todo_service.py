@@ -1,27 +1,456 @@
+import bisect
+import itertools
+import threading
 import uuid
-from typing import List
+import zlib
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Iterator, List, Optional
+from app.core.config import settings
+from app.core.persistence import Persistence
+from app.core.search import TitleIndex
+
+SNAPSHOT_CHUNK = 4096  # todos per snapshot record
+
+class _StatusIndex:
+    """One user's todos split by `completed` into seq-sorted ``(seq, id)`` lists.
+
+    Filtered pages seek straight into the matching list. Like the order log,
+    the lists are never shifted on delete: an entry is live while its todo
+    still has that seq and state, dead ones are skipped by pages, and a list
+    is compacted once its dead entries outnumber the live ones. A todo toggled
+    back revives the entry it left behind, so only its first move into the
+    other list is a sorted insert. Counts for stats are kept alongside.
+    """
+    __slots__ = ("lists", "state", "done", "dead")
+
+    def __init__(self) -> None:
+        self.lists: tuple[list[tuple[int, str]], list[tuple[int, str]]] = ([], [])  # open, done
+        self.state: dict[str, tuple[int, bool, int]] = {}  # id -> (seq, completed, bitmask of lists holding an entry)
+        self.done = 0
+        self.dead = [0, 0]
+
+    def __len__(self) -> int:
+        return len(self.state)
+
+    def _live(self, entry: tuple[int, str], completed: bool) -> bool:
+        state = self.state.get(entry[1])
+        return state is not None and state[0] == entry[0] and state[1] == completed
+
+    def _place(self, todo_id: str, seq: int, completed: bool, placed: int) -> int:
+        bit = 1 << completed
+        if placed & bit:  # toggled back: its old entry is still in the list
+            self.dead[completed] -= 1
+            return placed
+        entries = self.lists[completed]
+        if not entries or entries[-1][0] < seq:
+            entries.append((seq, todo_id))
+        else:  # toggled todo keeps its older sequence number
+            bisect.insort(entries, (seq, todo_id))
+        return placed | bit
+
+    def add(self, todo_id: str, seq: int, completed: bool) -> None:
+        self.state[todo_id] = (seq, completed, self._place(todo_id, seq, completed, 0))
+        self.done += completed
+
+    def remove(self, todo_id: str, completed: bool) -> None:
+        del self.state[todo_id]
+        self.done -= completed
+        self._retire(completed)
+
+    def move(self, todo_id: str, was_completed: bool, completed: bool) -> None:
+        if was_completed != completed:
+            seq, _, placed = self.state[todo_id]
+            self.state[todo_id] = (seq, completed, self._place(todo_id, seq, completed, placed))
+            self.done += completed - was_completed
+            self._retire(was_completed)
+
+    def _retire(self, completed: bool) -> None:
+        self.dead[completed] += 1
+        entries = self.lists[completed]
+        if self.dead[completed] > len(entries) - self.dead[completed] + 32:
+            live, bit = [], 1 << completed
+            for entry in entries:
+                if self._live(entry, completed):
+                    live.append(entry)
+                elif entry[1] in self.state:  # moved to the other list: it can no longer be revived here
+                    seq, state, placed = self.state[entry[1]]
+                    self.state[entry[1]] = (seq, state, placed & ~bit)
+            entries[:] = live
+            self.dead[completed] = 0
+
+    def page(self, completed: bool, after_seq: Optional[int], limit: int) -> tuple[list[tuple[int, str]], bool]:
+        """Up to `limit` live entries after `after_seq`, and whether any live entry follows them."""
+        entries = self.lists[completed]
+        i = 0 if after_seq is None else bisect.bisect_right(entries, after_seq, key=itemgetter(0))
+        chunk: list[tuple[int, str]] = []
+        for entry in itertools.islice(entries, i, None):
+            if self._live(entry, completed):
+                if len(chunk) == limit:
+                    return chunk, True
+                chunk.append(entry)
+        return chunk, False
+
+class _Shard:
+    """One lock and the per-user state of every user hashed to it."""
+    __slots__ = ("lock", "store", "order", "versions", "search", "status")
 
-class TodoService:
-    """Minimal in-memory todo store keyed by user_id (from JWT 'sub')."""
     def __init__(self) -> None:
-        self._store: dict[str, list[dict]] = {}
+        self.lock = threading.Lock()
+        self.store: dict[str, dict[str, dict]] = {}
+        self.order: dict[str, list[tuple[int, str]]] = {}
+        self.versions: dict[str, int] = {}
+        self.search: dict[str, TitleIndex] = {}
+        self.status: dict[str, _StatusIndex] = {}
+
+class TodoService:
+    """Minimal in-memory todo store keyed by user_id (from JWT 'sub').
+
+    Each user has an insertion-ordered ``id -> todo`` dict, so get, update and
+    delete by id are O(1) and ``list_for_user`` keeps creation order. Pagination
+    seeks through a per-user append-only ``(seq, id)`` log; deleted ids are
+    skipped there and compacted away once they outnumber live ones. Per-user
+    secondary indexes, maintained on every write, answer title searches and
+    ``completed`` filters and keep the counts that stats reports.
+
+    Every write bumps a per-user version counter, which lets callers detect
+    an unchanged list without reading it.
+
+    Users are spread over ``shards`` lock-striped shards by a hash of user_id, so
+    threadpool workers serving different users rarely wait on each other while
+    each user's reads and writes stay serialized. Updates replace the todo dict
+    instead of mutating it, so a todo handed to a caller never changes under it.
+
+    With ``persistence`` every write is also logged, inside the shard lock, as
+    an idempotent record; the store is rebuilt from the snapshot and log on
+    construction.
+    """
+    def __init__(self, shards: int = 16, persistence: Optional[Persistence] = None) -> None:
+        self._shards = [_Shard() for _ in range(shards)]
+        self._counter = itertools.count(1)
+        # Versions restart at 0 with the process; the epoch keeps them from matching pre-restart ones
+        self._epoch = uuid.uuid4().hex[:8]
+        self.persistence = persistence
+        if persistence is not None:
+            self._max_seq = 0
+            persistence.recover(self._replay)
+            self._counter = itertools.count(self._max_seq + 1)
+            persistence.start(self._dump)
+
+    def _shard(self, user_id: str) -> _Shard:
+        return self._shards[zlib.crc32(user_id.encode()) % len(self._shards)]
+
+    # version_for_user()
+    def version_for_user(self, user_id: str) -> str:
+        shard = self._shard(user_id)
+        with shard.lock:
+            return f"{self._epoch}.{shard.versions.get(user_id, 0)}"
 
     # list_for_user()
     def list_for_user(self, user_id: str) -> list[dict]:
-        return self._store.get(user_id, [])
+        shard = self._shard(user_id)
+        with shard.lock:
+            return list(shard.store.get(user_id, {}).values())
 
-    # create_for_user()
-    def create_for_user(self, user_id: str, title: str, completed: bool = False) -> dict:
+    # list_page_for_user()
+    def list_page_for_user(self, user_id: str, *, limit: int, after: Optional[str] = None,
+                           completed: Optional[bool] = None) -> tuple[list[dict], Optional[str]]:
+        """Return up to `limit` todos in insertion order after the `after` key, plus the next key.
+
+        With `completed`, only todos in that state are returned; keys are shared with the unfiltered list.
+        """
+        after_seq = None
+        if after is not None:
+            try:
+                after_seq = int(after)
+            except ValueError:
+                raise ValueError("Invalid cursor")
+        shard = self._shard(user_id)
+        with shard.lock:
+            todos = shard.store.get(user_id, {})
+            if completed is not None:
+                status = shard.status.get(user_id)
+                chunk, has_more = status.page(completed, after_seq, limit) if status is not None else ([], False)
+                page = [todos[todo_id] for _, todo_id in chunk]
+                return page, str(chunk[-1][0]) if has_more else None
+            order = shard.order.get(user_id, [])
+            i = 0 if after_seq is None else bisect.bisect_right(order, after_seq, key=itemgetter(0))
+            page: list[dict] = []
+            last_seq = None
+            while i < len(order) and len(page) < limit:
+                seq, todo_id = order[i]
+                i += 1
+                todo = todos.get(todo_id)
+                if todo is not None:
+                    page.append(todo)
+                    last_seq = seq
+            has_more = any(todo_id in todos for _, todo_id in itertools.islice(order, i, None))
+        return page, str(last_seq) if has_more else None
+
+    # iter_for_user()
+    def iter_for_user(self, user_id: str, *, chunk_size: int = 500) -> Iterator[dict]:
+        """Yield every todo of a user, walking keyset pages so concurrent writes cannot break iteration."""
+        after = None
+        while True:
+            page, after = self.list_page_for_user(user_id, limit=chunk_size, after=after)
+            yield from page
+            if after is None:
+                return
+
+    # search_for_user()
+    def search_for_user(self, user_id: str, query: str, *, limit: int, after: Optional[str] = None) -> tuple[list[dict], Optional[str]]:
+        """Return up to `limit` todos whose title matches every term of `query` as a word prefix, plus the next key."""
+        after_seq = None
+        if after is not None:
+            try:
+                after_seq = int(after)
+            except ValueError:
+                raise ValueError("Invalid cursor")
+        shard = self._shard(user_id)
+        with shard.lock:
+            index = shard.search.get(user_id)
+            if index is None:
+                return [], None
+            ids, next_seq = index.search(query, limit=limit, after=after_seq)
+            todos = shard.store[user_id]
+            page = [todos[todo_id] for todo_id in ids]
+        return page, str(next_seq) if next_seq is not None else None
+
+    # stats_for_user()
+    def stats_for_user(self, user_id: str) -> dict:
+        """Total, completed and open counts, read from the status index without touching any todo."""
+        shard = self._shard(user_id)
+        with shard.lock:
+            status = shard.status.get(user_id)
+            total = len(status) if status is not None else 0
+            done = status.done if status is not None else 0
+        return {"total": total, "completed": done, "open": total - done}
+
+    # get_for_user()
+    def get_for_user(self, user_id: str, todo_id: str) -> Optional[dict]:
+        shard = self._shard(user_id)
+        with shard.lock:
+            return shard.store.get(user_id, {}).get(todo_id)
+
+    # The _locked helpers expect the caller to hold shard.lock; `log` collects persistence records
+    def _create_locked(self, shard: _Shard, user_id: str, title: str, completed: bool, log: Optional[list]) -> dict:
         todo = {"id": str(uuid.uuid4()), "title": title, "completed": completed}
-        self._store.setdefault(user_id, []).append(todo)
+        seq = next(self._counter)
+        shard.store.setdefault(user_id, {})[todo["id"]] = todo
+        shard.order.setdefault(user_id, []).append((seq, todo["id"]))
+        self._title_index(shard, user_id).add(todo["id"], seq, title)
+        self._status_index(shard, user_id).add(todo["id"], seq, completed)
+        version = shard.versions[user_id] = shard.versions.get(user_id, 0) + 1
+        if log is not None:
+            log.append({"o": "put", "u": user_id, "s": seq, "t": todo, "v": version})
+        return todo
+
+    def _update_locked(self, shard: _Shard, user_id: str, todo_id: str, title: Optional[str], completed: Optional[bool], log: Optional[list]) -> Optional[dict]:
+        todos = shard.store.get(user_id)
+        todo = todos.get(todo_id) if todos else None
+        if todo is None:
+            return None
+        if title is not None:
+            shard.search[user_id].retitle(todo_id, todo["title"], title)
+        if completed is not None:
+            shard.status[user_id].move(todo_id, todo["completed"], completed)
+        todo = dict(todo)
+        if title is not None:
+            todo["title"] = title
+        if completed is not None:
+            todo["completed"] = completed
+        todos[todo_id] = todo
+        version = shard.versions[user_id] = shard.versions.get(user_id, 0) + 1
+        if log is not None:
+            log.append({"o": "put", "u": user_id, "t": todo, "v": version})
         return todo
 
+    def _delete_locked(self, shard: _Shard, user_id: str, todo_id: str, log: Optional[list]) -> bool:
+        todos = shard.store.get(user_id)
+        todo = todos.pop(todo_id, None) if todos else None
+        if todo is None:
+            return False
+        version = shard.versions[user_id] = shard.versions.get(user_id, 0) + 1
+        if log is not None:
+            log.append({"o": "del", "u": user_id, "i": todo_id, "v": version})
+        shard.search[user_id].remove(todo_id, todo["title"])
+        shard.status[user_id].remove(todo_id, todo["completed"])
+        order = shard.order[user_id]
+        if not todos:
+            del shard.store[user_id], shard.order[user_id], shard.search[user_id], shard.status[user_id]
+        elif len(order) > 2 * len(todos) + 32:
+            order[:] = [entry for entry in order if entry[1] in todos]
+        return True
+
+    # create_for_user()
+    def create_for_user(self, user_id: str, title: str, completed: bool = False) -> dict:
+        shard = self._shard(user_id)
+        with shard.lock, self._logging() as log:
+            return self._create_locked(shard, user_id, title, completed, log)
+
+    # update_for_user()
+    def update_for_user(self, user_id: str, todo_id: str, *, title: Optional[str] = None, completed: Optional[bool] = None) -> Optional[dict]:
+        shard = self._shard(user_id)
+        with shard.lock, self._logging() as log:
+            return self._update_locked(shard, user_id, todo_id, title, completed, log)
+
+    # apply_batch_for_user()
+    def apply_batch_for_user(self, user_id: str, operations: list[dict]) -> list[Optional[dict]]:
+        """Apply create/update operations in order, atomically; None marks an update whose todo does not exist."""
+        shard = self._shard(user_id)
+        with shard.lock, self._logging() as log:
+            return [
+                self._create_locked(shard, user_id, op["title"], op.get("completed", False), log) if op["op"] == "create"
+                else self._update_locked(shard, user_id, op["id"], op.get("title"), op.get("completed"), log)
+                for op in operations
+            ]
+
     # delete_for_user()
     def delete_for_user(self, user_id: str, todo_id: str) -> bool:
-        items = self._store.get(user_id, [])
-        before = len(items)
-        items[:] = [t for t in items if t["id"] != todo_id]
-        self._store[user_id] = items
-        return len(items) < before
+        shard = self._shard(user_id)
+        with shard.lock, self._logging() as log:
+            return self._delete_locked(shard, user_id, todo_id, log)
+
+    # delete_many_for_user()
+    def delete_many_for_user(self, user_id: str, todo_ids: list[str]) -> list[bool]:
+        shard = self._shard(user_id)
+        with shard.lock, self._logging() as log:
+            return [self._delete_locked(shard, user_id, todo_id, log) for todo_id in todo_ids]
+
+    @staticmethod
+    def _title_index(shard: _Shard, user_id: str) -> TitleIndex:
+        index = shard.search.get(user_id)
+        if index is None:
+            index = shard.search[user_id] = TitleIndex()
+        return index
+
+    @staticmethod
+    def _status_index(shard: _Shard, user_id: str) -> _StatusIndex:
+        index = shard.status.get(user_id)
+        if index is None:
+            index = shard.status[user_id] = _StatusIndex()
+        return index
+
+    # Persistence: records are idempotent so snapshot and log may overlap on replay
+    @contextmanager
+    def _logging(self) -> Iterator[Optional[list]]:
+        """Collect the records of one call and append them as a single log entry (batches stay atomic)."""
+        if self.persistence is None:
+            yield None
+            return
+        log: list[dict] = []
+        yield log
+        if len(log) == 1:
+            self.persistence.append(log[0])
+        elif log:
+            self.persistence.append({"o": "batch", "r": log})
+
+    def _replay(self, record: dict) -> None:
+        op = record["o"]
+        if op == "batch":
+            for inner in record["r"]:
+                self._replay(inner)
+            return
+        user_id = record["u"]
+        shard = self._shard(user_id)
+        if op == "put":
+            todo = record["t"]
+            todos = shard.store.setdefault(user_id, {})
+            previous = todos.get(todo["id"])
+            if previous is None:
+                if "s" not in record:
+                    # Update of a todo the snapshot no longer has: it was deleted later
+                    if not todos:
+                        del shard.store[user_id]
+                    return
+                shard.order.setdefault(user_id, []).append((record["s"], todo["id"]))
+                self._title_index(shard, user_id).add(todo["id"], record["s"], todo["title"])
+                self._status_index(shard, user_id).add(todo["id"], record["s"], todo["completed"])
+                self._max_seq = max(self._max_seq, record["s"])
+            else:
+                shard.search[user_id].retitle(todo["id"], previous["title"], todo["title"])
+                shard.status[user_id].move(todo["id"], previous["completed"], todo["completed"])
+            todos[todo["id"]] = todo
+        elif op == "puts":
+            todos = shard.store.setdefault(user_id, {})
+            order = shard.order.setdefault(user_id, [])
+            index = self._title_index(shard, user_id)
+            status = self._status_index(shard, user_id)
+            for seq, todo in zip(record["s"], record["t"]):
+                previous = todos.get(todo["id"])
+                if previous is None:
+                    order.append((seq, todo["id"]))
+                    index.add(todo["id"], seq, todo["title"])
+                    status.add(todo["id"], seq, todo["completed"])
+                else:
+                    index.retitle(todo["id"], previous["title"], todo["title"])
+                    status.move(todo["id"], previous["completed"], todo["completed"])
+                todos[todo["id"]] = todo
+            if record["s"]:
+                self._max_seq = max(self._max_seq, record["s"][-1])
+        elif op == "del":
+            todos = shard.store.get(user_id)
+            todo = todos.pop(record["i"], None) if todos is not None else None
+            if todo is not None:
+                shard.search[user_id].remove(record["i"], todo["title"])
+                shard.status[user_id].remove(record["i"], todo["completed"])
+                order = shard.order[user_id]
+                if not todos:
+                    del shard.store[user_id], shard.order[user_id], shard.search[user_id], shard.status[user_id]
+                elif len(order) > 2 * len(todos) + 32:
+                    order[:] = [entry for entry in order if entry[1] in todos]
+        shard.versions[user_id] = record["v"]
+
+    def _dump(self) -> Iterator[dict]:
+        for shard in self._shards:
+            with shard.lock:
+                # Todo dicts are never mutated in place, so shallow copies are a consistent view
+                users = {user_id: (dict(shard.store.get(user_id, {})), list(shard.order.get(user_id, ())), version)
+                         for user_id, version in shard.versions.items()}
+            for user_id, (todos, order, version) in users.items():
+                live = [(seq, todos[todo_id]) for seq, todo_id in order if todo_id in todos]
+                # Chunked per user: far fewer frames to decode and shards to hash on recovery
+                for i in range(0, len(live), SNAPSHOT_CHUNK):
+                    chunk = live[i:i + SNAPSHOT_CHUNK]
+                    yield {"o": "puts", "u": user_id, "s": [seq for seq, _ in chunk], "t": [todo for _, todo in chunk], "v": version}
+                if not live:
+                    yield {"o": "ver", "u": user_id, "v": version}
+
+def build_list_cache():
+    """Pick the SQL stores' read cache from settings.TODO_CACHE_BACKEND ("none", "memory" or "redis")."""
+    backend = settings.TODO_CACHE_BACKEND
+    if backend == "none":
+        return None
+    from app.core.list_cache import MemoryListCache, RedisListCache
+    if backend == "memory":
+        return MemoryListCache(settings.TODO_CACHE_MAX_BYTES, settings.TODO_CACHE_TTL_SECONDS)
+    if backend == "redis":
+        return RedisListCache(settings.TODO_CACHE_URL, settings.TODO_CACHE_TTL_SECONDS)
+    raise ValueError(f"Unknown TODO_CACHE_BACKEND: {backend!r}")
+
+def build_todo_service():
+    """Pick the todo backend from settings.TODO_BACKEND ("memory", "sql" or "sharded")."""
+    if settings.TODO_BACKEND in ("sql", "sharded"):
+        if settings.TODO_BACKEND == "sql":
+            from app.services.sql_todo_service import SqlTodoService
+            store = SqlTodoService()
+        else:
+            from app.services.sharded_todo_service import ShardedTodoService
+            store = ShardedTodoService()
+        cache = build_list_cache()
+        if cache is None:
+            return store
+        from app.services.cached_todo_service import CachedTodoService
+        return CachedTodoService(store, cache)
+    if settings.TODO_BACKEND != "memory":
+        raise ValueError(f"Unknown TODO_BACKEND: {settings.TODO_BACKEND!r}")
+    if settings.PERSIST_DIR:
+        return TodoService(persistence=Persistence(
+            settings.PERSIST_DIR,
+            group_commit_ms=settings.PERSIST_GROUP_COMMIT_MS,
+            sync_commit=settings.PERSIST_SYNC_COMMIT,
+            snapshot_every=settings.PERSIST_SNAPSHOT_EVERY,
+        ))
+    return TodoService()
 
-todo_service = TodoService()
+todo_service = build_todo_service()
@@ -1,4 +1,18 @@
 #!/bin/sh
 set -e
-alembic upgrade head
-exec uvicorn main:app --host 0.0.0.0 --port 8002
+WORKERS="${UVICORN_WORKERS:-1}"
+# Each uvicorn worker is its own process: todos must live in the shared database
+if [ "$WORKERS" -gt 1 ] && [ "${TODO_BACKEND:-memory}" = "memory" ]; then
+  echo "UVICORN_WORKERS=$WORKERS needs TODO_BACKEND=sql or sharded; the memory store is per process" >&2
+  exit 1
+fi
+# A per-process cache would keep serving a list another worker has just changed
+if [ "$WORKERS" -gt 1 ] && [ "${TODO_CACHE_BACKEND:-none}" = "memory" ]; then
+  echo "UVICORN_WORKERS=$WORKERS needs TODO_CACHE_BACKEND=redis or none; the memory cache is per process" >&2
+  exit 1
+fi
+# Skips Alembic (most of a second of imports) when alembic_version already matches head;
+# with TODO_BACKEND=sharded this checks and migrates every shard
+python -m app.core.migrations
+# GET /todos/events streams never end on their own: without a bound, shutdown waits for every client to leave
+exec uvicorn main:app --host 0.0.0.0 --port 8002 --workers "$WORKERS" --timeout-graceful-shutdown "${GRACEFUL_SHUTDOWN_SECONDS:-10}"
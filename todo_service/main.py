@@ -1,9 +1,86 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from app.routes.todos import router as todos_router
+from app.dependencies.auth import token_cache
+from app.core.config import settings
+from app.core.concurrency import configure_threadpool, threadpool_stats
+from app.core.metrics import REGISTRY, MetricsMiddleware
+from app.controllers import todos_controller
 
-app = FastAPI(title="Todo Service", version="0.1.0")
-app.include_router(todos_router, prefix="/todos", tags=["todos"])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_threadpool(settings.THREADPOOL_SIZE)
+    if settings.TODO_BACKEND == "sql":
+        from app.core.db import dispose_engines, get_async_engine, get_replica_async_engine
+        # Built here rather than at import, so tooling and tests that import the app open nothing
+        get_async_engine()
+        get_replica_async_engine()
+    elif settings.TODO_BACKEND == "sharded":
+        from app.core.db import dispose_engines, get_shard_engines
+        get_shard_engines()
+    yield
+    # Flush the write-ahead log of a persistent in-memory store
+    persistence = getattr(todos_controller.todo_service, "persistence", None)
+    if persistence is not None:
+        # Joins the WAL threads and fsyncs: blocking, so off the event loop
+        await run_in_threadpool(persistence.close)
+    cache = getattr(todos_controller.todo_service, "cache", None)
+    if cache is not None:
+        await cache.close()
+    if settings.TODO_BACKEND in ("sql", "sharded"):
+        await dispose_engines()
 
-@app.get("/healthz")
-def healthz():
-    return {"status": "ok"}
+def create_app() -> FastAPI:
+    """Build the todo service app; engines are created by its lifespan, not by importing this module."""
+    app = FastAPI(title="Todo Service", version="0.1.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.include_router(todos_router, prefix="/todos", tags=["todos"])
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/stats/token-cache")
+    async def token_cache_stats():
+        """Size and hit/miss counters of the verified-JWT cache."""
+        return token_cache.stats()
+
+    @app.get("/stats/threadpool")
+    async def threadpool():
+        """Size, busy threads and waiting callers of the worker thread pool."""
+        return threadpool_stats()
+
+    @app.get("/stats/db-pool")
+    async def db_pool_stats():
+        """Size, checked-in/out and overflow of each SQLAlchemy connection pool."""
+        # Imported on demand: the memory backend never loads SQLAlchemy
+        from app.core.db import pool_stats
+        return pool_stats()
+
+    @app.get("/stats/todo-cache")
+    async def todo_cache_stats():
+        """Hit ratio, memory use and invalidations of the SQL store's read cache, if enabled."""
+        return await todos_controller.cache_stats()
+
+    @app.get("/stats/events")
+    async def event_stats():
+        """Open event streams, buffered users, and published and reset counts of this worker's event hub."""
+        return todos_controller.event_hub.stats()
+
+    @app.get("/stats/persistence")
+    async def persistence_stats():
+        """Write-ahead log position, fsync count and last recovery of the in-memory store, if persistent."""
+        persistence = getattr(todos_controller.todo_service, "persistence", None)
+        return persistence.stats() if persistence is not None else {"enabled": False}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        """Prometheus text exposition of request, auth, TodoService, todo cache and DB pool metrics."""
+        await todos_controller.cache_stats()  # refreshes the Redis cache's memory reading
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+app = create_app()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from tests.test_workers import UvicornServer, bearer
+
+class SseStream:
+    """One GET /todos/events over a raw socket, so a test can hold a thousand of them cheaply."""
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.buffer = b""
+
+    @classmethod
+    async def open(cls, port: int, sub: str, last_event_id: str = None) -> "SseStream":
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        headers = {**bearer(sub), "Host": f"127.0.0.1:{port}", "Accept": "text/event-stream"}
+        if last_event_id:
+            headers["Last-Event-ID"] = last_event_id
+        writer.write(b"GET /todos/events HTTP/1.1\r\n" + b"".join(f"{k}: {v}\r\n".encode() for k, v in headers.items()) + b"\r\n")
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200"), head
+        assert b"text/event-stream" in head
+        stream = cls(reader, writer)
+        await stream.events(until=lambda e: False, comments=True)  # the ": connected" comment
+        return stream
+
+    async def _chunk(self) -> bytes:
+        # The body is chunked: a hex size line, the data, then CRLF
+        size = int((await self.reader.readuntil(b"\r\n")).strip(), 16)
+        data = await self.reader.readexactly(size + 2)
+        return data[:-2]
+
+    async def events(self, until, comments: bool = False) -> list[dict]:
+        """Read events (as dicts of their fields) until `until(event)` holds, or one comment arrives if `comments`."""
+        found = []
+        while True:
+            while b"\n\n" in self.buffer:
+                raw, self.buffer = self.buffer.split(b"\n\n", 1)
+                if raw.startswith(b":"):
+                    if comments:
+                        return found
+                    continue
+                event = dict(line.decode().split(": ", 1) for line in raw.split(b"\n"))
+                found.append(event)
+                if until(event):
+                    return found
+            self.buffer += await self._chunk()
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    with UvicornServer(tmp_path_factory.mktemp("events") / "todo.db", workers=1) as running:
+        yield running
+
+class TestEventStream:
+    def test_requires_auth(self, server):
+        """The stream is per user: no bearer token, no stream."""
+        assert httpx.get(f"{server.url}/todos/events").status_code == 401
+
+    def test_resume_with_last_event_id(self, server):
+        """A reconnect with Last-Event-ID receives the writes made while it was away, and nothing twice."""
+        sub = "resume@example.com"
+
+        async def scenario():
+            async with httpx.AsyncClient(base_url=server.url, headers=bearer(sub)) as http:
+                stream = await SseStream.open(server.port, sub)
+                ids = [(await http.post("/todos/", json={"title": f"t{i}"})).json()["id"] for i in range(3)]
+                first = await stream.events(until=lambda e: ids[-1] in e["data"])
+                await stream.close()
+                await http.delete(f"/todos/{ids[0]}")
+                later = (await http.post("/todos/", json={"title": "while away"})).json()["id"]
+                stream = await SseStream.open(server.port, sub, first[-1]["id"])
+                missed = await stream.events(until=lambda e: later in e["data"])
+                await stream.close()
+                stale = await SseStream.open(server.port, sub, "0-1")
+                reset = await stale.events(until=lambda e: True)
+                await stale.close()
+                return first, missed, reset
+
+        first, missed, reset = asyncio.run(scenario())
+        assert [e["event"] for e in first] == ["created"] * 3
+        assert [e["event"] for e in missed] == ["deleted", "created"]
+        seq = lambda event: int(event["id"].rsplit("-", 1)[1])
+        assert all(seq(e) > seq(first[-1]) for e in missed)
+        assert [e["event"] for e in reset] == ["reset"]
+
+    @pytest.mark.slow
+    def test_many_concurrent_subscribers(self, server):
+        """1000 open streams over 20 users: every stream gets each of its user's creates, none of the others'."""
+        users, per_user, creates = 20, 50, 3
+
+        async def scenario():
+            subs = [f"fan{u}@example.com" for u in range(users)]
+            streams = []
+            for batch in range(0, users * per_user, 100):
+                streams += await asyncio.gather(*(SseStream.open(server.port, subs[i % users]) for i in range(batch, batch + 100)))
+            async with httpx.AsyncClient(base_url=server.url) as http:
+                open_streams = (await http.get("/stats/events")).json()["subscribers"]
+                start = time.perf_counter()
+                created = {sub: set() for sub in subs}
+                for n in range(creates):
+                    responses = await asyncio.gather(*(http.post("/todos/", json={"title": f"n{n}"}, headers=bearer(sub)) for sub in subs))
+                    for sub, response in zip(subs, responses):
+                        created[sub].add(response.json()["id"])
+
+                async def drain(stream: SseStream) -> list[dict]:
+                    count = 0
+
+                    def done(event: dict) -> bool:
+                        nonlocal count
+                        count += 1
+                        return count == creates
+
+                    return await stream.events(until=done)
+
+                received = await asyncio.gather(*(drain(stream) for stream in streams))
+                elapsed = time.perf_counter() - start
+            await asyncio.gather(*(stream.close() for stream in streams))
+            return open_streams, created, received, elapsed
+
+        open_streams, created, received, elapsed = asyncio.run(scenario())
+        print(f"{users * per_user} streams: {users * creates} creates fanned out to all of them in {elapsed * 1e3:.0f} ms")
+        assert open_streams == users * per_user
+        for i, events in enumerate(received):
+            ids = {json.loads(e["data"])["id"] for e in events if e["event"] == "created"}
+            assert ids == created[f"fan{i % users}@example.com"]
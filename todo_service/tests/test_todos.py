@@ -1,11 +1,37 @@
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import msgpack
+from collections import OrderedDict
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 import jwt
 from datetime import datetime, timedelta
 
-from main import app
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, select
+
+from main import app, create_app
+from app.controllers import todos_controller
+from app.core.config import settings
+from app.core.events import RESET_FRAME, EventHub
+from app.core.list_cache import MemoryListCache, RedisListCache
+from app.core.persistence import CorruptLogError, Persistence, encode_frame
+from app.core.search import TitleIndex
+from app.core.token_cache import VerifiedTokenCache
+from app.models import Todo
+from app.dependencies import auth as auth_dependency
+from app.dependencies.auth import get_current_subject
 from app.services.todo_service import TodoService
+from app.services.sql_todo_service import SqlTodoService
+from app.services.cached_todo_service import CachedTodoService
 
 client = TestClient(app)
 
@@ -14,6 +40,43 @@ def todo_service():
     """Fresh todo service for each test."""
     return TodoService()
 
+class BlockingService:
+    """Drive an async service from sync tests, all calls on one event loop."""
+    def __init__(self, service, runner: asyncio.Runner) -> None:
+        self._service = service
+        self._runner = runner
+
+    def __getattr__(self, name):
+        method = getattr(self._service, name)
+        return lambda *args, **kwargs: self._runner.run(method(*args, **kwargs))
+
+async def _create_schema(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+@pytest.fixture
+def sql_engine():
+    """Async engine on a private in-memory SQLite database (aiosqlite)."""
+    engine = create_async_engine("sqlite+aiosqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with asyncio.Runner() as runner:
+        runner.run(_create_schema(engine))
+        yield engine, runner
+        runner.run(engine.dispose())
+
+@pytest.fixture
+def sql_todo_service(sql_engine):
+    """SQL-backed todo service, wrapped so tests can call it synchronously."""
+    engine, runner = sql_engine
+    return BlockingService(SqlTodoService(engine), runner)
+
+@pytest.fixture
+def api_client(todo_service, monkeypatch):
+    """Client authenticated as test@example.com against a fresh in-memory store."""
+    monkeypatch.setattr(todos_controller, "todo_service", todo_service)
+    app.dependency_overrides[get_current_subject] = lambda: "test@example.com"
+    yield client
+    app.dependency_overrides.pop(get_current_subject, None)
+
 @pytest.fixture
 def auth_token():
     """Mock JWT token for testing."""
@@ -125,6 +188,29 @@ class TestTodoService:
         result = todo_service.delete_for_user("test@example.com", "nonexistent-id")
         assert result == False
 
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_get_and_update_for_user(self, request, service_fixture):
+        """Todos can be fetched and updated by id, scoped to their owner."""
+        service = request.getfixturevalue(service_fixture)
+        todo = service.create_for_user("test@example.com", "Test todo", False)
+
+        assert service.get_for_user("test@example.com", todo["id"]) == todo
+        assert service.get_for_user("other@example.com", todo["id"]) is None
+
+        updated = service.update_for_user("test@example.com", todo["id"], completed=True)
+        assert updated == {"id": todo["id"], "title": "Test todo", "completed": True}
+        assert service.get_for_user("test@example.com", todo["id"])["completed"] is True
+        assert service.update_for_user("other@example.com", todo["id"], title="x") is None
+
+    def test_delete_keeps_insertion_order(self, todo_service):
+        """Deleting from the middle leaves the remaining todos in creation order."""
+        ids = [todo_service.create_for_user("test@example.com", f"Todo {i}")["id"] for i in range(100)]
+        for todo_id in ids[::2]:
+            assert todo_service.delete_for_user("test@example.com", todo_id)
+        assert [t["id"] for t in todo_service.list_for_user("test@example.com")] == ids[1::2]
+        page, _ = todo_service.list_page_for_user("test@example.com", limit=5)
+        assert [t["id"] for t in page] == ids[1:10:2]
+
     def test_user_isolation(self, todo_service):
         """Test that todos are isolated between users."""
         # Create todos for different users
@@ -140,6 +226,968 @@ class TestTodoService:
         assert user1_todos[0]["title"] == "User 1 todo"
         assert user2_todos[0]["title"] == "User 2 todo"
 
+class TestPagination:
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_pages_cover_all_items_once(self, request, service_fixture):
+        """Walking the cursor chain returns every todo exactly once in a stable order."""
+        service = request.getfixturevalue(service_fixture)
+        created = [service.create_for_user("test@example.com", f"Todo {i}")["id"] for i in range(7)]
+        service.create_for_user("other@example.com", "Not mine")
+
+        seen, after = [], None
+        while True:
+            page, after = service.list_page_for_user("test@example.com", limit=3, after=after)
+            assert len(page) <= 3
+            seen.extend(t["id"] for t in page)
+            if after is None:
+                break
+        assert sorted(seen) == sorted(created)
+        assert seen == [t["id"] for t in service.list_for_user("test@example.com")]
+
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_cursor_survives_delete_of_last_seen_item(self, request, service_fixture):
+        """Deleting the item a cursor points at does not skip or repeat items."""
+        service = request.getfixturevalue(service_fixture)
+        for i in range(4):
+            service.create_for_user("test@example.com", f"Todo {i}")
+        first, after = service.list_page_for_user("test@example.com", limit=2)
+        service.delete_for_user("test@example.com", first[-1]["id"])
+        rest, after = service.list_page_for_user("test@example.com", limit=2, after=after)
+        assert after is None
+        assert len(rest) == 2
+        assert not {t["id"] for t in first} & {t["id"] for t in rest}
+
+    def test_invalid_memory_cursor(self, todo_service):
+        """A key the in-memory store did not issue is rejected."""
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            todo_service.list_page_for_user("test@example.com", limit=10, after="not-a-seq")
+
+    def test_route_returns_next_cursor_header(self, api_client, todo_service):
+        """GET /todos/ pages with ?limit and X-Next-Cursor."""
+        for i in range(5):
+            todo_service.create_for_user("test@example.com", f"Todo {i}")
+        response = api_client.get("/todos/", params={"limit": 3})
+        assert response.status_code == 200
+        assert [t["title"] for t in response.json()] == ["Todo 0", "Todo 1", "Todo 2"]
+        cursor = response.headers["X-Next-Cursor"]
+
+        response = api_client.get("/todos/", params={"limit": 3, "after": cursor})
+        assert [t["title"] for t in response.json()] == ["Todo 3", "Todo 4"]
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_route_caps_page_size(self, api_client, todo_service, monkeypatch):
+        """Requests above TODO_MAX_PAGE_SIZE are clamped to the cap."""
+        monkeypatch.setattr(todos_controller.settings, "TODO_MAX_PAGE_SIZE", 2)
+        for i in range(3):
+            todo_service.create_for_user("test@example.com", f"Todo {i}")
+        response = api_client.get("/todos/", params={"limit": 1000})
+        assert len(response.json()) == 2
+        assert "X-Next-Cursor" in response.headers
+
+    def test_route_rejects_bad_cursor(self, api_client):
+        """A garbled cursor yields 400 rather than a server error."""
+        response = api_client.get("/todos/", params={"after": "%%%"})
+        assert response.status_code == 400
+
+class TestSearch:
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_terms_match_word_prefixes(self, request, service_fixture):
+        """Every term must prefix some title word; case and accents are ignored; other users never match."""
+        service = request.getfixturevalue(service_fixture)
+        milk = service.create_for_user("u@example.com", "Buy MILK and eggs")
+        cafe = service.create_for_user("u@example.com", "Café meeting")
+        service.create_for_user("u@example.com", "Call the plumber")
+        service.create_for_user("other@example.com", "Buy milk too")
+
+        def titles(query):
+            return [t["title"] for t in service.search_for_user("u@example.com", query, limit=10)[0]]
+
+        assert titles("mil") == [milk["title"]]
+        assert titles("buy eg") == [milk["title"]]
+        assert titles("buy plumb") == []
+        assert titles("cafe") == titles("CAFÉ") == [cafe["title"]]
+        assert titles("ilk") == []  # infixes do not match
+        assert titles("!!") == []
+
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_index_follows_updates_and_deletes(self, request, service_fixture):
+        service = request.getfixturevalue(service_fixture)
+        todo = service.create_for_user("u@example.com", "Write report")
+        service.update_for_user("u@example.com", todo["id"], title="Review slides")
+        assert service.search_for_user("u@example.com", "report", limit=10)[0] == []
+        assert [t["id"] for t in service.search_for_user("u@example.com", "slid", limit=10)[0]] == [todo["id"]]
+        service.delete_for_user("u@example.com", todo["id"])
+        assert service.search_for_user("u@example.com", "slid", limit=10)[0] == []
+
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_results_paginate(self, request, service_fixture):
+        service = request.getfixturevalue(service_fixture)
+        for n in range(25):
+            service.create_for_user("u@example.com", f"Task {n} {'urgent' if n % 2 else 'later'}")
+        seen, after = [], None
+        while True:
+            page, after = service.search_for_user("u@example.com", "task urg", limit=4, after=after)
+            seen += page
+            if after is None:
+                break
+        assert len(seen) == 12 and len({t["id"] for t in seen}) == 12
+        assert all("urgent" in t["title"] for t in seen)
+
+    def test_vocabulary_shrinks_with_deletes(self):
+        """Tokens whose last todo is gone leave the index."""
+        index = TitleIndex()
+        index.add("a", 1, "alpha beta")
+        index.add("b", 2, "beta gamma")
+        index.remove("a", "alpha beta")
+        assert index._vocab == ["beta", "gamma"]
+        assert index.search("al", limit=5) == ([], None)
+        assert index.search("b", limit=5) == (["b"], None)
+
+    def test_postgres_matches_accent_folded_titles(self):
+        """Postgres compares the folded terms against todo_unaccent(title), the expression its index covers."""
+        from sqlalchemy.dialects import postgresql
+        clause = SqlTodoService._title_matches("postgresql", ["cafe"])
+        assert "todo_unaccent(todo.title) ~*" in str(clause.compile(dialect=postgresql.dialect()))
+
+    def test_fallback_matches_word_prefixes_literally(self, sql_engine, sql_todo_service):
+        """Dialects without a title index still match word prefixes, and % or _ in a term match only themselves."""
+        engine, runner = sql_engine
+        for title in ("50% off", "50 percent off", "a_b test", "axb test", "reboot"):
+            sql_todo_service.create_for_user("u@example.com", title)
+
+        async def titles(*terms: str) -> list[str]:
+            clause = SqlTodoService._title_matches("mysql", list(terms))
+            async with engine.connect() as conn:
+                return sorted((await conn.execute(select(Todo.title).where(clause))).scalars())
+
+        assert runner.run(titles("50%")) == ["50% off"]
+        assert runner.run(titles("a_b")) == ["a_b test"]
+        assert runner.run(titles("%")) == runner.run(titles("_")) == []
+        assert runner.run(titles("boot")) == []
+        assert runner.run(titles("OFF", "50")) == ["50 percent off", "50% off"]
+
+    def test_search_route(self, todo_service, monkeypatch):
+        monkeypatch.setattr(todos_controller, "todo_service", todo_service)
+        app.dependency_overrides[get_current_subject] = lambda: "u@example.com"
+        try:
+            for n in range(3):
+                todo_service.create_for_user("u@example.com", f"groceries {n}")
+            first = client.get("/todos/search", params={"q": "groc", "limit": 2})
+            assert first.status_code == 200 and len(first.json()) == 2
+            rest = client.get("/todos/search", params={"q": "groc", "after": first.headers["X-Next-Cursor"]})
+            assert [t["title"] for t in rest.json()] == ["groceries 2"]
+            assert "X-Next-Cursor" not in rest.headers
+            assert client.get("/todos/search").status_code == 422
+            assert client.get("/todos/search", params={"q": "x", "after": "!!"}).status_code == 400
+        finally:
+            app.dependency_overrides.clear()
+
+    def test_index_rebuilt_on_recovery(self, open_store):
+        service = open_store()
+        keep = service.create_for_user("u@example.com", "Renew passport")
+        gone = service.create_for_user("u@example.com", "Renew library card")
+        service.delete_for_user("u@example.com", gone["id"])
+        service = restart(service, open_store)
+        assert service.search_for_user("u@example.com", "renew", limit=10)[0] == [keep]
+
+class TestCompletedFilter:
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_filtered_pages_follow_toggles_and_deletes(self, request, service_fixture):
+        """?completed pages return exactly the todos in that state, in list order."""
+        service = request.getfixturevalue(service_fixture)
+        ids = [service.create_for_user("u@example.com", f"t{n}", completed=n % 3 == 0)["id"] for n in range(12)]
+        service.create_for_user("other@example.com", "not mine", completed=True)
+        service.update_for_user("u@example.com", ids[1], completed=True)
+        service.update_for_user("u@example.com", ids[0], completed=False)
+        service.delete_for_user("u@example.com", ids[3])
+        service.apply_batch_for_user("u@example.com", [{"op": "update", "id": ids[2], "completed": True},
+                                                        {"op": "create", "title": "t12", "completed": True}])
+
+        def walk(completed):
+            seen, after = [], None
+            while True:
+                page, after = service.list_page_for_user("u@example.com", limit=2, after=after, completed=completed)
+                seen += page
+                if after is None:
+                    return seen
+
+        everything = service.list_for_user("u@example.com")
+        assert walk(True) == [t for t in everything if t["completed"]]
+        assert walk(False) == [t for t in everything if not t["completed"]]
+        assert sorted(t["title"] for t in walk(True)) == ["t1", "t12", "t2", "t6", "t9"]
+
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_stats_track_writes(self, request, service_fixture):
+        service = request.getfixturevalue(service_fixture)
+        assert service.stats_for_user("u@example.com") == {"total": 0, "completed": 0, "open": 0}
+        ids = [service.create_for_user("u@example.com", f"t{n}")["id"] for n in range(5)]
+        service.update_for_user("u@example.com", ids[0], completed=True)
+        service.update_for_user("u@example.com", ids[1], completed=True)
+        service.update_for_user("u@example.com", ids[1], completed=True)  # no double count
+        assert service.stats_for_user("u@example.com") == {"total": 5, "completed": 2, "open": 3}
+        service.delete_many_for_user("u@example.com", [ids[0], ids[4]])
+        assert service.stats_for_user("u@example.com") == {"total": 3, "completed": 1, "open": 2}
+        service.delete_many_for_user("u@example.com", ids[1:4])
+        assert service.stats_for_user("u@example.com") == {"total": 0, "completed": 0, "open": 0}
+
+    def test_lazy_deletes_match_a_model(self, todo_service):
+        """Random toggles and deletes, enough to compact the status lists, keep pages and stats exact."""
+        import random
+        rng = random.Random(3)
+        ids = [todo_service.create_for_user("u@example.com", f"t{n}")["id"] for n in range(300)]
+        for step in range(3000):
+            todo_id = rng.choice(ids)
+            if step % 10 == 0:
+                todo_service.delete_for_user("u@example.com", todo_id)
+                ids.remove(todo_id)
+                ids.append(todo_service.create_for_user("u@example.com", "new", completed=rng.random() < 0.5)["id"])
+            else:
+                todo_service.update_for_user("u@example.com", todo_id, completed=rng.random() < 0.5)
+        everything = todo_service.list_for_user("u@example.com")
+        for completed in (True, False):
+            seen, after = [], None
+            while True:
+                page, after = todo_service.list_page_for_user("u@example.com", limit=7, after=after, completed=completed)
+                seen += page
+                if after is None:
+                    break
+            assert seen == [t for t in everything if t["completed"] == completed]
+        done = sum(t["completed"] for t in everything)
+        assert todo_service.stats_for_user("u@example.com") == {"total": 300, "completed": done, "open": 300 - done}
+        status = todo_service._shard("u@example.com").status["u@example.com"]
+        assert all(len(entries) <= 2 * 300 + 32 for entries in status.lists)
+
+    def test_filter_and_stats_routes(self, api_client, todo_service):
+        for n in range(5):
+            todo_service.create_for_user("test@example.com", f"Todo {n}", completed=n < 2)
+        done = api_client.get("/todos/", params={"completed": "true", "limit": 1})
+        assert [t["title"] for t in done.json()] == ["Todo 0"]
+        rest = api_client.get("/todos/", params={"completed": "true", "after": done.headers["X-Next-Cursor"]})
+        assert [t["title"] for t in rest.json()] == ["Todo 1"] and "X-Next-Cursor" not in rest.headers
+        assert len(api_client.get("/todos/", params={"completed": "false"}).json()) == 3
+        assert api_client.get("/todos/", params={"completed": "maybe"}).status_code == 422
+        assert api_client.get("/todos/stats").json() == {"total": 5, "completed": 2, "open": 3}
+
+    def test_index_rebuilt_on_recovery(self, open_store):
+        service = open_store()
+        ids = [service.create_for_user("u@example.com", f"t{n}")["id"] for n in range(4)]
+        service.update_for_user("u@example.com", ids[2], completed=True)
+        service.delete_for_user("u@example.com", ids[0])
+        service.persistence.snapshot()
+        service.update_for_user("u@example.com", ids[1], completed=True)
+        service = restart(service, open_store)
+        assert service.stats_for_user("u@example.com") == {"total": 3, "completed": 2, "open": 1}
+        assert [t["id"] for t in service.list_page_for_user("u@example.com", limit=10, completed=True)[0]] == ids[1:3]
+
+class TestBatch:
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_apply_batch_mixed_operations(self, request, service_fixture):
+        """Creates and updates apply in order, unknown ids fail individually."""
+        service = request.getfixturevalue(service_fixture)
+        existing = service.create_for_user("test@example.com", "Existing")
+        foreign = service.create_for_user("other@example.com", "Not mine")
+
+        results = service.apply_batch_for_user("test@example.com", [
+            {"op": "create", "title": "New 1"},
+            {"op": "update", "id": existing["id"], "completed": True},
+            {"op": "update", "id": foreign["id"], "title": "Hijack"},
+            {"op": "create", "title": "New 2", "completed": True},
+            {"op": "update", "id": existing["id"], "title": "Renamed"},
+        ])
+        assert results[0]["title"] == "New 1"
+        assert results[1] == {"id": existing["id"], "title": "Existing", "completed": True}
+        assert results[2] is None
+        assert results[3]["completed"] is True
+        assert results[4] == {"id": existing["id"], "title": "Renamed", "completed": True}
+
+        titles = sorted(t["title"] for t in service.list_for_user("test@example.com"))
+        assert titles == ["New 1", "New 2", "Renamed"]
+        assert service.get_for_user("other@example.com", foreign["id"])["title"] == "Not mine"
+
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_delete_many(self, request, service_fixture):
+        """Each id reports whether it was deleted; repeats and foreign ids fail."""
+        service = request.getfixturevalue(service_fixture)
+        a = service.create_for_user("test@example.com", "A")["id"]
+        b = service.create_for_user("test@example.com", "B")["id"]
+        foreign = service.create_for_user("other@example.com", "C")["id"]
+        assert service.delete_many_for_user("test@example.com", [a, "missing", a, foreign]) == [True, False, False, False]
+        assert [t["id"] for t in service.list_for_user("test@example.com")] == [b]
+        assert service.get_for_user("other@example.com", foreign) is not None
+
+    def test_batch_routes(self, api_client):
+        """POST /todos/batch and /todos/batch-delete report per-item outcomes."""
+        response = api_client.post("/todos/batch", json={"operations": [
+            {"op": "create", "title": "One"},
+            {"op": "update", "id": "missing", "completed": True},
+        ]})
+        assert response.status_code == 200
+        first, second = response.json()["results"]
+        assert first["ok"] and first["todo"]["title"] == "One"
+        assert second == {"index": 1, "ok": False, "id": "missing", "todo": None, "error": "Todo not found"}
+
+        response = api_client.post("/todos/batch-delete", json={"ids": [first["id"], "missing"]})
+        assert [r["ok"] for r in response.json()["results"]] == [True, False]
+        assert api_client.get("/todos/").json() == []
+
+    def test_batch_validation(self, api_client, monkeypatch):
+        """Malformed operations and oversized batches are rejected as a whole."""
+        assert api_client.post("/todos/batch", json={"operations": [{"op": "create"}]}).status_code == 422
+        assert api_client.post("/todos/batch", json={"operations": [{"op": "update", "title": "x"}]}).status_code == 422
+        assert api_client.post("/todos/batch", json={"operations": []}).status_code == 422
+        too_many = [{"op": "create", "title": "x"}] * (settings.TODO_BATCH_MAX + 1)
+        assert api_client.post("/todos/batch", json={"operations": too_many}).status_code == 422
+
+class TestSerialization:
+    def test_msgpack_negotiation(self, api_client, todo_service):
+        """Accept: application/msgpack gets the same payload msgpack-encoded."""
+        todo = todo_service.create_for_user("test@example.com", "Todo")
+        response = api_client.get("/todos/", headers={"Accept": "application/msgpack"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        assert response.headers["Vary"] == "Accept"
+        assert msgpack.unpackb(response.content) == [todo]
+
+    def test_json_is_default(self, api_client, todo_service):
+        """Clients without msgpack in Accept keep getting JSON with the same headers."""
+        todo_service.create_for_user("test@example.com", "Todo")
+        response = api_client.get("/todos/", params={"limit": 1})
+        assert response.headers["content-type"] == "application/json"
+        assert "ETag" in response.headers
+        created = api_client.post("/todos/", json={"title": "Two"}, headers={"Accept": "application/msgpack"})
+        assert created.status_code == 201
+        assert msgpack.unpackb(created.content)["title"] == "Two"
+
+class TestConditionalGet:
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_todo_service"])
+    def test_version_bumps_on_writes_only(self, request, service_fixture):
+        """Creates, updates and deletes bump the version; reads and no-op deletes do not."""
+        service = request.getfixturevalue(service_fixture)
+        versions = [service.version_for_user("test@example.com")]
+        todo = service.create_for_user("test@example.com", "Todo")
+        versions.append(service.version_for_user("test@example.com"))
+        service.list_for_user("test@example.com")
+        service.delete_for_user("test@example.com", "missing")
+        assert service.version_for_user("test@example.com") == versions[-1]
+        service.update_for_user("test@example.com", todo["id"], completed=True)
+        versions.append(service.version_for_user("test@example.com"))
+        service.delete_for_user("test@example.com", todo["id"])
+        versions.append(service.version_for_user("test@example.com"))
+        assert len(set(versions)) == 4
+        assert service.version_for_user("other@example.com") == versions[0]
+
+    def test_matching_etag_returns_304_without_serializing(self, api_client, todo_service):
+        """If-None-Match with the current ETag skips the list read and TodoOut validation."""
+        todo_service.create_for_user("test@example.com", "Todo")
+        first = api_client.get("/todos/")
+        etag = first.headers["ETag"]
+
+        with patch.object(todo_service, "list_page_for_user", side_effect=AssertionError("list read")), \
+                patch("fastapi.routing.serialize_response", side_effect=AssertionError("serialized")):
+            response = api_client.get("/todos/", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+    def test_write_changes_etag(self, api_client):
+        """After a create or delete the old ETag no longer matches."""
+        etag = api_client.get("/todos/").headers["ETag"]
+        created = api_client.post("/todos/", json={"title": "New"}).json()
+        response = api_client.get("/todos/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+        etag = response.headers["ETag"]
+        api_client.delete(f"/todos/{created['id']}")
+        assert api_client.get("/todos/", headers={"If-None-Match": etag}).status_code == 200
+
+    def test_etag_covers_page_filter_and_media_type(self, api_client, todo_service):
+        """A tag only answers 304 for its own page and representation; a bad cursor is still a 400."""
+        for n in range(3):
+            todo_service.create_for_user("test@example.com", f"Todo {n}")
+        first = api_client.get("/todos/", params={"limit": 2})
+        match = {"If-None-Match": first.headers["ETag"]}
+
+        again = api_client.get("/todos/", params={"limit": 2}, headers=match)
+        assert again.status_code == 304
+        assert again.headers["Vary"] == first.headers["Vary"] == "Accept"
+        assert again.headers["Cache-Control"] == first.headers["Cache-Control"]
+        for params, headers in (({"limit": 1}, {}), ({"limit": 2, "completed": "false"}, {}),
+                                ({"limit": 2, "after": first.headers["X-Next-Cursor"]}, {}),
+                                ({"limit": 2}, {"Accept": "application/msgpack"})):
+            assert api_client.get("/todos/", params=params, headers={**match, **headers}).status_code == 200
+        assert api_client.get("/todos/", params={"limit": 2, "after": "!"}, headers=match).status_code == 400
+
+    def test_etag_matching_rules(self):
+        """Weak comparison, lists of tags and the wildcard all match."""
+        assert todos_controller.etag_matches('W/"a.1"', 'W/"a.1"')
+        assert todos_controller.etag_matches('"a.1"', 'W/"a.1"')
+        assert todos_controller.etag_matches('W/"x", W/"a.1"', 'W/"a.1"')
+        assert todos_controller.etag_matches("*", 'W/"a.1"')
+        assert not todos_controller.etag_matches('W/"a.2"', 'W/"a.1"')
+
+class TestExport:
+    def test_export_streams_ndjson(self, api_client, todo_service):
+        """GET /todos/export returns one JSON object per line, in list order."""
+        created = [todo_service.create_for_user("test@example.com", f"Todo {i}") for i in range(3)]
+        todo_service.create_for_user("other@example.com", "Not mine")
+        response = api_client.get("/todos/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == created
+
+    @pytest.mark.parametrize("service_fixture", ["todo_service", "sql_engine"])
+    def test_export_yields_bounded_chunks(self, request, service_fixture, monkeypatch):
+        """Rows leave in TODO_EXPORT_CHUNK-sized chunks rather than one materialized body."""
+        if service_fixture == "sql_engine":
+            engine, runner = request.getfixturevalue("sql_engine")
+            service = SqlTodoService(engine)
+            run = runner.run
+        else:
+            service = request.getfixturevalue("todo_service")
+            run = asyncio.run
+        monkeypatch.setattr(todos_controller, "todo_service", service)
+        monkeypatch.setattr(todos_controller.settings, "TODO_EXPORT_CHUNK", 4)
+        ops = [{"op": "create", "title": f"Todo {i}"} for i in range(10)]
+        run(todos_controller._resolve(service.apply_batch_for_user("test@example.com", ops)))
+
+        async def collect():
+            return [chunk async for chunk in todos_controller.export_todos("test@example.com")]
+
+        chunks = run(collect())
+        assert [chunk.count(b"\n") for chunk in chunks] == [4, 4, 2]
+
+    def test_memory_export_tolerates_concurrent_deletes(self, todo_service):
+        """Deleting while an export is in flight neither raises nor repeats rows."""
+        ids = [todo_service.create_for_user("test@example.com", f"Todo {i}")["id"] for i in range(10)]
+        seen = []
+        for todo in todo_service.iter_for_user("test@example.com", chunk_size=3):
+            seen.append(todo["id"])
+            if len(seen) == 2:
+                todo_service.delete_for_user("test@example.com", ids[5])
+        assert seen == ids[:5] + ids[6:]
+
+class TestSqlBackend:
+    def test_routes_against_sql_store(self, sql_engine, monkeypatch):
+        """The async routes create, list and delete through the SQL store."""
+        engine, _ = sql_engine
+        monkeypatch.setattr(todos_controller, "todo_service", SqlTodoService(engine))
+        app.dependency_overrides[get_current_subject] = lambda: "test@example.com"
+        try:
+            created = client.post("/todos/", json={"title": "Persist me"})
+            assert created.status_code == 201
+            listed = client.get("/todos/")
+            assert listed.json() == [created.json()]
+            assert client.delete(f"/todos/{created.json()['id']}").status_code == 204
+            assert client.delete(f"/todos/{created.json()['id']}").status_code == 404
+            assert client.get("/todos/").json() == []
+        finally:
+            app.dependency_overrides.pop(get_current_subject, None)
+
+    def test_async_url_rewrites_sync_drivers(self):
+        """DATABASE_URL keeps its sync driver for Alembic; the app swaps in the async one."""
+        from app.core.db import async_url
+        assert async_url("postgresql+psycopg2://app:app@db:5432/tododb") == "postgresql+asyncpg://app:app@db:5432/tododb"
+        assert async_url("sqlite:///./todo.db") == "sqlite+aiosqlite:///./todo.db"
+
+    def test_backend_selected_by_config(self, monkeypatch):
+        """TODO_BACKEND picks the store; unknown values fail loudly."""
+        from app.services import todo_service as module
+        monkeypatch.setattr(module.settings, "TODO_BACKEND", "sql")
+        assert isinstance(module.build_todo_service(), SqlTodoService)
+        monkeypatch.setattr(module.settings, "TODO_BACKEND", "memory")
+        assert isinstance(module.build_todo_service(), TodoService)
+        monkeypatch.setattr(module.settings, "TODO_BACKEND", "redis")
+        with pytest.raises(ValueError):
+            module.build_todo_service()
+
+class RespStandIn:
+    """Local stand-in for Redis: the commands the list cache sends, over RESP2, on a background thread."""
+    def __init__(self) -> None:
+        self.data: dict[bytes, tuple[bytes, float]] = {}  # key -> (value, expires)
+        self.commands: list[bytes] = []
+        self._ready = threading.Event()
+
+    def __enter__(self) -> "RespStandIn":
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(),), daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(5)
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    async def _serve(self) -> None:
+        self._loop, self._stop = asyncio.get_running_loop(), asyncio.Event()
+        server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await self._stop.wait()
+
+    def _live(self, key: bytes):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] <= self._loop.time():
+            del self.data[key]
+            return None
+        return entry[0] if entry else None
+
+    @staticmethod
+    def _bulk(value) -> bytes:
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _execute(self, name: bytes, args: list[bytes]) -> bytes:
+        if name == b"GET":
+            return self._bulk(self._live(args[0]))
+        if name == b"MGET":
+            return b"*%d\r\n" % len(args) + b"".join(self._bulk(self._live(key)) for key in args)
+        if name == b"SET":
+            options = [arg.upper() for arg in args[2:]]
+            if b"NX" in options and self._live(args[0]) is not None:
+                return b"$-1\r\n"
+            ttl = int(options[options.index(b"PX") + 1]) / 1000 if b"PX" in options else float("inf")
+            self.data[args[0]] = (args[1], self._loop.time() + ttl)
+            return b"+OK\r\n"
+        if name == b"INFO":
+            used = sum(len(key) + len(value) for key, (value, _) in self.data.items())
+            return self._bulk(b"# Memory\r\nused_memory:%d\r\n" % used)
+        if name in (b"PING",):
+            return b"+PONG\r\n"
+        if name in (b"CLIENT", b"SELECT"):
+            return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                args = []
+                for _ in range(int(line[1:])):
+                    size = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                self.commands.append(args[0].upper())
+                writer.write(self._execute(args[0].upper(), args[1:]))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+@pytest.fixture
+def resp_server():
+    with RespStandIn() as server:
+        yield server
+
+class TestListCache:
+    @pytest.fixture
+    def cached_sql(self, sql_engine):
+        """SQL store behind a memory cache, plus the cache itself."""
+        engine, runner = sql_engine
+        cache = MemoryListCache(max_bytes=1 << 20, ttl=60)
+        return BlockingService(CachedTodoService(SqlTodoService(engine), cache), runner), cache
+
+    def test_reads_hit_until_a_write_invalidates(self, cached_sql):
+        service, cache = cached_sql
+        service.create_for_user("u1", "first")
+        page = service.list_page_for_user("u1", limit=10)
+        assert service.list_page_for_user("u1", limit=10) == page
+        version = service.version_for_user("u1")
+        assert service.version_for_user("u1") == version
+        assert (cache.hits, cache.misses) == (2, 2)
+        created = service.create_for_user("u1", "second")
+        assert {t["id"] for t in service.list_page_for_user("u1", limit=10)[0]} == {page[0][0]["id"], created["id"]}
+        assert service.version_for_user("u1") != version
+        assert service.stats_for_user("u1") == {"total": 2, "completed": 0, "open": 2}
+        service.delete_for_user("u1", created["id"])
+        assert [t["id"] for t in service.list_page_for_user("u1", limit=10)[0]] == [page[0][0]["id"]]
+        assert service.stats_for_user("u1")["total"] == 1
+
+    def test_every_write_path_invalidates(self, cached_sql):
+        service, cache = cached_sql
+        todo = service.create_for_user("u1", "a")
+        for write in (
+            lambda: service.update_for_user("u1", todo["id"], completed=True),
+            lambda: service.apply_batch_for_user("u1", [{"op": "create", "title": "b"}]),
+            lambda: service.delete_many_for_user("u1", [todo["id"]]),
+        ):
+            before = service.stats_for_user("u1")
+            write()
+            assert service.stats_for_user("u1") != before
+        invalidations = cache.invalidations
+        # Writes that change nothing keep the cached entries
+        assert service.delete_for_user("u1", "missing") is False
+        assert service.update_for_user("u1", "missing", title="x") is None
+        assert cache.invalidations == invalidations
+
+    def test_users_are_cached_separately(self, cached_sql):
+        service, _ = cached_sql
+        service.create_for_user("u1", "mine")
+        assert service.list_page_for_user("u2", limit=10) == ([], None)
+        service.create_for_user("u2", "theirs")
+        assert [t["title"] for t in service.list_page_for_user("u1", limit=10)[0]] == ["mine"]
+        assert [t["title"] for t in service.list_page_for_user("u2", limit=10)[0]] == ["theirs"]
+
+    def test_fill_racing_a_write_is_discarded(self):
+        """A reader that loaded before a write committed cannot file its stale result."""
+        async def scenario():
+            cache = MemoryListCache(max_bytes=1 << 20, ttl=60)
+            _, token = await cache.get("u1", "page")
+            await cache.invalidate("u1")
+            await cache.put("u1", "page", token, b"stale")
+            return await cache.get("u1", "page")
+        assert asyncio.run(scenario())[0] is None
+
+    def test_memory_bound_evicts_least_recent_user(self):
+        async def scenario():
+            cache = MemoryListCache(max_bytes=1300, ttl=60)  # three users with one 200-byte page each
+            for user in ("u1", "u2", "u3"):
+                _, token = await cache.get(user, "page")
+                await cache.put(user, "page", token, b"x" * 200)
+            await cache.get("u1", "page")  # u1 is now the most recent
+            _, token = await cache.get("u4", "page")
+            await cache.put("u4", "page", token, b"x" * 200)
+            assert cache.memory_bytes <= cache.max_bytes
+            assert (await cache.get("u1", "page"))[0] is not None
+            assert (await cache.get("u2", "page"))[0] is None
+            return cache.evictions
+        assert asyncio.run(scenario()) >= 1
+
+    def test_entries_expire_after_ttl(self, monkeypatch):
+        from app.core import list_cache
+        now = [100.0]
+        monkeypatch.setattr(list_cache.time, "monotonic", lambda: now[0])
+
+        async def scenario():
+            cache = MemoryListCache(max_bytes=1 << 20, ttl=5)
+            _, token = await cache.get("u1", "page")
+            await cache.put("u1", "page", token, b"v")
+            now[0] += 4
+            fresh = (await cache.get("u1", "page"))[0]
+            now[0] += 2
+            return fresh, (await cache.get("u1", "page"))[0], cache.memory_bytes
+        fresh, expired, memory = asyncio.run(scenario())
+        assert fresh == b"v" and expired is None
+        assert memory == list_cache.ENTRY_OVERHEAD  # only the user's entry is left
+
+    def test_redis_backend_shared_by_workers(self, sql_engine, resp_server):
+        """Two workers' caches on one Redis: a write through either one invalidates both."""
+        engine, runner = sql_engine
+        store = SqlTodoService(engine)
+        caches = [RedisListCache(resp_server.url, ttl=60) for _ in range(2)]
+        first, second = (BlockingService(CachedTodoService(store, cache), runner) for cache in caches)
+        try:
+            todo = first.create_for_user("u1", "shared")
+            assert first.list_page_for_user("u1", limit=10) == ([todo], None)
+            assert second.list_page_for_user("u1", limit=10) == ([todo], None)
+            assert caches[1].hits == 1
+            second.delete_for_user("u1", todo["id"])
+            assert first.list_page_for_user("u1", limit=10) == ([], None)
+            assert b"MGET" in resp_server.commands
+            stats = runner.run(caches[0].stats())
+            assert stats["backend"] == "redis" and stats["memory_bytes"] > 0
+        finally:
+            for cache in caches:
+                runner.run(cache.close())
+
+    def test_redis_fill_racing_a_write_is_discarded(self, resp_server):
+        async def scenario():
+            cache = RedisListCache(resp_server.url, ttl=60)
+            _, token = await cache.get("u1", "page")
+            await cache.invalidate("u1")
+            await cache.put("u1", "page", token, b"stale")
+            value = (await cache.get("u1", "page"))[0]
+            await cache.close()
+            return value
+        assert asyncio.run(scenario()) is None
+
+    def test_redis_outage_falls_back_to_the_database(self, sql_engine):
+        engine, runner = sql_engine
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]  # nothing listens here once the probe closes
+        cache = RedisListCache(f"redis://127.0.0.1:{port}/0", ttl=60)
+        service = BlockingService(CachedTodoService(SqlTodoService(engine), cache), runner)
+        todo = service.create_for_user("u1", "still served")
+        assert service.list_page_for_user("u1", limit=10) == ([todo], None)
+        assert cache.errors >= 2 and cache.hits == 0
+        runner.run(cache.close())
+
+    def test_routes_serve_and_export_cache_metrics(self, sql_engine, monkeypatch):
+        engine, _ = sql_engine
+        cache = MemoryListCache(max_bytes=1 << 20, ttl=60)
+        monkeypatch.setattr(todos_controller, "todo_service", CachedTodoService(SqlTodoService(engine), cache))
+        app.dependency_overrides[get_current_subject] = lambda: "test@example.com"
+        try:
+            created = client.post("/todos/", json={"title": "cached"}).json()
+            for _ in range(3):
+                assert client.get("/todos/").json() == [created]
+            stats = client.get("/stats/todo-cache").json()
+            assert stats["backend"] == "memory" and stats["hits"] == 4 and stats["memory_bytes"] > 0
+            metrics = client.get("/metrics").text
+            assert "todo_cache_hit_ratio 0.6" in metrics
+            assert "todo_cache_memory_bytes" in metrics
+        finally:
+            app.dependency_overrides.pop(get_current_subject, None)
+
+    def test_cache_selected_by_config(self, monkeypatch):
+        from app.services import todo_service as module
+        monkeypatch.setattr(module.settings, "TODO_BACKEND", "sql")
+        monkeypatch.setattr(module.settings, "TODO_CACHE_BACKEND", "none")
+        assert isinstance(module.build_todo_service(), SqlTodoService)
+        monkeypatch.setattr(module.settings, "TODO_CACHE_BACKEND", "memory")
+        assert isinstance(module.build_todo_service().cache, MemoryListCache)
+        monkeypatch.setattr(module.settings, "TODO_CACHE_BACKEND", "redis")
+        assert isinstance(module.build_todo_service().cache, RedisListCache)
+        monkeypatch.setattr(module.settings, "TODO_CACHE_BACKEND", "memcached")
+        with pytest.raises(ValueError):
+            module.build_todo_service()
+
+def db_reads(engine: str) -> int:
+    from app.core.db import DB_READS
+    return DB_READS._merged().get((engine,), [0])[0]
+
+class TestReadReplica:
+    @pytest.fixture
+    def replicated(self, tmp_path, monkeypatch):
+        """Primary and replica SQLite files; the replica is a copy that never receives later writes."""
+        from app.core import db
+        now = [0.0]
+        monkeypatch.setattr(db.write_pins, "_clock", lambda: now[0])
+        monkeypatch.setattr(db.write_pins, "_expiry", OrderedDict())
+        primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+        replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+        with asyncio.Runner() as runner:
+            runner.run(_create_schema(primary))
+            store = SqlTodoService(primary, replica)
+            runner.run(store.create_for_user("u1", "replicated"))
+            shutil.copy(tmp_path / "primary.db", tmp_path / "replica.db")
+            yield BlockingService(store, runner), now
+            for engine in (primary, replica):
+                runner.run(engine.dispose())
+
+    def test_reads_go_to_the_replica(self, replicated):
+        service, now = replicated
+        now[0] += 10
+        reads = db_reads("replica")
+        assert [t["title"] for t in service.list_page_for_user("u1", limit=10)[0]] == ["replicated"]
+        assert service.stats_for_user("u1")["total"] == 1
+        assert db_reads("replica") == reads + 2
+
+    def test_writer_reads_its_own_writes_from_the_primary(self, replicated):
+        """Right after a write the lagging replica is bypassed; other users keep reading it."""
+        service, now = replicated
+        now[0] += 10
+        created = service.create_for_user("u1", "fresh")
+        assert created["id"] in {t["id"] for t in service.list_page_for_user("u1", limit=10)[0]}
+        assert service.get_for_user("u1", created["id"]) == created
+        replica_reads = db_reads("replica")
+        assert service.list_page_for_user("u2", limit=10) == ([], None)
+        assert db_reads("replica") == replica_reads + 1
+        now[0] += 10  # window over: the replica, which never got the write, answers again
+        assert service.get_for_user("u1", created["id"]) is None
+
+    def test_replica_engine_created_by_lifespan(self, tmp_path, monkeypatch):
+        from app.core import db
+        asyncio.run(db.dispose_engines())
+        monkeypatch.setattr(settings, "TODO_BACKEND", "sql")
+        monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'primary.db'}")
+        monkeypatch.setattr(settings, "DATABASE_REPLICA_URL", f"sqlite:///{tmp_path / 'replica.db'}")
+        with TestClient(create_app()) as started:
+            pools = started.get("/stats/db-pool").json()
+            assert pools["replica"]["pool"] is not None and pools["async"]["pool"] is not None
+        assert db._replica_engine is None
+
+class TestSharding:
+    @staticmethod
+    def _file_engines(tmp_path, count: int, runner) -> tuple[list[str], dict]:
+        """`count` SQLite shard files at head; returns their sync URLs and async engines by ring name."""
+        from app.core.migrations import upgrade_if_needed
+        urls = [f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(count)]
+        for url in urls:
+            upgrade_if_needed(url)
+        from app.core.db import async_url
+        return urls, {f"shard{i}": create_async_engine(async_url(url)) for i, url in enumerate(urls)}
+
+    def test_ring_spreads_users_and_adding_a_shard_moves_few(self):
+        from app.core.hash_ring import HashRing
+        users = [f"user{i}@example.com" for i in range(20_000)]
+        four = HashRing(["shard0", "shard1", "shard2", "shard3"])
+        five = HashRing(["shard0", "shard1", "shard2", "shard3", "shard4"])
+        counts = {name: 0 for name in four.shards}
+        for user in users:
+            counts[four.shard_for(user)] += 1
+        assert all(0.7 * 5_000 < count < 1.3 * 5_000 for count in counts.values()), counts
+        moved = [(four.shard_for(u), five.shard_for(u)) for u in users if four.shard_for(u) != five.shard_for(u)]
+        assert {new for _, new in moved} == {"shard4"}  # nothing moves between old shards
+        assert 0.1 < len(moved) / len(users) < 0.3
+        assert HashRing(["shard0", "shard1"]).shard_for("a@example.com") == HashRing(["shard0", "shard1"]).shard_for("a@example.com")
+
+    def test_each_user_lives_on_one_shard(self, tmp_path):
+        from app.services.sharded_todo_service import ShardedTodoService
+        with asyncio.Runner() as runner:
+            _, engines = self._file_engines(tmp_path, 3, runner)
+            sharded = ShardedTodoService(engines)
+            service = BlockingService(sharded, runner)
+            users = [f"user{i}@example.com" for i in range(12)]
+            for user in users:
+                service.create_for_user(user, f"todo of {user}")
+            assert len({sharded.ring.shard_for(user) for user in users}) == 3
+            for user in users:
+                [todo] = service.list_page_for_user(user, limit=10)[0]
+                assert todo["title"] == f"todo of {user}"
+                assert service.stats_for_user(user)["total"] == 1
+                for name, engine in engines.items():
+                    owned = BlockingService(SqlTodoService(engine), runner).list_for_user(user)
+                    assert len(owned) == (name == sharded.ring.shard_for(user))
+            for engine in engines.values():
+                runner.run(engine.dispose())
+
+    def test_routes_against_sharded_store(self, tmp_path, monkeypatch):
+        from app.services.sharded_todo_service import ShardedTodoService
+        with asyncio.Runner() as runner:
+            _, engines = self._file_engines(tmp_path, 2, runner)
+            monkeypatch.setattr(todos_controller, "todo_service", ShardedTodoService(engines))
+            app.dependency_overrides[get_current_subject] = lambda: "test@example.com"
+            try:
+                created = client.post("/todos/", json={"title": "sharded"}).json()
+                assert client.get("/todos/").json() == [created]
+                assert client.get("/todos/search", params={"q": "shard"}).json() == [created]
+                assert client.delete(f"/todos/{created['id']}").status_code == 204
+                assert client.get("/todos/").json() == []
+            finally:
+                app.dependency_overrides.pop(get_current_subject, None)
+                for engine in engines.values():
+                    runner.run(engine.dispose())
+
+    def test_backend_builds_no_engine_at_import(self, monkeypatch):
+        from app.core import db
+        from app.services import todo_service as module
+        from app.services.sharded_todo_service import ShardedTodoService
+        asyncio.run(db.dispose_engines())
+        monkeypatch.setattr(module.settings, "TODO_BACKEND", "sharded")
+        monkeypatch.setattr(module.settings, "TODO_SHARD_URLS", ["sqlite:///a.db", "sqlite:///b.db"])
+        service = module.build_todo_service()
+        assert isinstance(service, ShardedTodoService) and service.ring.shards == ["shard0", "shard1"]
+        assert db._shard_engines is None
+
+    def test_migrations_run_on_every_shard(self, tmp_path):
+        from app.core import migrations
+        urls = [f"sqlite:///{tmp_path / f'shard{i}.db'}" for i in range(2)]
+        env = {**os.environ, "TODO_BACKEND": "sharded", "TODO_SHARD_URLS": ",".join(urls)}
+
+        def run_check() -> str:
+            return subprocess.run([sys.executable, "-m", "app.core.migrations"], cwd=migrations.SERVICE_DIR,
+                                  env=env, capture_output=True, text=True, check=True).stderr
+
+        first = run_check()
+        assert "migrations [shard0]: upgraded to head" in first and "migrations [shard1]: upgraded to head" in first
+        assert all(migrations.current_revisions(url) == migrations.head_revisions() for url in urls)
+        assert run_check().count("already at head, skipped") == 2
+
+    def test_rebalance_moves_users_to_a_new_shard(self, tmp_path):
+        """Users the new ring assigns to the added shard move there, with their todos and a bumped version."""
+        from app.core.db import async_url
+        from app.core.hash_ring import HashRing
+        from app.core.rebalance import rebalance
+        from app.services.sharded_todo_service import ShardedTodoService
+        users = [f"user{i}@example.com" for i in range(30)]
+        with asyncio.Runner() as runner:
+            old_urls, engines = self._file_engines(tmp_path, 2, runner)
+            before = BlockingService(ShardedTodoService(engines), runner)
+            versions = {}
+            for n, user in enumerate(users):
+                before.apply_batch_for_user(user, [{"op": "create", "title": f"{user} {i}"} for i in range(n % 4 + 1)])
+                versions[user] = before.version_for_user(user)
+            for engine in engines.values():
+                runner.run(engine.dispose())
+
+            new_urls = old_urls + [f"sqlite:///{tmp_path / 'shard2.db'}"]
+            moves = rebalance(old_urls, new_urls)
+            ring = HashRing(["shard0", "shard1", "shard2"])
+            expected = [u for u in users if ring.shard_for(u) == "shard2"]
+            assert set(moves) <= {"shard0 -> shard2", "shard1 -> shard2"}
+            assert sum(m["users"] for m in moves.values()) == len(expected) > 0
+
+            engines = {f"shard{i}": create_async_engine(async_url(url)) for i, url in enumerate(new_urls)}
+            after = BlockingService(ShardedTodoService(engines), runner)
+            for n, user in enumerate(users):
+                assert after.stats_for_user(user)["total"] == n % 4 + 1
+                moved = user in expected
+                assert (after.version_for_user(user) == versions[user]) != moved
+            assert rebalance(old_urls, new_urls) == {}  # nothing left on the wrong shard
+            assert rebalance(new_urls, new_urls) == {}
+            for engine in engines.values():
+                runner.run(engine.dispose())
+
+class TestStartup:
+    def test_create_app_builds_independent_apps(self):
+        first, second = create_app(), create_app()
+        assert first is not second
+        assert {"/healthz", "/todos/"} <= {route.path for route in first.routes}
+
+    def test_lifespan_creates_and_disposes_engines(self, tmp_path, monkeypatch):
+        """No engine exists until startup; shutdown disposes it."""
+        from app.core import db
+        asyncio.run(db.dispose_engines())
+        monkeypatch.setattr(settings, "TODO_BACKEND", "sql")
+        monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'lazy.db'}")
+        assert db._async_engine is None
+        with TestClient(create_app()) as started:
+            assert db._async_engine is not None
+            assert started.get("/stats/db-pool").json()["async"]["pool"] is not None
+        assert db._async_engine is None and db._engine is None
+
+    def test_migrations_skipped_at_head(self, tmp_path):
+        """The entrypoint check runs Alembic on a new database and skips it once at head."""
+        from alembic.config import Config
+        from alembic.script import ScriptDirectory
+        from app.core import migrations
+        db_path = tmp_path / "migrated.db"
+        url = f"sqlite:///{db_path}"
+        assert migrations.current_revisions(url) == set() and not db_path.exists()
+        heads = set(ScriptDirectory.from_config(Config(str(migrations.SERVICE_DIR / "alembic.ini"))).get_heads())
+        assert migrations.head_revisions() == heads
+
+        def run_check() -> str:
+            result = subprocess.run([sys.executable, "-m", "app.core.migrations"], cwd=migrations.SERVICE_DIR,
+                                    env={**os.environ, "DATABASE_URL": url}, capture_output=True, text=True, check=True)
+            return result.stderr
+
+        assert "upgraded to head" in run_check()
+        assert migrations.current_revisions(url) == heads
+        assert "already at head, skipped" in run_check()
+
+class TestThreadpool:
+    @pytest.fixture
+    def no_threadpool(self, monkeypatch):
+        """Fail any handler or dependency that FastAPI would dispatch to the worker threads."""
+        def refuse(func, *args, **kwargs):
+            raise AssertionError(f"{func!r} was sent to the threadpool")
+        import fastapi.dependencies.utils
+        import fastapi.routing
+        monkeypatch.setattr(fastapi.routing, "run_in_threadpool", refuse)
+        monkeypatch.setattr(fastapi.dependencies.utils, "run_in_threadpool", refuse)
+
+    def test_requests_stay_on_the_event_loop(self, todo_service, monkeypatch, no_threadpool):
+        """Authenticated todo routes and the ops endpoints run without a thread hop."""
+        monkeypatch.setattr(todos_controller, "todo_service", todo_service)
+        token = jwt.encode({"sub": "u@example.com", "exp": datetime.utcnow() + timedelta(hours=1)},
+                           settings.SECRET_KEY, algorithm="HS256")
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.post("/todos/", json={"title": "a"}, headers=headers).status_code == 201
+        assert client.get("/todos/", headers=headers).status_code == 200
+        for path in ("/healthz", "/metrics", "/stats/threadpool", "/stats/token-cache", "/stats/persistence"):
+            assert client.get(path).status_code == 200, path
+
+    def test_size_is_configured_at_startup(self, monkeypatch):
+        monkeypatch.setattr(settings, "THREADPOOL_SIZE", 7)
+        with TestClient(create_app()) as started:
+            assert started.get("/stats/threadpool").json() == {"size": 7, "busy": 0, "waiting": 0}
+
 class TestAuthentication:
     def test_valid_jwt_token(self, auth_headers):
         """Test that valid JWT token is accepted."""
@@ -163,6 +1211,479 @@ class TestAuthentication:
         response = client.get("/todos/", headers=headers)
         assert response.status_code == 401
 
+class TestTokenCache:
+    def _token(self, secret, exp_delta=timedelta(hours=1)):
+        payload = {"sub": "test@example.com", "exp": datetime.utcnow() + exp_delta, "iat": datetime.utcnow()}
+        return jwt.encode(payload, secret, algorithm="HS256")
+
+    def test_repeated_token_hits_cache(self, todo_service, monkeypatch):
+        """The second request with the same token skips jwt.decode."""
+        monkeypatch.setattr(todos_controller, "todo_service", todo_service)
+        monkeypatch.setattr(auth_dependency, "token_cache", VerifiedTokenCache(maxsize=10))
+        headers = {"Authorization": f"Bearer {self._token(settings.SECRET_KEY)}"}
+
+        assert client.get("/todos/", headers=headers).status_code == 200
+        with patch.object(auth_dependency.jwt, "decode", side_effect=AssertionError("decoded twice")):
+            assert client.get("/todos/", headers=headers).status_code == 200
+        assert auth_dependency.token_cache.stats() == {"size": 1, "maxsize": 10, "hits": 1, "misses": 1}
+
+    def test_entries_expire_at_token_exp(self):
+        """A cached token stops resolving once its exp passes."""
+        cache = VerifiedTokenCache(maxsize=10)
+        cache.put("tok", "s", "user", exp=1_000)
+        assert cache.get("tok", "s", now=999) == "user"
+        assert cache.get("tok", "s", now=1_000) is None
+        assert len(cache) == cache.stats()["size"] == 0
+
+    def test_secret_rotation_invalidates(self, todo_service, monkeypatch):
+        """Tokens cached under the old secret are re-verified (and rejected) after rotation."""
+        monkeypatch.setattr(todos_controller, "todo_service", todo_service)
+        monkeypatch.setattr(auth_dependency, "token_cache", VerifiedTokenCache(maxsize=10))
+        headers = {"Authorization": f"Bearer {self._token(settings.SECRET_KEY)}"}
+        assert client.get("/todos/", headers=headers).status_code == 200
+
+        monkeypatch.setattr(settings, "SECRET_KEY", "rotated-secret")
+        assert client.get("/todos/", headers=headers).status_code == 401
+
+    def test_lru_bound(self):
+        """The least recently used token is evicted when the cache is full."""
+        cache = VerifiedTokenCache(maxsize=2)
+        cache.put("a", "s", "ua", exp=10)
+        cache.put("b", "s", "ub", exp=10)
+        cache.get("a", "s", now=0)
+        cache.put("c", "s", "uc", exp=10)
+        assert cache.get("b", "s", now=0) is None
+        assert cache.get("a", "s", now=0) == "ua"
+
+    def test_expired_token_never_cached(self, monkeypatch):
+        """Expired tokens are rejected on every request."""
+        monkeypatch.setattr(auth_dependency, "token_cache", VerifiedTokenCache(maxsize=10))
+        headers = {"Authorization": f"Bearer {self._token(settings.SECRET_KEY, timedelta(seconds=-5))}"}
+        assert client.get("/todos/", headers=headers).json()["detail"] == "Token expired"
+        assert auth_dependency.token_cache.stats()["size"] == 0
+
+class TestMetrics:
+    def test_metrics_endpoint(self, todo_service, monkeypatch):
+        """/metrics covers routes, jwt.decode, token cache and TodoService operations."""
+        monkeypatch.setattr(todos_controller, "todo_service", todo_service)
+        monkeypatch.setattr(auth_dependency, "token_cache", VerifiedTokenCache(maxsize=10))
+        payload = {"sub": "metrics@example.com", "exp": datetime.utcnow() + timedelta(hours=1)}
+        headers = {"Authorization": f"Bearer {jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')}"}
+        client.post("/todos/", json={"title": "Todo"}, headers=headers)
+        client.get("/todos/", headers=headers)
+        client.delete("/todos/missing", headers=headers)
+
+        body = client.get("/metrics").text
+        assert 'http_request_duration_seconds_count{method="GET",route="/todos/"}' in body
+        assert 'http_requests_total{method="DELETE",route="/todos/{todo_id}",status="404"}' in body
+        assert 'todo_service_op_seconds_count{op="list_page_for_user"}' in body
+        assert "jwt_decode_seconds_count" in body
+        assert "jwt_cache_hits_total 2" in body
+        assert "# TYPE db_pool_checkout_seconds histogram" in body
+
+    def test_unmatched_routes_share_one_label(self):
+        """Unknown paths do not create a label per URL."""
+        client.get("/no/such/path/123")
+        assert 'route="unmatched",status="404"' in client.get("/metrics").text
+
+class TestDbPool:
+    def test_pool_settings_and_exhaustion(self, tmp_path, monkeypatch):
+        """Pool sizing comes from Settings; exhaustion shows up as timeouts, in-use and state."""
+        from sqlalchemy import create_engine, exc
+        from app.core import metrics
+        from app.core.db import pool_options, pool_state
+        monkeypatch.setattr(settings, "DB_POOL_SIZE", 1)
+        monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 0)
+        monkeypatch.setattr(settings, "DB_POOL_TIMEOUT", 0.05)
+        monkeypatch.setattr(settings, "DB_POOL_PRE_PING", False)
+        url = f"sqlite:///{tmp_path / 'pool.db'}"
+        options = pool_options(url)
+        assert options["pool_size"] == 1 and options["pool_pre_ping"] is False
+
+        engine = create_engine(url, **options)
+        metrics.instrument_pool(engine, "test")
+        with engine.connect():
+            assert pool_state(engine)["checkedout"] == 1
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+            body = metrics.REGISTRY.render()
+            assert 'db_pool_connections_in_use{engine="test"} 1' in body
+            assert 'db_pool_checkout_timeouts_total{engine="test"} 1' in body
+        body = metrics.REGISTRY.render()
+        assert 'db_pool_connections_in_use{engine="test"} 0' in body
+        assert 'db_pool_connections_opened_total{engine="test"} 1' in body
+        assert 'db_pool_checkout_seconds_count{engine="test"} 2' in body
+        engine.dispose()
+
+    def test_memory_sqlite_skips_sizing(self):
+        """Pools without a size (in-memory SQLite) only get pre-ping and recycle."""
+        from app.core.db import pool_options
+        assert set(pool_options("sqlite://")) == {"pool_pre_ping", "pool_recycle"}
+
+    def test_db_pool_endpoint(self):
+        response = client.get("/stats/db-pool")
+        assert response.status_code == 200
+        assert {"sync", "async"} <= response.json().keys()
+
+class TestMetricPrimitives:
+    def test_counter_sums_thread_shards(self):
+        """Increments from many threads are all counted without a shared lock."""
+        from app.core.metrics import Counter
+        counter = Counter("c", "test", ("k",))
+        threads = [threading.Thread(target=lambda: [counter.inc("a") for _ in range(10_000)]) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert counter.render() == ['c{k="a"} 80000']
+
+    def test_exited_threads_leave_no_shard(self):
+        """Cells of finished threads are folded into the base shard; their counts are kept."""
+        from app.core.metrics import Counter, Histogram
+        counter = Counter("c", "test", ("k",))
+        histogram = Histogram("h", "test", buckets=(1.0,))
+        for _ in range(50):
+            t = threading.Thread(target=lambda: (counter.inc("a"), histogram.observe(0.5)))
+            t.start()
+            t.join()
+        assert len(counter._shards) == len(histogram._shards) == 0
+        counter.inc("a")
+        assert counter.render() == ['c{k="a"} 51']
+        assert histogram.render()[-1] == "h_count 50"
+
+    def test_histogram_buckets_are_cumulative(self):
+        from app.core.metrics import Histogram
+        histogram = Histogram("h", "test", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value)
+        assert histogram.render() == [
+            'h_bucket{le="0.1"} 1', 'h_bucket{le="1.0"} 3', 'h_bucket{le="+Inf"} 4', "h_sum 6.05", "h_count 4",
+        ]
+
+@pytest.fixture
+def fast_thread_switching():
+    """Switch GIL holders every few microseconds so races actually interleave."""
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(previous)
+
+def hammer(threads: int, work) -> list:
+    """Run work(i) on `threads` threads released together; return results, re-raising any error."""
+    barrier = threading.Barrier(threads)
+    results: list = [None] * threads
+    errors: list[BaseException] = []
+
+    def run(i: int) -> None:
+        barrier.wait()
+        try:
+            results[i] = work(i)
+        except BaseException as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    if errors:
+        raise errors[0]
+    return results
+
+@pytest.mark.usefixtures("fast_thread_switching")
+class TestConcurrency:
+    def test_concurrent_writes_keep_store_consistent(self):
+        """Creates, updates and deletes from many threads lose nothing and keep versions exact."""
+        service = TodoService(shards=4)
+        users = [f"user{u}@example.com" for u in range(6)]
+
+        def work(i: int) -> dict:
+            done = {user: {"created": [], "deleted": 0, "writes": 0} for user in users}
+            for n in range(150):
+                user = users[(i + n) % len(users)]
+                todo = service.create_for_user(user, f"t{i}-{n}")
+                done[user]["created"].append(todo["id"])
+                done[user]["writes"] += 1
+                if service.update_for_user(user, todo["id"], completed=True) is not None:
+                    done[user]["writes"] += 1
+                if n % 3 == 0 and service.delete_for_user(user, todo["id"]):
+                    done[user]["deleted"] += 1
+                    done[user]["writes"] += 1
+            return done
+
+        results = hammer(12, work)
+        for user in users:
+            created = [tid for r in results for tid in r[user]["created"]]
+            deleted = sum(r[user]["deleted"] for r in results)
+            listed = service.list_for_user(user)
+            assert len(listed) == len(created) - deleted
+            assert all(todo["completed"] for todo in listed)
+            paged = list(service.iter_for_user(user, chunk_size=7))
+            assert [t["id"] for t in paged] == [t["id"] for t in listed]
+            writes = sum(r[user]["writes"] for r in results)
+            assert service.version_for_user(user).endswith(f".{writes}")
+
+    def test_racing_deletes_succeed_exactly_once(self):
+        """Threads deleting the same ids: each id reports success to exactly one of them."""
+        service = TodoService(shards=2)
+        ids = [service.create_for_user("u@example.com", f"t{n}")["id"] for n in range(300)]
+        results = hammer(8, lambda i: service.delete_many_for_user("u@example.com", ids[i % 2::2] + ids[: i]))
+        assert sum(sum(r) for r in results) == len(ids)
+        assert service.list_for_user("u@example.com") == []
+
+    def test_batches_are_atomic(self):
+        """A reader never sees half of a batch: todo counts only move in whole batches."""
+        service = TodoService(shards=1)
+        stop = threading.Event()
+        seen: list[int] = []
+
+        def read(i: int) -> None:
+            while not stop.is_set():
+                seen.append(len(service.list_for_user("u@example.com")))
+
+        def write(i: int) -> None:
+            for _ in range(300):
+                service.apply_batch_for_user("u@example.com", [{"op": "create", "title": "x"}] * 5)
+            stop.set()
+
+        hammer(4, lambda i: write(i) if i == 0 else read(i))
+        assert seen and all(count % 5 == 0 for count in seen)
+
+    def test_returned_todos_are_not_mutated_by_later_updates(self):
+        service = TodoService()
+        todo = service.create_for_user("u@example.com", "before")
+        service.update_for_user("u@example.com", todo["id"], title="after")
+        assert todo["title"] == "before"
+        assert service.get_for_user("u@example.com", todo["id"])["title"] == "after"
+
+@pytest.fixture
+def open_store(tmp_path):
+    """Open (and reopen) persistent TodoServices on one directory; all are closed at teardown."""
+    opened: list[TodoService] = []
+
+    def open_(**options) -> TodoService:
+        service = TodoService(persistence=Persistence(str(tmp_path), **options))
+        opened.append(service)
+        return service
+
+    yield open_
+    for service in opened:
+        service.persistence.close()
+
+def restart(service: TodoService, open_store) -> TodoService:
+    service.persistence.close()
+    return open_store()
+
+class TestPersistence:
+    def test_writes_survive_restart(self, open_store):
+        """Creates, updates, deletes and batches are replayed with order, versions and sequence intact."""
+        service = open_store()
+        ids = [service.create_for_user("u@example.com", f"t{n}")["id"] for n in range(10)]
+        service.update_for_user("u@example.com", ids[0], completed=True)
+        service.delete_many_for_user("u@example.com", ids[3:5])
+        service.apply_batch_for_user("v@example.com", [{"op": "create", "title": "a"}, {"op": "create", "title": "b"}])
+        before = {u: (service.list_for_user(u), service.version_for_user(u)) for u in ("u@example.com", "v@example.com")}
+
+        service = restart(service, open_store)
+        for user, (todos, version) in before.items():
+            assert service.list_for_user(user) == todos
+            assert service.version_for_user(user).split(".")[1] == version.split(".")[1]
+        newest = service.create_for_user("u@example.com", "after restart")
+        assert list(service.iter_for_user("u@example.com", chunk_size=3))[-1] == newest
+        # One log entry per call: the multi-delete and the batch are single atomic records
+        assert service.persistence.stats()["recovered_records"] == 13
+
+    def test_snapshot_compacts_log_under_concurrent_writes(self, open_store, tmp_path):
+        """Snapshots taken while threads write lose nothing, and old log segments are removed."""
+        service = open_store(group_commit_ms=0)
+
+        def work(i: int) -> None:
+            for n in range(200):
+                todo = service.create_for_user(f"user{i}@example.com", f"t{n}")
+                if n % 2:
+                    service.delete_for_user(f"user{i}@example.com", todo["id"])
+                if n % 50 == 0:
+                    service.persistence.snapshot()
+
+        hammer(4, work)
+        expected = {i: service.list_for_user(f"user{i}@example.com") for i in range(4)}
+        service.persistence.snapshot()
+        assert len([f for f in os.listdir(tmp_path) if f.endswith(".log")]) == 1
+
+        service = restart(service, open_store)
+        for i, todos in expected.items():
+            assert service.list_for_user(f"user{i}@example.com") == todos
+
+    def test_torn_tail_is_truncated(self, open_store, tmp_path):
+        """A half-written last record (crash mid-append) is dropped; everything before it recovers."""
+        service = open_store()
+        kept = [service.create_for_user("u@example.com", f"t{n}") for n in range(5)]
+        service.persistence.close()
+        segment = max(f for f in os.listdir(tmp_path) if f.endswith(".log"))
+        frame = encode_frame({"o": "put", "u": "u@example.com", "s": 99, "t": {"id": "x", "title": "lost", "completed": False}, "v": 6})
+        with open(tmp_path / segment, "ab") as f:
+            f.write(frame[: len(frame) // 2])
+        size = os.path.getsize(tmp_path / segment)
+
+        service = open_store()
+        assert service.list_for_user("u@example.com") == kept
+        assert service.persistence.stats()["torn_bytes_dropped"] == len(frame) // 2
+        assert os.path.getsize(tmp_path / segment) == size - len(frame) // 2
+        service.create_for_user("u@example.com", "next")
+        assert len(restart(service, open_store).list_for_user("u@example.com")) == 6
+
+    def test_corruption_before_the_tail_is_an_error(self, open_store, tmp_path):
+        """A bad checksum in an older segment means lost acknowledged writes: refuse to start."""
+        service = open_store()
+        service.create_for_user("u@example.com", "t")
+        service = restart(service, open_store)
+        service.create_for_user("u@example.com", "t2")
+        service.persistence.close()
+        first = min(f for f in os.listdir(tmp_path) if f.endswith(".log"))
+        data = bytearray((tmp_path / first).read_bytes())
+        data[-2] ^= 0xFF
+        (tmp_path / first).write_bytes(bytes(data))
+        with pytest.raises(CorruptLogError):
+            TodoService(persistence=Persistence(str(tmp_path)))
+
+    def test_group_commit_shares_fsyncs(self, open_store):
+        """Concurrent writers waiting for durability are covered by far fewer fsyncs than writes."""
+        service = open_store(group_commit_ms=5)
+
+        def work(i: int) -> None:
+            for n in range(20):
+                service.create_for_user(f"user{i}@example.com", f"t{n}")
+                service.persistence.wait()
+
+        hammer(16, work)
+        stats = service.persistence.stats()
+        assert stats["durable"] == stats["appended"] == 320
+        assert stats["fsyncs"] < 320 / 4
+
+    def test_api_acknowledges_after_fsync(self, open_store, monkeypatch):
+        """POST /todos returns only once its log record is durable."""
+        service = open_store(group_commit_ms=5)
+        monkeypatch.setattr(todos_controller, "todo_service", service)
+        app.dependency_overrides[get_current_subject] = lambda: "u@example.com"
+        try:
+            assert client.post("/todos/", json={"title": "durable"}).status_code == 201
+            stats = client.get("/stats/persistence").json()
+            assert stats["appended"] == stats["durable"] == 1
+        finally:
+            app.dependency_overrides.clear()
+
+def _frames(hub: EventHub, user_id: str, last_event_id=None, after=lambda: None) -> bytes:
+    """Everything one stream receives: its backlog, plus what `after()` publishes once it is open."""
+    async def scenario():
+        stream = hub.listen(user_id, last_event_id, heartbeat=0.05)
+        assert await anext(stream) == b": connected\n\n"
+        after()
+        body = await anext(stream)
+        await stream.aclose()
+        return body
+    return asyncio.run(scenario())
+
+def _event_ids(body: bytes) -> list[str]:
+    return [line[4:].decode() for line in body.split(b"\n") if line.startswith(b"id: ")]
+
+class TestEventHub:
+    def test_live_events_reach_every_stream_of_the_user(self):
+        """A publish lands on each open stream of that user and on no other user's."""
+        hub = EventHub(buffer_size=8, max_users=10, max_pending=100)
+
+        async def scenario():
+            mine = [hub.listen("a@example.com", heartbeat=5) for _ in range(3)]
+            other = hub.listen("b@example.com", heartbeat=0.05)
+            for stream in (*mine, other):
+                await anext(stream)
+            hub.publish("a@example.com", "created", {"id": "1", "title": "x", "completed": False})
+            bodies = [await anext(stream) for stream in mine]
+            idle = await anext(other)
+            assert hub.subscribers == 4
+            for stream in (*mine, other):
+                await stream.aclose()
+            return bodies, idle
+
+        bodies, idle = asyncio.run(scenario())
+        assert len(set(bodies)) == 1
+        assert b"event: created\n" in bodies[0] and b'"title":"x"' in bodies[0]
+        assert idle == b": keep-alive\n\n"
+        assert hub.subscribers == 0
+
+    def test_resume_replays_only_missed_events(self):
+        """Last-Event-ID from this hub replays the buffered events after it, in order."""
+        hub = EventHub(buffer_size=8, max_users=10, max_pending=100)
+        for i in range(5):
+            hub.publish("a@example.com", "created", {"id": str(i)})
+        seen = _event_ids(hub._users["a@example.com"].buffer[1][1])[0]
+        body = _frames(hub, "a@example.com", seen)
+        assert _event_ids(body) == [f"{hub.epoch}-{n}" for n in (3, 4, 5)]
+        assert hub.resets == 0
+
+    def test_unknown_or_expired_id_resets(self):
+        """An id from another process, or older than the ring buffer holds, gets a reset instead of a gap."""
+        hub = EventHub(buffer_size=3, max_users=10, max_pending=100)
+        for i in range(5):
+            hub.publish("a@example.com", "created", {"id": str(i)})
+        assert _frames(hub, "a@example.com", "deadbeef-4") == RESET_FRAME
+        assert _frames(hub, "a@example.com", f"{hub.epoch}-1") == RESET_FRAME
+        # Event 2 was dropped from the ring, but the client had it: 3..5 are all it missed
+        assert _event_ids(_frames(hub, "a@example.com", f"{hub.epoch}-2")) == [f"{hub.epoch}-{n}" for n in (3, 4, 5)]
+        assert hub.resets == 2
+
+    def test_new_user_resumes_across_other_users_events(self):
+        """The first events of a user are replayable from an id issued before that user had any."""
+        hub = EventHub(buffer_size=8, max_users=10, max_pending=100)
+        hub.publish("b@example.com", "created", {"id": "b"})
+        hub.publish("a@example.com", "created", {"id": "a"})
+        assert _event_ids(_frames(hub, "a@example.com", f"{hub.epoch}-1")) == [f"{hub.epoch}-2"]
+
+    def test_slow_reader_gets_a_reset(self):
+        """A stream with more than max_pending undelivered events holds one reset frame, not the backlog."""
+        hub = EventHub(buffer_size=8, max_users=10, max_pending=3)
+
+        def burst():
+            for i in range(10):
+                hub.publish("a@example.com", "created", {"id": str(i)})
+
+        body = _frames(hub, "a@example.com", after=burst)
+        assert body.startswith(RESET_FRAME)
+        assert len(_event_ids(body)) < 3
+
+    def test_idle_users_are_evicted_but_not_open_streams(self):
+        """Buffers are LRU-bounded by max_users; a user with an open stream keeps theirs."""
+        hub = EventHub(buffer_size=4, max_users=3, max_pending=100)
+
+        async def scenario():
+            stream = hub.listen("live@example.com", heartbeat=5)
+            await anext(stream)
+            for i in range(10):
+                hub.publish(f"user{i}@example.com", "created", {"id": str(i)})
+            users = set(hub._users)
+            await stream.aclose()
+            return users
+
+        users = asyncio.run(scenario())
+        assert users == {"live@example.com", "user8@example.com", "user9@example.com"}
+
+    def test_api_writes_are_published(self, api_client, monkeypatch):
+        """Creates, batch updates and deletes through the API all become events, failed ones do not."""
+        hub = EventHub(buffer_size=16, max_users=10, max_pending=100)
+        monkeypatch.setattr(todos_controller, "event_hub", hub)
+        try:
+            todo = api_client.post("/todos/", json={"title": "one"}).json()
+            api_client.post("/todos/batch", json={"operations": [
+                {"op": "create", "title": "two"}, {"op": "update", "id": todo["id"], "completed": True},
+                {"op": "update", "id": "missing", "completed": True}]})
+            api_client.post("/todos/batch-delete", json={"ids": [todo["id"], "missing"]})
+            assert api_client.delete(f"/todos/{todo['id']}").status_code == 404
+        finally:
+            app.dependency_overrides.clear()
+        body = b"".join(frame for _, frame in hub._users["test@example.com"].buffer)
+        events = [line[7:].decode() for line in body.split(b"\n") if line.startswith(b"event: ")]
+        assert events == ["created", "created", "updated", "deleted"]
+        assert client.get("/stats/events").json()["subscribers"] == 0
+
 class TestHealthCheck:
     def test_health_check(self):
         """Test health check endpoint."""
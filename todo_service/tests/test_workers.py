@@ -0,0 +1,114 @@
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import threading
+import time
+import httpx
+import jwt
+import pytest
+
+SERVICE_DIR = pathlib.Path(__file__).resolve().parents[1]
+SECRET = "multi-worker-secret"
+
+def bearer(sub: str) -> dict:
+    token = jwt.encode({"sub": sub, "exp": int(time.time()) + 600}, SECRET, algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class UvicornServer:
+    """`uvicorn main:app --workers N` on a shared SQLite file, migrated with Alembic like the entrypoint."""
+    def __init__(self, db_path: pathlib.Path, workers: int) -> None:
+        self.env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{db_path}",
+            "TODO_BACKEND": "sql",
+            "SECRET_KEY": SECRET,
+        }
+        self.workers = workers
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "UvicornServer":
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=SERVICE_DIR, env=self.env,
+                       check=True, capture_output=True)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port), "--workers", str(self.workers)],
+            cwd=SERVICE_DIR, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"{self.url}/healthz").status_code == 200:
+                    # The socket answers as soon as one worker is up; give the others time to boot
+                    time.sleep(0.5 * self.workers)
+                    return self
+            except httpx.TransportError:
+                time.sleep(0.2)
+        self.process.kill()
+        raise RuntimeError(f"uvicorn did not start: {self.process.stderr.read()}")
+
+    def __exit__(self, *exc) -> None:
+        self.process.terminate()
+        _, stderr = self.process.communicate(timeout=30)
+        self.worker_pids = stderr.count("Started server process")
+
+def fresh_client(url: str, sub: str) -> httpx.Client:
+    # No keep-alive: each request is a new connection, which the kernel hands to any worker
+    return httpx.Client(base_url=url, headers=bearer(sub), limits=httpx.Limits(max_keepalive_connections=0))
+
+def run_threads(threads: int, work) -> list:
+    results: list = [None] * threads
+
+    def run(i: int) -> None:
+        results[i] = work(i)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return results
+
+class TestMultiWorker:
+    def test_todos_are_consistent_across_workers(self, tmp_path):
+        """Writes from every worker land in one list, and every worker serves the same ETag for it."""
+        with UvicornServer(tmp_path / "todo.db", workers=2) as server:
+            def create(i: int) -> list[str]:
+                with fresh_client(server.url, "shared@example.com") as http:
+                    return [http.post("/todos/", json={"title": f"t{i}-{n}"}).json()["id"] for n in range(10)]
+
+            created = {todo_id for ids in run_threads(4, create) for todo_id in ids}
+            with fresh_client(server.url, "shared@example.com") as http:
+                responses = [http.get("/todos/", params={"limit": 500}) for _ in range(20)]
+                assert {r.headers["ETag"] for r in responses} == {responses[0].headers["ETag"]}
+                assert all({t["id"] for t in r.json()} == created for r in responses)
+                match = {"If-None-Match": responses[0].headers["ETag"]}
+                assert http.get("/todos/", params={"limit": 500}, headers=match).status_code == 304
+        assert len(created) == 40
+        assert server.worker_pids == 2
+
+    @pytest.mark.slow
+    def test_throughput_single_versus_multi_worker(self, tmp_path):
+        """Mixed list/create requests/s with 1 and with 2 workers; reported only, since the gain depends on spare cores."""
+        rates = {}
+        for workers in (1, 2):
+            with UvicornServer(tmp_path / f"todo{workers}.db", workers=workers) as server:
+                def traffic(i: int) -> int:
+                    with httpx.Client(base_url=server.url, headers=bearer(f"user{i}@example.com")) as http:
+                        ok = 0
+                        for n in range(50):
+                            response = http.post("/todos/", json={"title": f"t{n}"}) if n % 5 == 0 else http.get("/todos/")
+                            ok += response.status_code in (200, 201)
+                        return ok
+
+                start = time.perf_counter()
+                ok = sum(run_threads(8, traffic))
+                rates[workers] = ok / (time.perf_counter() - start)
+            assert ok == 400
+            print(f"{workers} worker(s): {rates[workers]:,.0f} requests/s on {os.cpu_count()} core(s)")